@@ -0,0 +1,369 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+from algo.csr import (PROGRESS_INTERVAL, CSRNetwork, FlowResult,
+                      ProgressCallback, SolverCancelled, numeric)
+
+__all__ = ['boykov_kolmogorov']
+
+# Trees of the algorithm
+FREE, SOURCE_TREE, SINK_TREE = 0, 1, 2
+
+# Special values of parent arcs
+ROOT, ORPHAN = -1, -2
+
+# Distance of nodes whose origin is not a terminal
+INFINITE_DISTANCE = 1 << 62
+
+
+def boykov_kolmogorov(network: CSRNetwork, source: int, sink: int,
+                      progress: Optional[ProgressCallback] = None
+                      ) -> FlowResult:
+    """
+        Calculate maximum flow of network in place.
+        Boykov-Kolmogorov augmenting paths algorithm is used: search trees
+        grown from the source and the sink are reused between
+        augmentations, which is much faster than push-relabel on short-path
+        graphs such as image grids.
+        Excess left in the network, e.g. by push-relabel, is sent to the
+        sink as well: nodes with excess are roots of the source tree, so
+        the network may hold a preflow.
+
+        Parameters
+        ----------
+        network : CSRNetwork
+            Residual network. Final residual network is stored in it.
+        source : int
+            Source of flow.
+        sink : int
+            Sink of flow.
+        progress : ProgressCallback
+            If given, it is called with the operation counts every
+            PROGRESS_INTERVAL augmentations, SolverCancelled is raised if it
+            returns False. Default value: None.
+
+        Returns
+        -------
+        result : FlowResult
+            Value of the maximum flow, the minimum cut and numbers of
+            augmentations and orphans.
+    """
+
+    nodes_num = network.nodes_num
+
+    # Memory views are much faster than NumPy arrays for scalar access
+    offsets = memoryview(network.offsets)
+    targets = memoryview(network.targets)
+    reverse = memoryview(network.reverse)
+    capacity = memoryview(network.capacity)
+    excess = memoryview(network.excess)
+
+    # Excess left by set_capacities, which saturates new arcs from the
+    # source, is returned to the source, so that they are residual again.
+    # Excess that is left is the excess of the roots of the source tree
+    for u in np.flatnonzero(network.excess > 0).tolist():
+        if u == source or u == sink:
+            continue
+
+        for a in range(offsets[u], offsets[u + 1]):
+            if targets[a] == source:
+                delta = min(excess[u], capacity[a])
+                capacity[a] -= delta
+                capacity[reverse[a]] += delta
+                excess[u] -= delta
+
+    tree: List[int] = [FREE] * nodes_num
+    # Arc from parent to node in the source tree,
+    # arc from node to parent in the sink tree
+    parent: List[int] = [ORPHAN] * nodes_num
+
+    # Distance to the terminal, valid when timestamp is current
+    distance: List[int] = [0] * nodes_num
+    timestamp: List[int] = [0] * nodes_num
+    time: int = 1
+
+    active: Deque[int] = deque()
+    is_active: List[bool] = [False] * nodes_num
+    orphans: Deque[int] = deque()
+
+    flow_value: numeric = 0
+
+    # Statistics of the algorithm
+    operations: Dict[str, int] = dict.fromkeys(('augmentations', 'orphans'),
+                                               0)
+
+    # Node whose arcs were being scanned when an augmenting path was found
+    # and the arc to resume the scanning from
+    resume_node: int = -1
+    resume_arc: int = 0
+
+    def activate(u: int) -> None:
+        if not is_active[u]:
+            is_active[u] = True
+            active.append(u)
+
+    def parent_node(u: int) -> int:
+        if tree[u] == SOURCE_TREE:
+            return targets[reverse[parent[u]]]
+
+        return targets[parent[u]]
+
+    def tree_capacity(u: int, a: int) -> numeric:
+        """
+            Return residual capacity of arc a, leaving u, in the direction
+            of flow in the tree of u.
+        """
+
+        if tree[u] == SOURCE_TREE:
+            return capacity[a]
+
+        return capacity[reverse[a]]
+
+    def grow() -> int:
+        """
+            Grow search trees until they touch.
+
+            Parameters
+            ----------
+            None.
+
+            Returns
+            -------
+            arc : int
+                Arc from the source tree to the sink tree or -1 if there
+                is no augmenting path.
+        """
+
+        nonlocal resume_node, resume_arc
+
+        while active:
+            u = active[0]
+            u_tree = tree[u]
+
+            if u_tree == FREE:
+                active.popleft()
+                is_active[u] = False
+                continue
+
+            start = resume_arc if u == resume_node else offsets[u]
+            is_source_tree = u_tree == SOURCE_TREE
+
+            for a in range(start, offsets[u + 1]):
+                if capacity[a if is_source_tree else reverse[a]] <= 0:
+                    continue
+
+                v = targets[a]
+                v_tree = tree[v]
+
+                if v_tree == FREE:
+                    tree[v] = u_tree
+                    parent[v] = a if is_source_tree else reverse[a]
+                    distance[v] = distance[u] + 1
+                    timestamp[v] = timestamp[u]
+                    activate(v)
+                elif v_tree != u_tree:
+                    resume_node, resume_arc = u, a
+                    return a if is_source_tree else reverse[a]
+                elif (timestamp[v] <= timestamp[u] and
+                      distance[v] > distance[u]):
+                    # Node u is closer to the terminal, shorten the path
+                    parent[v] = a if is_source_tree else reverse[a]
+                    distance[v] = distance[u] + 1
+                    timestamp[v] = timestamp[u]
+
+            active.popleft()
+            is_active[u] = False
+            resume_node = -1
+
+        return -1
+
+    def augment(bridge: int) -> None:
+        """
+            Push flow along the path through the bridge arc.
+            Nodes cut off from their trees become orphans.
+
+            Parameters
+            ----------
+            bridge : int
+                Arc from the source tree to the sink tree.
+
+            Returns
+            -------
+            None.
+        """
+
+        nonlocal flow_value
+
+        head = targets[bridge]
+        tail = targets[reverse[bridge]]
+
+        delta = capacity[bridge]
+
+        u = tail
+        while parent[u] != ROOT:
+            delta = min(delta, capacity[parent[u]])
+            u = parent_node(u)
+
+        root = u
+        if root != source:
+            delta = min(delta, excess[root])
+
+        u = head
+        while u != sink:
+            delta = min(delta, capacity[parent[u]])
+            u = parent_node(u)
+
+        capacity[bridge] -= delta
+        capacity[reverse[bridge]] += delta
+
+        for u in (tail, head):
+            while parent[u] != ROOT:
+                a = parent[u]
+                next_u = parent_node(u)
+
+                capacity[a] -= delta
+                capacity[reverse[a]] += delta
+
+                if capacity[a] == 0:
+                    parent[u] = ORPHAN
+                    orphans.append(u)
+
+                u = next_u
+
+        if root != source:
+            excess[root] -= delta
+
+            if excess[root] == 0:
+                parent[root] = ORPHAN
+                orphans.append(root)
+
+        flow_value += delta
+
+    def origin_distance(u: int) -> int:
+        """
+            Return distance from u to the root of its tree or
+            INFINITE_DISTANCE if the path leads to an orphan.
+            Distances along the path are cached with the current timestamp.
+        """
+
+        d = 0
+        v = u
+
+        while True:
+            if timestamp[v] == time:
+                d += distance[v]
+                break
+
+            a = parent[v]
+
+            if a == ROOT:
+                timestamp[v] = time
+                distance[v] = 0
+                break
+
+            if a == ORPHAN:
+                return INFINITE_DISTANCE
+
+            d += 1
+            v = parent_node(v)
+
+        u_distance = d
+
+        v = u
+        while timestamp[v] != time:
+            timestamp[v] = time
+            distance[v] = d
+            d -= 1
+            v = parent_node(v)
+
+        return u_distance
+
+    def adopt(u: int) -> None:
+        """
+            Find a new parent for the orphan or free it.
+
+            Parameters
+            ----------
+            u : int
+                Orphan node.
+
+            Returns
+            -------
+            None.
+        """
+
+        nonlocal resume_node
+
+        u_tree = tree[u]
+        best_arc = ORPHAN
+        best_distance = INFINITE_DISTANCE
+
+        for a in range(offsets[u], offsets[u + 1]):
+            v = targets[a]
+
+            # Flow must be able to go from v to u in the source tree
+            # and from u to v in the sink tree
+            if tree[v] != u_tree or tree_capacity(u, reverse[a]) <= 0:
+                continue
+
+            d = origin_distance(v)
+            if d < best_distance:
+                best_distance = d
+                best_arc = reverse[a] if u_tree == SOURCE_TREE else a
+
+        if best_arc != ORPHAN:
+            parent[u] = best_arc
+            timestamp[u] = time
+            distance[u] = best_distance + 1
+            return
+
+        for a in range(offsets[u], offsets[u + 1]):
+            v = targets[a]
+
+            if tree[v] != u_tree:
+                continue
+
+            if tree_capacity(u, reverse[a]) > 0:
+                activate(v)
+
+            if parent[v] not in (ROOT, ORPHAN) and parent_node(v) == u:
+                parent[v] = ORPHAN
+                orphans.append(v)
+
+        tree[u] = FREE
+
+        if u == resume_node:
+            resume_node = -1
+
+    tree[source], tree[sink] = SOURCE_TREE, SINK_TREE
+    parent[source] = parent[sink] = ROOT
+    timestamp[source] = timestamp[sink] = time
+    activate(source)
+    activate(sink)
+
+    for u in np.flatnonzero(network.excess > 0).tolist():
+        if u != source and u != sink:
+            tree[u], parent[u] = SOURCE_TREE, ROOT
+            timestamp[u] = time
+            activate(u)
+
+    while (bridge := grow()) >= 0:
+        augment(bridge)
+        operations['augmentations'] += 1
+
+        time += 1
+        timestamp[source] = timestamp[sink] = time
+
+        while orphans:
+            adopt(orphans.popleft())
+            operations['orphans'] += 1
+
+        if (progress is not None and
+                operations['augmentations'] % PROGRESS_INTERVAL == 0 and
+                not progress(operations)):
+            raise SolverCancelled()
+
+    source_side = np.array(tree) == SOURCE_TREE
+
+    return FlowResult(flow_value, source_side, operations)
@@ -0,0 +1,248 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from algo.image_segmentation import (Point, Segmentator, gaussian,
+                                     points_to_arrays)
+
+__all__ = ['SegmentationCache']
+
+# Packed bits of a mask and its shape
+PackedMask = Tuple[np.ndarray, Tuple[int, int]]
+
+
+def pack_mask(mask: np.ndarray) -> PackedMask:
+    return np.packbits(mask, axis=None), mask.shape
+
+
+def unpack_mask(packed: PackedMask) -> np.ndarray:
+    bits, shape = packed
+    mask = np.unpackbits(bits, count=shape[0] * shape[1]).astype(bool)
+
+    return mask.reshape(shape)
+
+
+def image_key(image: Image.Image, params: Dict[str, Any]) -> str:
+    """
+        Return hash of the image content and the parameters.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(repr((image.mode, image.size,
+                        sorted(params.items()))).encode())
+    digest.update(image.tobytes())
+
+    return digest.hexdigest()
+
+
+class SegmentationCache:
+    """
+        Cache of segmentations keyed by the content of the image, the
+        parameters of Segmentator and the seeds.
+        Masks are stored as packed bits in memory, least recently used
+        ones are evicted once the size bound is exceeded, and in the
+        directory if it is given, so that they outlive the process and are
+        shared between processes. Segmentators of the last images may be
+        kept too: if the seeds of a request contain the seeds of a kept
+        segmentator, the new seeds are added and the costs are fitted to
+        all the seeds, then the network is solved warm started from its
+        residual network. The cut is the same as the one of a cold
+        solve, so warm started masks are stored under the same keys.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Size bound of the masks in memory. Default value: 64 MiB.
+        directory : str
+            Directory of the masks on disk, created if missing.
+            Default value: None.
+        max_states : int
+            Number of segmentators kept for warm start. Default value: 0.
+
+        Attributes
+        ----------
+        stats : Dict[str, int]
+            Numbers of hits in memory, hits on disk, misses, misses
+            solved by warm start and evictions from memory.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20,
+                 directory: Optional[str] = None,
+                 max_states: int = 0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_states = max_states
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self._masks: OrderedDict[str, PackedMask] = OrderedDict()
+        self._states: OrderedDict[str, Segmentator] = OrderedDict()
+        self._bytes = 0
+
+        self.stats: Dict[str, int] = dict.fromkeys(
+            ('hits', 'disk_hits', 'misses', 'warm_starts', 'evictions'), 0
+        )
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def segment(self,
+                image: Image.Image,
+                object_pixels: Iterable[Point],
+                background_pixels: Iterable[Point],
+                neighbors: int = 4,
+                lambda_: float = 1.0,
+                sigma: float = 1.0,
+                **segmentator_args: Any) -> np.ndarray:
+        """
+            Segment the image by Segmentator with the Gaussian boundary
+            cost, or return the cached mask.
+
+            Parameters
+            ----------
+            image : Image.Image
+                Image to segment.
+            object_pixels : Iterable[Point]
+                Object seeds.
+            background_pixels : Iterable[Point]
+                Background seeds.
+            neighbors : int
+                Number of neighbours of a pixel. Default value: 4.
+            lambda_ : float
+                Weight of the regional term. Default value: 1.0.
+            sigma : float
+                Sigma of the boundary cost. Default value: 1.0.
+            **segmentator_args : Any
+                Other arguments of Segmentator, their reprs are part of the
+                key, so they must not depend on the process, as numbers and
+                strings do.
+
+            Returns
+            -------
+            mask : np.ndarray
+                Boolean array of shape (height, width), True for object
+                pixels.
+        """
+
+        seeds = np.zeros((image.height, image.width), dtype=np.int8)
+        xs, ys = points_to_arrays(background_pixels)
+        seeds[ys, xs] = 2
+        xs, ys = points_to_arrays(object_pixels)
+        seeds[ys, xs] = 1
+
+        params = dict(segmentator_args, neighbors=neighbors,
+                      lambda_=lambda_, sigma=sigma)
+        state_key = image_key(image, params)
+        key = hashlib.sha256(state_key.encode() +
+                             seeds.tobytes()).hexdigest()
+
+        mask = self.get(key)
+        if mask is not None:
+            return mask
+
+        self.stats['misses'] += 1
+
+        segmentator = self._states.pop(state_key, None)
+
+        if (segmentator is not None and
+                np.all((segmentator.seeds == 0) |
+                       (segmentator.seeds == seeds))):
+            self.stats['warm_starts'] += 1
+
+            new_seeds = (segmentator.seeds == 0) & (seeds != 0)
+            ys, xs = np.nonzero(new_seeds & (seeds == 1))
+            new_object_pixels = list(zip(xs.tolist(), ys.tolist()))
+            ys, xs = np.nonzero(new_seeds & (seeds == 2))
+            new_background_pixels = list(zip(xs.tolist(), ys.tolist()))
+
+            # Costs are fitted to all the seeds, as a cold solve does,
+            # so the mask does not depend on the order of the requests
+            relative_cost = segmentator.relative_cost_gen(
+                image, object_pixels, background_pixels, segmentator.K
+            )
+            mask = segmentator.reweight(
+                relative_cost, object_pixels=new_object_pixels,
+                background_pixels=new_background_pixels
+            ).copy()
+        else:
+            segmentator = Segmentator(image, neighbors, lambda_,
+                                      gaussian(sigma), **segmentator_args)
+            mask = segmentator.mark(object_pixels, background_pixels,
+                                    as_mask=True).copy()
+
+        if self.max_states > 0:
+            self._states[state_key] = segmentator
+
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+        self.put(key, mask)
+
+        return mask
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+            Return cached mask or None, masks found on disk are moved to
+            memory.
+        """
+
+        packed = self._masks.get(key)
+
+        if packed is not None:
+            self._masks.move_to_end(key)
+            self.stats['hits'] += 1
+            return unpack_mask(packed)
+
+        if self.directory is None:
+            return None
+
+        try:
+            with np.load(self._path(key)) as data:
+                packed = data['bits'], tuple(data['shape'].tolist())
+        except FileNotFoundError:
+            return None
+
+        self.stats['disk_hits'] += 1
+        self._store(key, packed)
+
+        return unpack_mask(packed)
+
+    def put(self, key: str, mask: np.ndarray) -> None:
+        """
+            Store mask in memory and on disk.
+        """
+
+        packed = pack_mask(mask)
+        self._store(key, packed)
+
+        if self.directory is not None:
+            # Renaming is atomic, readers never see a partial file
+            path = self._path(key)
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+
+            with open(temporary_path, 'wb') as f:
+                np.savez_compressed(f, bits=packed[0], shape=packed[1])
+
+            os.replace(temporary_path, path)
+
+    def _store(self, key: str, packed: PackedMask) -> None:
+        if key in self._masks:
+            self._bytes -= self._masks.pop(key)[0].nbytes
+
+        if packed[0].nbytes > self.max_bytes:
+            return
+
+        self._masks[key] = packed
+        self._bytes += packed[0].nbytes
+
+        while self._bytes > self.max_bytes:
+            _, (bits, _) = self._masks.popitem(last=False)
+            self._bytes -= bits.nbytes
+            self.stats['evictions'] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
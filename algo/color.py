@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+__all__ = ['GaussianMixture', 'color_features', 'fit_gmm', 'rgb_to_lab']
+
+# Reference white of sRGB, D65
+WHITE = np.array([0.95047, 1.0, 1.08883])
+
+RGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                       [0.2126729, 0.7151522, 0.0721750],
+                       [0.0193339, 0.1191920, 0.9503041]])
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+        Convert sRGB colors to CIE Lab.
+
+        Parameters
+        ----------
+        rgb : np.ndarray
+            Array of shape (..., 3) with values from 0 to 255.
+
+        Returns
+        -------
+        lab : np.ndarray
+            Array of shape (..., 3), lightness from 0 to 100.
+    """
+
+    rgb = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(rgb <= 0.04045, rgb / 12.92,
+                      ((rgb + 0.055) / 1.055) ** 2.4)
+
+    t = linear @ RGB_TO_XYZ.T / WHITE
+    f = np.where(t > (6 / 29) ** 3, np.cbrt(t),
+                 t / (3 * (6 / 29) ** 2) + 4 / 29)
+
+    return np.stack((116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+def color_features(pixels: np.ndarray, lab: bool = False) -> np.ndarray:
+    """
+        Return colors of the pixels as an array of shape (..., channels),
+        gray pixels have one channel.
+    """
+
+    pixels = np.asarray(pixels, dtype=np.float64)
+
+    if lab:
+        return rgb_to_lab(pixels)
+
+    if pixels.ndim == 2:
+        return pixels[..., np.newaxis]
+
+    return pixels
+
+
+@dataclass
+class GaussianMixture:
+    """
+        Gaussian mixture model with full covariance matrices.
+
+        Attributes
+        ----------
+        weights : np.ndarray
+            Array of shape (components,), weights of the components.
+        means : np.ndarray
+            Array of shape (components, channels).
+        covariances : np.ndarray
+            Array of shape (components, channels, channels).
+    """
+
+    weights: np.ndarray
+    means: np.ndarray
+    covariances: np.ndarray
+
+    def component_log_densities(self, samples: np.ndarray) -> np.ndarray:
+        """
+            Return array of shape (samples, components), logarithms of the
+            weighted densities of the components at the samples.
+        """
+
+        channels = samples.shape[1]
+        result = np.empty((len(samples), len(self.weights)))
+
+        for k, (mean, covariance) in enumerate(zip(self.means,
+                                                   self.covariances)):
+            cholesky = np.linalg.cholesky(covariance)
+            z = (samples - mean) @ np.linalg.inv(cholesky).T
+
+            result[:, k] = (np.log(self.weights[k]) -
+                            np.log(np.diag(cholesky)).sum() -
+                            0.5 * (channels * np.log(2 * np.pi) +
+                                   (z ** 2).sum(axis=1)))
+
+        return result
+
+    def log_likelihood(self, samples: np.ndarray) -> np.ndarray:
+        """
+            Return array of shape (samples,), logarithms of the density
+            of the mixture at the samples.
+        """
+
+        return np.logaddexp.reduce(self.component_log_densities(samples),
+                                   axis=1)
+
+
+def fit_gmm(samples: np.ndarray, components: int = 5,
+            iterations: int = 10, max_samples: int = 10000,
+            seed: int = 0) -> GaussianMixture:
+    """
+        Fit Gaussian mixture model to the samples by expectation
+        maximization.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            Array of shape (samples, channels).
+        components : int
+            Number of components, at most the number of samples.
+            Default value: 5.
+        iterations : int
+            Number of EM iterations. Default value: 10.
+        max_samples : int
+            If there are more samples, a random subset of this size is
+            used. Default value: 10000.
+        seed : int
+            Seed of the subset and of the initial means. Default value: 0.
+
+        Returns
+        -------
+        model : GaussianMixture
+            Fitted model.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if len(samples) > max_samples:
+        samples = samples[rng.choice(len(samples), max_samples,
+                                     replace=False)]
+
+    samples_num, channels = samples.shape
+    components = min(components, samples_num)
+
+    # Covariances are kept positive definite for constant colors
+    regularization = (1e-3 * (samples.var(axis=0).mean() + 1) *
+                      np.eye(channels))
+    covariance = np.cov(samples, rowvar=False, bias=True).reshape(channels,
+                                                                 channels)
+
+    model = GaussianMixture(
+        np.full(components, 1 / components),
+        samples[rng.choice(samples_num, components, replace=False)],
+        np.repeat((covariance + regularization)[np.newaxis],
+                  components, axis=0)
+    )
+
+    for _ in range(iterations):
+        log_densities = model.component_log_densities(samples)
+        responsibilities = np.exp(
+            log_densities -
+            np.logaddexp.reduce(log_densities, axis=1)[:, np.newaxis]
+        )
+
+        totals = responsibilities.sum(axis=0) + 1e-12
+        model.weights = totals / samples_num
+        model.means = responsibilities.T @ samples / totals[:, np.newaxis]
+
+        for k in range(components):
+            centered = samples - model.means[k]
+            model.covariances[k] = ((responsibilities[:, k, np.newaxis] *
+                                     centered).T @ centered / totals[k] +
+                                    regularization)
+
+    return model
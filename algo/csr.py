@@ -0,0 +1,726 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (Callable, Deque, Dict, Hashable, Iterator, List, Optional,
+                    Sequence, Union)
+
+import networkx as nx
+import numpy as np
+from algo.label_queue import HeightBuckets, HighestLabelQueue
+from algo.storage import ArrayStorage
+
+__all__ = ['CSRNetwork', 'FlowResult', 'SolverCancelled', 'SolverStats',
+           'push_relabel']
+
+# Applicable types for edges capacities
+numeric = Union[int, float]
+
+# Applicable types for nodes
+Node = Hashable
+
+# Receives operation counts of a running solver,
+# returns False to cancel it
+ProgressCallback = Callable[[Dict[str, int]], bool]
+
+# Number of discharged nodes between progress callbacks
+PROGRESS_INTERVAL = 1000
+
+# Work-based global relabeling: every relabel is worth RELABEL_WORK plus
+# the number of arcs of the node, global relabeling is applied once the
+# work exceeds a multiple of NODE_WORK * nodes + arcs, the cost of a search
+RELABEL_WORK = 12
+NODE_WORK = 6
+
+# Multiple used by the adaptive_push_relabel backend of Segmentator
+GLOBAL_RELABELING_WORK = 0.5
+
+
+@dataclass
+class SolverStats:
+    """
+        Statistics of a maximum flow computation.
+
+        Attributes
+        ----------
+        operations : Dict[str, int]
+            Number of operations of each kind done by the solver.
+        phase_times : Dict[str, float]
+            Wall time of every phase in seconds.
+    """
+
+    operations: Dict[str, int] = field(default_factory=dict)
+    phase_times: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.phase_times.values())
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+            Add wall time of the block to the phase.
+        """
+
+        timer_start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phase_times[name] = (self.phase_times.get(name, 0.0) +
+                                      time.perf_counter() - timer_start)
+
+
+# Receives statistics of a finished solver
+StatsCallback = Callable[[SolverStats], None]
+
+
+class SolverCancelled(Exception):
+    """
+        Raised by a solver cancelled by its progress callback.
+        Residual network is left in a state the solver can be warm started
+        from: push-relabel leaves a preflow with valid heights, augmenting
+        path solvers leave a flow.
+    """
+
+
+class CSRNetwork:
+    """
+        Residual network stored in compressed sparse row form.
+
+        Nodes are numbered from 0 to nodes_num - 1. Arcs leaving node u
+        occupy positions offsets[u], ..., offsets[u + 1] - 1 of the arc
+        arrays. For every arc a, targets[a] is its head, reverse[a] is the
+        index of the opposite arc and capacity[a] is its residual capacity.
+        Heights and excesses of the nodes are kept next to the arcs, so the
+        network holds the complete state of a push-relabel solver.
+
+        Parameters
+        ----------
+        offsets : np.ndarray
+            Array of nodes_num + 1 arc offsets.
+        targets : np.ndarray
+            Heads of the arcs.
+        reverse : np.ndarray
+            Indices of the opposite arcs.
+        capacity : np.ndarray
+            Residual capacities of the arcs.
+        labels : Sequence[Node]
+            Original names of the nodes, optional.
+        storage : ArrayStorage
+            Storage of the heights and excesses, in memory by default.
+    """
+
+    def __init__(self,
+                 offsets: np.ndarray,
+                 targets: np.ndarray,
+                 reverse: np.ndarray,
+                 capacity: np.ndarray,
+                 labels: Optional[Sequence[Node]] = None,
+                 storage: Optional[ArrayStorage] = None):
+        self.offsets = offsets
+        self.targets = targets
+        self.reverse = reverse
+        self.capacity = capacity
+
+        storage = storage or ArrayStorage()
+        self.height = storage.zeros('height', self.nodes_num, np.int64)
+        self.excess = storage.zeros('excess', self.nodes_num, capacity.dtype)
+
+        self.labels = labels
+        self.index: Dict[Node, int] = ({}
+                                       if labels is None else
+                                       {node: i
+                                        for i, node in enumerate(labels)})
+
+    @classmethod
+    def from_arcs(cls,
+                  nodes_num: int,
+                  tails: np.ndarray,
+                  heads: np.ndarray,
+                  capacities: np.ndarray,
+                  labels: Optional[Sequence[Node]] = None) -> 'CSRNetwork':
+        """
+            Build residual network from arrays of arcs.
+            Opposite arcs are added where missing, capacities of
+            duplicated arcs are summed up.
+
+            Parameters
+            ----------
+            nodes_num : int
+                Number of nodes in the network.
+            tails : np.ndarray
+                Tails of the arcs.
+            heads : np.ndarray
+                Heads of the arcs.
+            capacities : np.ndarray
+                Capacities of the arcs.
+            labels : Sequence[Node]
+                Original names of the nodes, optional.
+
+            Returns
+            -------
+            network : CSRNetwork
+                Residual network with zero flow.
+        """
+
+        tails = np.asarray(tails, dtype=np.int64)
+        heads = np.asarray(heads, dtype=np.int64)
+        capacities = np.asarray(capacities)
+
+        if not np.issubdtype(capacities.dtype, np.integer):
+            capacities = capacities.astype(np.float64)
+        else:
+            capacities = capacities.astype(np.int64)
+
+        keys = tails * nodes_num + heads
+        arc_keys = np.unique(np.concatenate((keys,
+                                             heads * nodes_num + tails)))
+
+        capacity = np.zeros(len(arc_keys), dtype=capacities.dtype)
+        np.add.at(capacity, np.searchsorted(arc_keys, keys), capacities)
+
+        arc_tails = arc_keys // nodes_num
+        targets = arc_keys % nodes_num
+        reverse = np.searchsorted(arc_keys, targets * nodes_num + arc_tails)
+
+        offsets = np.zeros(nodes_num + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_tails, minlength=nodes_num),
+                  out=offsets[1:])
+
+        return cls(offsets, targets, reverse, capacity, labels)
+
+    @classmethod
+    def from_graph(cls, graph: nx.DiGraph) -> 'CSRNetwork':
+        """
+            Build residual network from graph with 'capacity' edge attribute.
+
+            Parameters
+            ----------
+            graph : nx.DiGraph
+                Graph to build network of.
+
+            Returns
+            -------
+            network : CSRNetwork
+                Residual network with zero flow.
+        """
+
+        labels = list(graph.nodes)
+        index = {node: i for i, node in enumerate(labels)}
+
+        arcs_num = graph.number_of_edges()
+        tails = np.empty(arcs_num, dtype=np.int64)
+        heads = np.empty(arcs_num, dtype=np.int64)
+        capacities = []
+
+        for i, (u, v, capacity) in enumerate(graph.edges(data='capacity')):
+            tails[i] = index[u]
+            heads[i] = index[v]
+            capacities.append(capacity)
+
+        return cls.from_arcs(len(labels), tails, heads,
+                             np.array(capacities), labels)
+
+    @property
+    def nodes_num(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def arcs_num(self) -> int:
+        return len(self.targets)
+
+    def tails(self) -> np.ndarray:
+        """
+            Return tails of all arcs.
+        """
+
+        return np.repeat(np.arange(self.nodes_num), np.diff(self.offsets))
+
+    def find_arcs(self, tails: np.ndarray, heads: np.ndarray) -> np.ndarray:
+        """
+            Return indices of the arcs given by their ends.
+            All the arcs must exist in the network.
+
+            Parameters
+            ----------
+            tails : np.ndarray
+                Tails of the arcs.
+            heads : np.ndarray
+                Heads of the arcs.
+
+            Returns
+            -------
+            arcs : np.ndarray
+                Indices of the arcs.
+        """
+
+        arc_keys = self.tails() * self.nodes_num + self.targets
+
+        return np.searchsorted(arc_keys,
+                               np.asarray(tails) * self.nodes_num +
+                               np.asarray(heads))
+
+    def sink_distances(self, sink: int) -> List[int]:
+        """
+            Return distances from all nodes to the sink in the residual
+            network, found by reverse breadth-first search.
+
+            Parameters
+            ----------
+            sink : int
+                Sink of flow.
+
+            Returns
+            -------
+            distances : List[int]
+                Distances of the nodes, -1 for the nodes from which the sink
+                is unreachable.
+        """
+
+        offsets = memoryview(self.offsets)
+        targets = memoryview(self.targets)
+        reverse = memoryview(self.reverse)
+        capacity = memoryview(self.capacity)
+
+        distances = [-1] * self.nodes_num
+        distances[sink] = 0
+        queue: Deque[int] = deque([sink])
+
+        while len(queue) > 0:
+            u = queue.popleft()
+            u_distance = distances[u] + 1
+
+            for a in range(offsets[u], offsets[u + 1]):
+                v = targets[a]
+                if distances[v] < 0 and capacity[reverse[a]] > 0:
+                    distances[v] = u_distance
+                    queue.append(v)
+
+        return distances
+
+    def set_capacities(self, arcs: np.ndarray, capacities: np.ndarray,
+                       source: int) -> np.ndarray:
+        """
+            Set residual capacities of the arcs keeping the state of
+            push-relabel valid, so that the maximum flow can be continued
+            from it instead of being recomputed.
+            New arcs leaving the source are saturated at once, their excess
+            goes to the heads. Heights of the nodes that got a new residual
+            arc to a much lower node are decreased, as well as heights of
+            their predecessors, if needed.
+
+            Parameters
+            ----------
+            arcs : np.ndarray
+                Indices of the arcs. If an arc occurs several times,
+                the last capacity is used.
+            capacities : np.ndarray
+                New residual capacities of the arcs.
+            source : int
+                Source of flow.
+
+            Returns
+            -------
+            nodes : np.ndarray
+                Nodes whose excess or height has changed.
+        """
+
+        arcs, last = np.unique(np.asarray(arcs, dtype=np.int64)[::-1],
+                               return_index=True)
+        self.capacity[arcs] = np.asarray(capacities)[::-1][last]
+
+        tails = self.targets[self.reverse[arcs]]
+        heads = self.targets[arcs]
+
+        from_source = tails == source
+        source_arcs = arcs[from_source]
+        flow = self.capacity[source_arcs]
+
+        self.capacity[source_arcs] = 0
+        self.capacity[self.reverse[source_arcs]] += flow
+        np.add.at(self.excess, heads[from_source], flow)
+
+        offsets = memoryview(self.offsets)
+        targets = memoryview(self.targets)
+        reverse = memoryview(self.reverse)
+        capacity = memoryview(self.capacity)
+        height = memoryview(self.height)
+        excess = memoryview(self.excess)
+
+        changed_nodes = set(heads[from_source].tolist())
+        queue: Deque[int] = deque()
+
+        for a, u, v in zip(arcs[~from_source].tolist(),
+                           tails[~from_source].tolist(),
+                           heads[~from_source].tolist()):
+            if capacity[a] > 0 and height[u] > height[v] + 1:
+                height[u] = height[v] + 1
+                queue.append(u)
+
+        while queue:
+            u = queue.popleft()
+            u_height = height[u] + 1
+            changed_nodes.add(u)
+
+            for a in range(offsets[u], offsets[u + 1]):
+                v = targets[a]
+                r = reverse[a]
+
+                if capacity[r] <= 0 or height[v] <= u_height:
+                    continue
+
+                if v == source:
+                    excess[u] += capacity[r]
+                    capacity[a] += capacity[r]
+                    capacity[r] = 0
+                else:
+                    height[v] = u_height
+                    queue.append(v)
+
+        return np.array(sorted(changed_nodes), dtype=np.int64)
+
+    def label(self, u: int) -> Node:
+        return u if self.labels is None else self.labels[u]
+
+    def to_graph(self) -> nx.DiGraph:
+        """
+            Return residual network as graph.
+            Node attributes are excess and height, edge attribute is
+            residual capacity.
+
+            Parameters
+            ----------
+            None.
+
+            Returns
+            -------
+            network : nx.DiGraph
+                Residual network.
+        """
+
+        network = nx.DiGraph()
+
+        for u, (excess, height) in enumerate(zip(self.excess.tolist(),
+                                                 self.height.tolist())):
+            network.add_node(self.label(u), excess=excess, height=height)
+
+        for u, v, capacity in zip(self.tails().tolist(),
+                                  self.targets.tolist(),
+                                  self.capacity.tolist()):
+            network.add_edge(self.label(u), self.label(v), capacity=capacity)
+
+        return network
+
+
+@dataclass
+class FlowResult:
+    """
+        Result of a maximum flow computation on CSRNetwork.
+
+        Attributes
+        ----------
+        flow_value : numeric
+            Value of the maximum flow.
+        source_side : np.ndarray
+            Boolean mask of the nodes in the minimum cut of the network.
+        operations : Dict[str, int]
+            Number of operations of each kind done by the solver.
+    """
+
+    flow_value: numeric
+    source_side: np.ndarray
+    operations: Dict[str, int] = field(default_factory=dict)
+
+
+def min_cut_by_gap(height: np.ndarray) -> np.ndarray:
+    """
+        Return source side of the minimum cut of the network.
+        Valid heights of the final residual network required.
+
+        Parameters
+        ----------
+        height : np.ndarray
+            Heights of the nodes.
+
+        Returns
+        -------
+        source_side : np.ndarray
+            Boolean mask of the nodes above the lowest empty height.
+    """
+
+    gap_height = int(np.argmin(np.bincount(height, minlength=len(height) + 1)))
+
+    return height > gap_height
+
+
+def push_relabel(network: CSRNetwork, source: int, sink: int,
+                 global_relabeling_freq: int = 100,
+                 gap_relabeling: bool = False,
+                 active_nodes: Optional[np.ndarray] = None,
+                 progress: Optional[ProgressCallback] = None,
+                 global_relabeling_work: Optional[float] = None,
+                 source_relabeling: bool = False,
+                 cut_only: bool = False) -> FlowResult:
+    """
+        Calculate maximum flow of network in place.
+        Push-relabel algorithm with highest label selection rule is used.
+
+        Parameters
+        ----------
+        network : CSRNetwork
+            Residual network. Final residual network, heights and excesses
+            are stored in it.
+        source : int
+            Source of flow.
+        sink : int
+            Sink of flow.
+        global_relabeling_freq : int
+            Number of push-relabel operations between global relabelings.
+            If it is less than 1, global relabelings will not be used.
+            Default value: 100.
+        gap_relabeling : bool
+            If True, apply the gap heuristic. Default value: False.
+        active_nodes : np.ndarray
+            If given, the algorithm is warm started: heights and excesses
+            left in the network by the previous run (and adjusted by
+            CSRNetwork.set_capacities) are kept and only these nodes are
+            discharged initially. Otherwise, the residual capacities are
+            treated as a new network with zero flow. The work of a warm
+            start depends on how far the released excess has to travel,
+            not on the number of changed arcs: a small change may take a
+            large part of the work of a cold run. Default value: None.
+        progress : ProgressCallback
+            If given, it is called with the operation counts every
+            PROGRESS_INTERVAL discharges, SolverCancelled is raised if it
+            returns False. Default value: None.
+        global_relabeling_work : float
+            If given, global relabeling is applied once the work since the
+            previous one exceeds this multiple of NODE_WORK * nodes + arcs,
+            where every relabel is worth RELABEL_WORK plus the number of
+            arcs of the node, and global_relabeling_freq is ignored.
+            Default value: None.
+        source_relabeling : bool
+            If True, global relabeling also searches from the source: nodes
+            that cannot reach the sink are lifted to nodes number plus their
+            distance to the source, so their excess returns to the source
+            without being relabeled step by step. Default value: False.
+        cut_only : bool
+            If True, the algorithm stops once no active node is left below
+            the source by height: the excess of the other nodes cannot
+            reach the sink, so the flow value and the minimum cut are
+            already known. The excess is left in the network instead of
+            being returned to the source, the maximum preflow may be warm
+            started as well. Default value: False.
+
+        Returns
+        -------
+        result : FlowResult
+            Value of the maximum flow, the minimum cut and numbers of
+            pushes (saturating and not), relabels, discharges, global
+            relabelings, nodes visited by their searches, gaps and nodes
+            lifted by gaps.
+    """
+
+    nodes_num = network.nodes_num
+
+    # Memory views are much faster than NumPy arrays for scalar access
+    offsets = memoryview(network.offsets)
+    targets = memoryview(network.targets)
+    reverse = memoryview(network.reverse)
+    capacity = memoryview(network.capacity)
+    height = memoryview(network.height)
+    excess = memoryview(network.excess)
+
+    # Current arc of every node
+    current = memoryview(network.offsets[:-1].copy())
+
+    # Active nodes bucketed by height
+    nodes_queue: HighestLabelQueue = HighestLabelQueue()
+
+    # Nodes below the source by height, only used by the gap heuristic
+    height_buckets: HeightBuckets = HeightBuckets(nodes_num)
+
+    # Work between global relabelings: either the number of push-relabel
+    # operations, or the work of the relabels if the policy is adaptive
+    adaptive = global_relabeling_work is not None
+    push_work = 0 if adaptive else 1
+    work_limit: float = (
+        global_relabeling_work * (NODE_WORK * nodes_num + len(targets))
+        if adaptive else global_relabeling_freq
+    )
+    work: float = work_limit
+
+    # Nodes are discharged below this height only
+    height_limit = nodes_num if cut_only else 2 * nodes_num + 2
+
+    # Statistics of the algorithm
+    operations: Dict[str, int] = dict.fromkeys(
+        ('pushes', 'saturating_pushes', 'nonsaturating_pushes', 'relabels',
+         'discharges', 'global_relabelings', 'bfs_nodes', 'gaps',
+         'gap_nodes'), 0
+    )
+
+    def push(u: int, a: int, delta: numeric) -> None:
+        v = targets[a]
+
+        if excess[v] == 0 and v != source and v != sink:
+            nodes_queue.push(v, height[v])
+
+        capacity[a] -= delta
+        capacity[reverse[a]] += delta
+        excess[u] -= delta
+        excess[v] += delta
+
+    def fill_height_buckets() -> None:
+        height_buckets.clear()
+
+        for u in range(nodes_num):
+            if u != source:
+                height_buckets.move(u, height[u])
+
+    def gap(gap_height: int) -> None:
+        lifted_nodes = height_buckets.lift(gap_height)
+
+        for u in lifted_nodes:
+            height[u] = nodes_num + 1
+            if u in nodes_queue:
+                nodes_queue.push(u, nodes_num + 1)
+
+        operations['gaps'] += 1
+        operations['gap_nodes'] += len(lifted_nodes)
+
+    def relabel(u: int) -> None:
+        old_height = height[u]
+        new_height = 2 * nodes_num
+
+        for a in range(offsets[u], offsets[u + 1]):
+            if capacity[a] > 0:
+                new_height = min(new_height, height[targets[a]])
+
+        height[u] = new_height + 1
+        current[u] = offsets[u]
+
+        if gap_relabeling:
+            height_buckets.move(u, new_height + 1)
+            if (old_height < nodes_num and
+                    height_buckets.count(old_height) == 0):
+                gap(old_height)
+
+    def discharge(u: int) -> None:
+        nonlocal work
+
+        while excess[u] > 0 and height[u] < height_limit:
+            a = current[u]
+            end = offsets[u + 1]
+            u_height = height[u]
+
+            while a < end:
+                if capacity[a] > 0 and u_height == height[targets[a]] + 1:
+                    delta = min(excess[u], capacity[a])
+                    if delta == capacity[a]:
+                        operations['saturating_pushes'] += 1
+                    else:
+                        operations['nonsaturating_pushes'] += 1
+
+                    push(u, a, delta)
+                    work += push_work
+                    operations['pushes'] += 1
+
+                    if excess[u] == 0:
+                        break
+
+                a += 1
+
+            current[u] = a
+
+            if excess[u] > 0:
+                relabel(u)
+                work += (RELABEL_WORK + offsets[u + 1] - offsets[u]
+                         if adaptive else 1)
+                operations['relabels'] += 1
+
+    def global_relabeling() -> None:
+        new_height = network.sink_distances(sink)
+        visited = 1
+
+        if source_relabeling:
+            # Distances are searched the same way for any node
+            source_distances = network.sink_distances(source)
+            visited += 1
+
+        for u in range(nodes_num):
+            if u == source or u == sink:
+                continue
+
+            if new_height[u] >= 0:
+                height[u] = new_height[u]
+                visited += 1
+            elif source_relabeling:
+                # Nodes that reach neither terminal have no excess,
+                # they are lifted above all others
+                if source_distances[u] >= 0:
+                    height[u] = nodes_num + source_distances[u]
+                    visited += 1
+                else:
+                    height[u] = 2 * nodes_num
+            elif height[u] < nodes_num:
+                # Sink is unreachable from node in residual network
+                height[u] = nodes_num + 1
+
+            current[u] = offsets[u]
+
+            if excess[u] > 0:
+                nodes_queue.push(u, height[u])
+
+        if gap_relabeling:
+            fill_height_buckets()
+
+        operations['global_relabelings'] += 1
+        operations['bfs_nodes'] += visited
+
+    def choose_next_node() -> Optional[int]:
+        nonlocal work
+
+        if work_limit > 0 and work >= work_limit:
+            work = 0
+            global_relabeling()
+
+        while nodes_queue:
+            u = nodes_queue.pop()
+            if height[u] < height_limit:
+                return u
+
+        return None
+
+    if active_nodes is None:
+        network.height[:] = 0
+        network.excess[:] = 0
+        height[source] = nodes_num
+
+        for a in range(offsets[source], offsets[source + 1]):
+            if capacity[a] > 0:
+                excess[source] += capacity[a]
+                push(source, a, capacity[a])
+    else:
+        # Labels are valid, postpone the first global relabeling
+        work = 0
+
+        for u in active_nodes.tolist():
+            if excess[u] > 0 and u != source and u != sink:
+                nodes_queue.push(u, height[u])
+
+    if gap_relabeling:
+        fill_height_buckets()
+
+    while (node := choose_next_node()) is not None:
+        discharge(node)
+        operations['discharges'] += 1
+
+        if (progress is not None and
+                operations['discharges'] % PROGRESS_INTERVAL == 0 and
+                not progress(operations)):
+            raise SolverCancelled()
+
+    return FlowResult(network.excess[sink].item(),
+                      min_cut_by_gap(network.height), operations)
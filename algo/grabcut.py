@@ -0,0 +1,69 @@
+from typing import Any, Iterable
+
+import numpy as np
+from PIL import Image
+from algo.color import color_features, fit_gmm
+from algo.image_segmentation import (Point, Segmentator, gmm_cost,
+                                     gmm_relative_cost)
+
+__all__ = ['grabcut']
+
+
+def grabcut(image: Image.Image,
+            object_pixels: Iterable[Point],
+            background_pixels: Iterable[Point],
+            iterations: int = 5,
+            components: int = 5,
+            lab: bool = True,
+            **segmentator_args: Any) -> np.ndarray:
+    """
+        Segment the image by GrabCut.
+        Color models are fitted to the seeds first, then they are refitted
+        to the labels of the segmentation and the image is segmented
+        again, until the labels stop changing. Every segmentation is warm
+        started from the flow of the previous one.
+
+        Parameters
+        ----------
+        image : Image.Image
+            Image to segment, RGB if lab is True.
+        object_pixels : Iterable[Point]
+            Object seeds.
+        background_pixels : Iterable[Point]
+            Background seeds.
+        iterations : int
+            Maximum number of refitting iterations. Default value: 5.
+        components : int
+            Number of components of the color models. Default value: 5.
+        lab : bool
+            Whether the colors are compared in Lab color space.
+            Default value: True.
+        **segmentator_args : Any
+            Arguments of Segmentator.
+
+        Returns
+        -------
+        mask : np.ndarray
+            Boolean array of shape (height, width), True for object pixels.
+    """
+
+    segmentator = Segmentator(image, lab=lab,
+                              relative_cost_gen=gmm_cost(components, lab),
+                              **segmentator_args)
+    mask = segmentator.mark(object_pixels, background_pixels, as_mask=True)
+    features = color_features(np.asarray(image), lab)
+
+    for _ in range(iterations):
+        # Labels always contain the seeds of both kinds
+        models = {'object': fit_gmm(features[mask], components),
+                  'background': fit_gmm(features[~mask], components)}
+
+        previous_mask = mask
+        mask = segmentator.reweight(
+            gmm_relative_cost(models, lab, segmentator.K)
+        )
+
+        if np.array_equal(mask, previous_mask):
+            break
+
+    return mask
@@ -1,11 +1,16 @@
 from collections import deque
-from operator import itemgetter
-from queue import PriorityQueue
+from itertools import compress
 from typing import Deque, Dict, Hashable, List, Optional, Tuple, Union
 
 import networkx as nx
+import numpy as np
+from algo.boykov_kolmogorov import boykov_kolmogorov
+from algo.csr import (NODE_WORK, RELABEL_WORK, CSRNetwork, FlowResult,
+                      SolverStats, StatsCallback, min_cut_by_gap,
+                      push_relabel)
+from algo.label_queue import HeightBuckets, HighestLabelQueue
 
-__all__ = ['get_max_flow']
+__all__ = ['get_max_flow', 'get_max_flow_bk', 'get_max_flow_csr']
 
 # Applicable types for edges capacities
 numeric = Union[int, float]
@@ -16,7 +21,14 @@ Node = Hashable
 
 def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
                  global_relabeling_freq: int = 100,
-                 value_only: bool = True) -> nx.DiGraph:
+                 value_only: bool = True,
+                 gap_relabeling: bool = False,
+                 in_place: bool = False,
+                 stats: bool = False,
+                 stats_callback: Optional[StatsCallback] = None,
+                 global_relabeling_work: Optional[float] = None,
+                 cut_only: bool = False
+                 ) -> nx.DiGraph:
     """
         Calculate maximum flow of graph.
         Push-relabel algorithm with highest label selection rule is used.
@@ -36,17 +48,56 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
         value_only : bool
             If True, compute a maximum flow; otherwise, compute a maximum flow
             and a s-t cut. Default value: True.
+        gap_relabeling : bool
+            If True, apply the gap heuristic: once no node is left at some
+            height below nodes number, all nodes above it are lifted over
+            the source at once. Default value: False.
+        in_place : bool
+            If True, graph itself is turned into the residual network:
+            missing reverse edges are added with zero capacity, capacities
+            are replaced by residual ones and the attributes are set on
+            graph, so no copies of the graph are made. The residual network
+            of a previous call may be passed again. Default value: False.
+        stats : bool
+            If True, the stats attribute is added to the result.
+            Default value: False.
+        stats_callback : StatsCallback
+            If given, it is called with the stats when the computation is
+            finished. Default value: None.
+        global_relabeling_work : float
+            If given, global relabeling is applied once the work since the
+            previous one exceeds this multiple of NODE_WORK * nodes + edges,
+            where every relabel is worth RELABEL_WORK plus the degree of the
+            node, and global_relabeling_freq is ignored.
+            Default value: None.
+        cut_only : bool
+            If True, nodes are not discharged once they are above the
+            source by height: their excess cannot reach the sink, so the
+            flow value and the cut are already known. The excess is left in
+            res_net, which holds a maximum preflow instead of a flow.
+            Default value: False.
 
         Returns
         -------
         graph : nx.DiGraph
             If value_only is True, returns the initial graph
-            with one additional attribute: flow_value;
-            Otherwise, returns the initial graph with three additional
-            attributes: flow_value, s_cut, t_cut.
+            with additional attributes: flow_value, res_net, operations;
+            Otherwise, returns the initial graph with additional
+            attributes: flow_value, res_net, operations, s_cut, t_cut.
+            If in_place is True, graph itself is returned and res_net is
+            graph too; otherwise, graph is not modified.
 
             flow_value : numeric
                 Value of the maximum flow.
+            res_net : nx.DiGraph
+                Final residual network.
+            operations : Dict[str, int]
+                Number of pushes (saturating and not), relabels,
+                discharges, global relabelings, nodes visited by their
+                searches, gaps and nodes lifted by gaps.
+            stats : SolverStats
+                Operations and wall time of the phases: residual_build,
+                discharge, cut and result_build. Only if stats is True.
             s_cut : List[Node]
                 List of graph nodes in the minimum cut of the network.
             t_cut : List[Node]
@@ -57,13 +108,32 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
     nodes_num: int = graph.order()
 
     # State of the algorithm
-    nodes_queue: PriorityQueue = PriorityQueue()
+    nodes_queue: HighestLabelQueue = HighestLabelQueue()
 
-    # Residual network of the algorithm
-    network: nx.DiGraph = graph.copy()
+    # Residual network of the algorithm, built from graph
+    # by build_residual_network unless in_place is set
+    network: nx.DiGraph = graph
 
-    # Push-relabel counter
-    operation_counter: int = global_relabeling_freq
+    # Nodes below the source by height, only used by the gap heuristic
+    height_buckets: HeightBuckets = HeightBuckets(nodes_num)
+
+    # Work between global relabelings: either the number of push-relabel
+    # operations, or the work of the relabels if the policy is adaptive,
+    # the limit of the latter is set once the residual network is built
+    adaptive: bool = global_relabeling_work is not None
+    work_limit: float = global_relabeling_freq
+    work: float = 0
+
+    # Nodes are discharged below this height only
+    height_limit: int = nodes_num if cut_only else 2 * nodes_num + 2
+
+    # Statistics of the algorithm
+    operations: Dict[str, int] = dict.fromkeys(
+        ('pushes', 'saturating_pushes', 'nonsaturating_pushes', 'relabels',
+         'discharges', 'global_relabelings', 'bfs_nodes', 'gaps',
+         'gap_nodes'), 0
+    )
+    solver_stats: SolverStats = SolverStats(operations)
 
     def get_height(u: Node) -> int:
         return network.nodes[u]['height']
@@ -91,24 +161,21 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
                 List of graph nodes that are not in s_cut.
         """
 
-        network_nodes = list(network.nodes(data='height'))
-        gap_height = -1
+        nodes = list(network.nodes)
+        heights = np.fromiter((height for _, height
+                               in network.nodes(data='height')),
+                              dtype=np.int64, count=len(nodes))
 
-        network_nodes.sort(key=itemgetter(1))
-        for node in network_nodes:
-            node_height = node[1]
-            gap_height += 1
-            if node_height > gap_height:
-                break
+        source_side = min_cut_by_gap(heights)
 
-        # node[0] - name of node, node[1] - height of node
-        s_cut = [node[0] for node in network_nodes if node[1] > gap_height]
-        t_cut = [node[0] for node in network_nodes if node[1] < gap_height]
+        s_cut = list(compress(nodes, source_side))
+        t_cut = list(compress(nodes, ~source_side))
 
         return s_cut, t_cut
 
     def is_push_allowed(u: Node, v: Node) -> bool:
         return (get_excess(u) > 0 and
+                get_residual_capacity(u, v) > 0 and
                 get_height(u) == get_height(v) + 1)
 
     def build_residual_network() -> None:
@@ -127,30 +194,73 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
 
         nonlocal network
 
-        new_graph: nx.DiGraph = nx.DiGraph()
+        if in_place:
+            reverse_edges = [(v, u) for u, v in network.edges
+                             if not network.has_edge(v, u)]
+            network.add_edges_from(reverse_edges, capacity=0)
+
+            for node_data in network.nodes.values():
+                node_data['excess'] = 0
+                node_data['height'] = 0
+        else:
+            new_graph: nx.DiGraph = nx.DiGraph()
 
-        for node in network.nodes:
-            new_graph.add_node(node, excess=0, height=0)
+            for node in network.nodes:
+                new_graph.add_node(node, excess=0, height=0)
 
-        new_graph.nodes[source]['height'] = nodes_num
+            for (u, v), edge_data in network.edges.items():
+                capacity = edge_data['capacity']
 
-        for (u, v), edge_data in network.edges.items():
-            capacity = edge_data['capacity']
+                if not new_graph.has_edge(u, v):
+                    new_graph.add_edge(u, v, capacity=capacity)
+                    new_graph.add_edge(v, u, capacity=0)
+                else:
+                    new_graph[u][v]['capacity'] = capacity
 
-            if not new_graph.has_edge(u, v):
-                new_graph.add_edge(u, v, capacity=capacity)
-                new_graph.add_edge(v, u, capacity=0)
-            else:
-                new_graph[u][v]['capacity'] = capacity
+            network = new_graph
 
-        network = new_graph.copy()
+        network.nodes[source]['height'] = nodes_num
 
-        for u, v in new_graph.edges(source):
-            flow = new_graph[u][v]['capacity']
+        for u, v in network.edges(source):
+            flow = get_residual_capacity(u, v)
             if flow > 0:
                 push(u, v, flow)
 
-    def push(u: Node, v: Node, delta: Optional[numeric] = None) -> None:
+        if gap_relabeling:
+            fill_height_buckets()
+
+    def fill_height_buckets() -> None:
+        height_buckets.clear()
+
+        for u, height in network.nodes(data='height'):
+            if u != source:
+                height_buckets.move(u, height)
+
+    def gap(height: int) -> None:
+        """
+            Lift all nodes above the empty height over the source.
+
+            Parameters
+            ----------
+            height : int
+                Height with no nodes.
+
+            Returns
+            -------
+            None.
+        """
+
+        lifted_nodes = height_buckets.lift(height)
+
+        for u in lifted_nodes:
+            network.nodes[u]['height'] = nodes_num + 1
+            if u in nodes_queue:
+                nodes_queue.push(u, nodes_num + 1)
+
+        operations['gaps'] += 1
+        operations['gap_nodes'] += len(lifted_nodes)
+
+    def push(u: Node, v: Node, delta: Optional[numeric] = None) -> bool:
         """
             Apply push operation to node.
 
@@ -166,20 +276,23 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
 
             Returns
             -------
-            None.
+            saturating : bool
+                Whether the residual capacity of the edge became zero.
         """
 
         delta = delta or min(get_excess(u),
                              get_residual_capacity(u, v))
 
         if v not in (source, sink) and get_excess(v) == 0 and delta > 0:
-            nodes_queue.put((-get_height(v), v))
+            nodes_queue.push(v, get_height(v))
 
         network[u][v]['capacity'] -= delta
         network[v][u]['capacity'] += delta
         network.nodes[u]['excess'] -= delta
         network.nodes[v]['excess'] += delta
 
+        return get_residual_capacity(u, v) == 0
+
     def relabel(u: Node) -> None:
         """
             Apply relabel operation to node.
@@ -194,11 +307,18 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
             None.
         """
 
+        old_height: int = get_height(u)
         new_height: int = min(get_height(v)
                               for v in network.neighbors(u)
                               if get_residual_capacity(u, v) > 0) + 1
         network.nodes[u]['height'] = new_height
 
+        if gap_relabeling:
+            height_buckets.move(u, new_height)
+            if (old_height < nodes_num and
+                    height_buckets.count(old_height) == 0):
+                gap(old_height)
+
     def discharge(u: Node) -> None:
         """
             Apply push and relabel operations until node excess become zero.
@@ -213,17 +333,26 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
             None.
         """
 
-        nonlocal operation_counter
+        nonlocal work
+
+        operations['discharges'] += 1
 
-        while get_excess(u) > 0:
+        while get_excess(u) > 0 and get_height(u) < height_limit:
             for v in network.neighbors(u):
                 if is_push_allowed(u, v):
-                    push(u, v)
-                    operation_counter += 1
+                    if push(u, v):
+                        operations['saturating_pushes'] += 1
+                    else:
+                        operations['nonsaturating_pushes'] += 1
+
+                    if not adaptive:
+                        work += 1
+                    operations['pushes'] += 1
 
             if get_excess(u) > 0:
                 relabel(u)
-                operation_counter += 1
+                work += (RELABEL_WORK + len(network[u]) if adaptive else 1)
+                operations['relabels'] += 1
 
     def global_relabeling() -> None:
         """
@@ -268,23 +397,30 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
 
             return heights
 
-        nonlocal nodes_queue
-
-        nodes_queue = PriorityQueue()
-
         heights: Dict[Node, int] = reverse_bfs(sink)
+        operations['bfs_nodes'] += len(heights)
 
         # Mark nodes from which sink is unreachable in residual flow.
+        # Such nodes that are already above the source are not discharged
+        # anymore: their excess cannot reach the sink.
         for u, node_data in network.nodes.items():
-            if u not in heights and node_data['height'] < nodes_num:
-                heights[u] = nodes_num + 1
+            if u not in heights:
+                if node_data['height'] < nodes_num:
+                    heights[u] = nodes_num + 1
+                else:
+                    nodes_queue.remove(u)
 
         del heights[sink]
 
         for u, new_height in heights.items():
             network.nodes[u]['height'] = new_height
             if get_excess(u) > 0:
-                nodes_queue.put((-new_height, u))
+                nodes_queue.push(u, new_height)
+
+        if gap_relabeling:
+            fill_height_buckets()
+
+        operations['global_relabelings'] += 1
 
     def choose_next_node() -> Union[Node, None]:
         """
@@ -301,29 +437,198 @@ def get_max_flow(graph: nx.DiGraph, source: Node, sink: Node,
                 Next node or None.
         """
 
-        nonlocal operation_counter
+        nonlocal work
 
-        if (global_relabeling_freq > 0 and
-                operation_counter >= global_relabeling_freq):
-            operation_counter = 0
+        if work_limit > 0 and work >= work_limit:
+            work = 0
             global_relabeling()
 
-        if not nodes_queue.empty():
-            return nodes_queue.get()[1]
+        while nodes_queue:
+            u = nodes_queue.pop()
+            if get_height(u) < height_limit:
+                return u
 
         return None
 
-    build_residual_network()
+    with solver_stats.phase('residual_build'):
+        build_residual_network()
+
+    if adaptive:
+        work_limit = global_relabeling_work * (NODE_WORK * nodes_num +
+                                               network.number_of_edges())
+
+    # First global relabeling is applied at once
+    work = work_limit
+
+    with solver_stats.phase('discharge'):
+        while node := choose_next_node():
+            discharge(node)
+
+    attributes = dict(flow_value=get_excess(sink), res_net=network,
+                      operations=operations)
+
+    if stats:
+        attributes['stats'] = solver_stats
+
+    if not value_only:
+        with solver_stats.phase('cut'):
+            attributes['s_cut'], attributes['t_cut'] = get_s_t_cut()
+
+    with solver_stats.phase('result_build'):
+        if in_place:
+            graph.graph.update(attributes)
+        else:
+            graph = nx.DiGraph(graph, **attributes)
+
+    if stats_callback is not None:
+        stats_callback(solver_stats)
+
+    return graph
+
+
+def get_max_flow_csr(graph: nx.DiGraph, source: Node, sink: Node,
+                     global_relabeling_freq: int = 100,
+                     value_only: bool = True,
+                     gap_relabeling: bool = False,
+                     stats: bool = False,
+                     stats_callback: Optional[StatsCallback] = None,
+                     global_relabeling_work: Optional[float] = None,
+                     source_relabeling: bool = False,
+                     cut_only: bool = False
+                     ) -> nx.DiGraph:
+    """
+        Calculate maximum flow of graph.
+        Same as get_max_flow, but the residual network is stored in flat
+        arrays with integer node ids instead of networkx attributes.
+
+        Parameters
+        ----------
+        graph : nx.DiGraph
+            Graph to find maximum flow in.
+        source : Node
+            Source of flow.
+        sink : Node
+            Sink of flow.
+        global_relabeling_freq : int
+            Number of push-relabel operations between global relabelings.
+            If it is less than 1, global relabelings will not be used.
+            Default value: 100.
+        value_only : bool
+            If True, compute a maximum flow; otherwise, compute a maximum flow
+            and a s-t cut. Default value: True.
+        gap_relabeling : bool
+            If True, apply the gap heuristic. Default value: False.
+        stats : bool
+            If True, the stats attribute is added to the result.
+            Default value: False.
+        stats_callback : StatsCallback
+            If given, it is called with the stats when the computation is
+            finished. Default value: None.
+        global_relabeling_work : float
+            Same as in get_max_flow. Default value: None.
+        source_relabeling : bool
+            Same as in push_relabel. Default value: False.
+        cut_only : bool
+            Same as in get_max_flow. Default value: False.
+
+        Returns
+        -------
+        graph : nx.DiGraph
+            Same as in get_max_flow.
+    """
+
+    solver_stats = SolverStats()
+
+    with solver_stats.phase('residual_build'):
+        network = CSRNetwork.from_graph(graph)
+
+    with solver_stats.phase('discharge'):
+        result = push_relabel(network, network.index[source],
+                              network.index[sink], global_relabeling_freq,
+                              gap_relabeling,
+                              global_relabeling_work=global_relabeling_work,
+                              source_relabeling=source_relabeling,
+                              cut_only=cut_only)
+
+    return _result_graph(graph, network, result, value_only,
+                         solver_stats, stats, stats_callback)
+
+
+def get_max_flow_bk(graph: nx.DiGraph, source: Node, sink: Node,
+                    value_only: bool = True,
+                    stats: bool = False,
+                    stats_callback: Optional[StatsCallback] = None
+                    ) -> nx.DiGraph:
+    """
+        Calculate maximum flow of graph.
+        Boykov-Kolmogorov algorithm is used. It is usually faster than
+        push-relabel on grid graphs built by Segmentator.
+
+        Parameters
+        ----------
+        graph : nx.DiGraph
+            Graph to find maximum flow in.
+        source : Node
+            Source of flow.
+        sink : Node
+            Sink of flow.
+        value_only : bool
+            If True, compute a maximum flow; otherwise, compute a maximum flow
+            and a s-t cut. Default value: True.
+        stats : bool
+            If True, the stats attribute is added to the result.
+            Default value: False.
+        stats_callback : StatsCallback
+            If given, it is called with the stats when the computation is
+            finished. Default value: None.
+
+        Returns
+        -------
+        graph : nx.DiGraph
+            Same as in get_max_flow, operations are numbers of
+            augmentations and orphans, time of the augmentations is the
+            discharge phase.
+    """
+
+    solver_stats = SolverStats()
+
+    with solver_stats.phase('residual_build'):
+        network = CSRNetwork.from_graph(graph)
+
+    with solver_stats.phase('discharge'):
+        result = boykov_kolmogorov(network, network.index[source],
+                                   network.index[sink])
+
+    return _result_graph(graph, network, result, value_only,
+                         solver_stats, stats, stats_callback)
+
+
+def _result_graph(graph: nx.DiGraph, network: CSRNetwork,
+                  result: FlowResult, value_only: bool,
+                  solver_stats: SolverStats, stats: bool,
+                  stats_callback: Optional[StatsCallback]) -> nx.DiGraph:
+    """
+        Return result of get_max_flow_csr and get_max_flow_bk.
+    """
+
+    solver_stats.operations = result.operations
+    attributes = dict(flow_value=result.flow_value,
+                      operations=result.operations)
+
+    if stats:
+        attributes['stats'] = solver_stats
+
+    if not value_only:
+        with solver_stats.phase('cut'):
+            attributes['s_cut'] = [network.labels[u] for u in
+                                   np.flatnonzero(result.source_side)]
+            attributes['t_cut'] = [network.labels[u] for u in
+                                   np.flatnonzero(~result.source_side)]
 
-    while node := choose_next_node():
-        discharge(node)
+    with solver_stats.phase('result_build'):
+        graph = nx.DiGraph(graph, res_net=network.to_graph(), **attributes)
 
-    if value_only:
-        graph = nx.DiGraph(graph, flow_value=get_excess(sink),
-                           res_net=network)
-    else:
-        s_cut, t_cut = get_s_t_cut()
-        graph = nx.DiGraph(graph, flow_value=get_excess(sink),
-                           res_net=network, s_cut=s_cut, t_cut=t_cut)
+    if stats_callback is not None:
+        stats_callback(solver_stats)
 
     return graph
@@ -0,0 +1,393 @@
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from algo.csr import CSRNetwork
+from algo.storage import ArrayStorage, strip_rows
+
+__all__ = ['GridGraph', 'dilate']
+
+Delta = Tuple[int, int]
+
+
+def dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """
+        Return mask dilated by a square of side 2 * radius + 1.
+    """
+
+    result = mask.copy()
+
+    # Rows are dilated first, then columns through the transposed view.
+    # Reach of the dilation grows up to twice per shift, so only
+    # O(log radius) shifts are needed
+    for _ in range(2):
+        reach = 0
+        while reach < radius:
+            shift = min(reach + 1, radius - reach)
+            source = result.copy()
+            result[shift:] |= source[:-shift]
+            result[:-shift] |= source[shift:]
+            reach += shift
+
+        result = result.T
+
+    return result
+
+
+class GridGraph:
+    """
+        Graph of a pixel lattice with terminals.
+        Nodes and arcs are implicit: node of pixel (x, y) is
+        y * width + x, source and sink nodes follow the pixels.
+        Capacities are stored as arrays:
+
+        capacity : np.ndarray
+            Array of shape (height, width, K), capacity[y, x, k] is the
+            capacity of the arc from pixel (x, y) to its neighbour
+            (x + dx, y + dy), where (dx, dy) = deltas[k]. Capacities of arcs
+            leading outside the image are zero.
+        source_capacity : np.ndarray
+            Array of shape (height, width), capacities of the arcs
+            from the source to pixels.
+        sink_capacity : np.ndarray
+            Array of shape (height, width), capacities of the arcs
+            from pixels to the sink.
+
+        Parameters
+        ----------
+        width : int
+            Width of the image.
+        height : int
+            Height of the image.
+        deltas : Iterable[Delta]
+            Offsets of the neighbours, for every offset its opposite one
+            must be present too.
+        storage : ArrayStorage
+            Storage of the capacities and of the arrays of the network
+            built by to_network, in memory by default.
+    """
+
+    def __init__(self, width: int, height: int, deltas: Iterable[Delta],
+                 storage: Optional[ArrayStorage] = None):
+        self.width = width
+        self.height = height
+        self.deltas: List[Delta] = list(deltas)
+        self.storage = storage or ArrayStorage()
+
+        assert all((-dx, -dy) in self.deltas for dx, dy in self.deltas)
+
+        self.capacity = self.storage.zeros('grid_capacity',
+                                           (height, width, len(self.deltas)))
+        self.source_capacity = self.storage.zeros('source_capacity',
+                                                  (height, width))
+        self.sink_capacity = self.storage.zeros('sink_capacity',
+                                                (height, width))
+
+    @property
+    def pixels_num(self) -> int:
+        return self.width * self.height
+
+    @property
+    def source(self) -> int:
+        return self.pixels_num
+
+    @property
+    def sink(self) -> int:
+        return self.pixels_num + 1
+
+    def node(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def neighbor_mask(self, k: int, rows: slice = slice(None)) -> np.ndarray:
+        """
+            Return boolean mask of the pixels of the rows whose k-th
+            neighbour lies inside the image.
+        """
+
+        dx, dy = self.deltas[k]
+        ys = np.arange(self.height)[rows, np.newaxis]
+        xs = np.arange(self.width)
+
+        return ((0 <= xs + dx) & (xs + dx < self.width) &
+                (0 <= ys + dy) & (ys + dy < self.height))
+
+    def source_arcs(self, nodes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+            Return indices of the arcs from the source to the pixel nodes,
+            all of the pixels by default, in the network built by
+            to_network.
+        """
+
+        if nodes is None:
+            nodes = np.arange(self.pixels_num)
+
+        return self.pixels_num * (len(self.deltas) + 2) + nodes
+
+    def sink_arcs(self, nodes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+            Return indices of the arcs from the pixel nodes, all of the
+            pixels by default, to the sink in the network built by
+            to_network.
+        """
+
+        if nodes is None:
+            nodes = np.arange(self.pixels_num)
+
+        return nodes * (len(self.deltas) + 2) + len(self.deltas) + 1
+
+    def tiles(self, tile_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Split the image into square tiles for the parallel solver.
+            Tiles are colored so that tiles of the same color are never
+            adjacent: color of tile (i, j) is 2 * (j % 2) + i % 2.
+
+            Parameters
+            ----------
+            tile_size : int
+                Side of a tile, not less than the longest neighbour offset.
+
+            Returns
+            -------
+            tile_of : np.ndarray
+                Tile of every node of the network built by to_network,
+                -1 for the source and the sink.
+            tile_color : np.ndarray
+                Color of every tile.
+        """
+
+        assert all(max(abs(dx), abs(dy)) <= tile_size
+                   for dx, dy in self.deltas)
+
+        tiles_x = -(-self.width // tile_size)
+        tiles_y = -(-self.height // tile_size)
+
+        tile_of = self.storage.zeros('tile_of', self.pixels_num + 2,
+                                     np.int64)
+        tile_of[self.pixels_num:] = -1
+
+        tiles_of_row = np.arange(self.width) // tile_size
+        rows = strip_rows(self.width)
+
+        for y in range(0, self.height, rows):
+            ys = np.arange(y, min(y + rows, self.height))[:, np.newaxis]
+            tile_of[y * self.width:(y + len(ys)) * self.width] = (
+                ys // tile_size * tiles_x + tiles_of_row
+            ).ravel()
+
+        tile_ys, tile_xs = np.divmod(np.arange(tiles_x * tiles_y), tiles_x)
+        tile_color = 2 * (tile_ys % 2) + tile_xs % 2
+
+        return tile_of, tile_color
+
+    def to_network(self) -> CSRNetwork:
+        """
+            Build residual network of the graph.
+            Every pixel has K + 2 arcs: K arcs to its neighbours, arc to the
+            source and arc to the sink. Arcs to neighbours outside the image
+            are zero capacity loops. They are followed by the arcs of the
+            source and the arcs of the sink, one per pixel.
+
+            Parameters
+            ----------
+            None.
+
+            Returns
+            -------
+            network : CSRNetwork
+                Residual network with zero flow.
+        """
+
+        pixels_num = self.pixels_num
+        neighbors = len(self.deltas)
+        row = neighbors + 2
+
+        source_offset = pixels_num * row
+        sink_offset = source_offset + pixels_num
+        arcs_num = sink_offset + pixels_num
+
+        offsets = self.storage.zeros('offsets', pixels_num + 3, np.int64)
+        targets = self.storage.zeros('targets', arcs_num, np.int64)
+        reverse = self.storage.zeros('reverse', arcs_num, np.int64)
+        capacity = self.storage.zeros('capacity', arcs_num)
+
+        pixel_targets = targets[:source_offset].reshape(pixels_num, row)
+        pixel_reverse = reverse[:source_offset].reshape(pixels_num, row)
+        pixel_capacity = capacity[:source_offset].reshape(pixels_num, row)
+
+        # Arrays are filled strip by strip of rows,
+        # so that the temporary arrays stay small
+        rows = strip_rows(self.width)
+
+        for y in range(0, self.height, rows):
+            strip = slice(y, min(y + rows, self.height))
+            pixels = np.arange(strip.start * self.width,
+                               strip.stop * self.width)
+            arcs = slice(pixels[0], pixels[-1] + 1)
+
+            for k, (dx, dy) in enumerate(self.deltas):
+                inside = self.neighbor_mask(k, strip).ravel()
+                neighbor = pixels + dy * self.width + dx
+                opposite = self.deltas.index((-dx, -dy))
+
+                pixel_targets[arcs, k] = np.where(inside, neighbor, pixels)
+                pixel_reverse[arcs, k] = np.where(inside,
+                                                  neighbor * row + opposite,
+                                                  pixels * row + k)
+                pixel_capacity[arcs, k] = np.where(
+                    inside, self.capacity[strip, :, k].ravel(), 0
+                )
+
+            pixel_targets[arcs, neighbors] = self.source
+            pixel_targets[arcs, neighbors + 1] = self.sink
+            pixel_reverse[arcs, neighbors] = source_offset + pixels
+            pixel_reverse[arcs, neighbors + 1] = sink_offset + pixels
+            pixel_capacity[arcs, neighbors + 1] = (
+                self.sink_capacity[strip].ravel()
+            )
+
+            offsets[arcs] = pixels * row
+
+            source_arcs = slice(source_offset + arcs.start,
+                                source_offset + arcs.stop)
+            targets[source_arcs] = pixels
+            reverse[source_arcs] = pixels * row + neighbors
+            capacity[source_arcs] = self.source_capacity[strip].ravel()
+
+            sink_arcs = slice(sink_offset + arcs.start,
+                              sink_offset + arcs.stop)
+            targets[sink_arcs] = pixels
+            reverse[sink_arcs] = pixels * row + neighbors + 1
+
+        offsets[pixels_num:] = (source_offset, sink_offset, arcs_num)
+
+        return CSRNetwork(offsets, targets, reverse, capacity,
+                          storage=self.storage)
+
+    def band_network(self, band: np.ndarray,
+                     labels: np.ndarray) -> Tuple[CSRNetwork, np.ndarray]:
+        """
+            Build residual network of the pixels of the band only.
+            Pixels outside the band are fixed to their labels and merged
+            into the terminals: arcs between a band pixel and a fixed object
+            pixel become arcs from the source, arcs to a fixed background
+            pixel become arcs to the sink.
+
+            Parameters
+            ----------
+            band : np.ndarray
+                Boolean array of shape (height, width), pixels to solve.
+            labels : np.ndarray
+                Boolean array of shape (height, width), True for the object
+                pixels. Only labels outside the band are used.
+
+            Returns
+            -------
+            network : CSRNetwork
+                Residual network with zero flow. Node i is the i-th pixel
+                of the band, source and sink are the last two nodes.
+            pixels : np.ndarray
+                Nodes of the band pixels in the whole graph.
+        """
+
+        band = band.ravel()
+        labels = labels.ravel()
+
+        pixels = np.flatnonzero(band)
+        band_size = len(pixels)
+        source, sink = band_size, band_size + 1
+
+        index = np.full(self.pixels_num, -1, dtype=np.int64)
+        index[pixels] = np.arange(band_size)
+
+        source_capacity = self.source_capacity.ravel()[pixels]
+        sink_capacity = self.sink_capacity.ravel()[pixels]
+        capacity = self.capacity.reshape(self.pixels_num, -1)
+
+        tails, heads, capacities = [], [], []
+
+        for k, (dx, dy) in enumerate(self.deltas):
+            inside = self.neighbor_mask(k).ravel()[pixels]
+            pixels_inside = pixels[inside]
+            neighbors = pixels_inside + dy * self.width + dx
+            opposite = self.deltas.index((-dx, -dy))
+
+            in_band = band[neighbors]
+            tails.append(index[pixels_inside[in_band]])
+            heads.append(index[neighbors[in_band]])
+            capacities.append(capacity[pixels_inside[in_band], k])
+
+            # Every pixel has at most one neighbour at the offset,
+            # so the indices are unique
+            fixed = ~in_band & labels[neighbors]
+            source_capacity[index[pixels_inside[fixed]]] += capacity[
+                neighbors[fixed], opposite
+            ]
+
+            fixed = ~in_band & ~labels[neighbors]
+            sink_capacity[index[pixels_inside[fixed]]] += capacity[
+                pixels_inside[fixed], k
+            ]
+
+        nodes = np.arange(band_size)
+        tails += [np.full(band_size, source), nodes]
+        heads += [nodes, np.full(band_size, sink)]
+        capacities += [source_capacity, sink_capacity]
+
+        network = CSRNetwork.from_arcs(band_size + 2,
+                                       np.concatenate(tails),
+                                       np.concatenate(heads),
+                                       np.concatenate(capacities))
+
+        return network, pixels
+
+    def region_network(self, regions: np.ndarray) -> CSRNetwork:
+        """
+            Build residual network of the regions of the pixels.
+            Every region is a node, capacities of the arcs between pixels
+            of two regions and of the terminal arcs of the pixels of a
+            region are summed up, so that the capacity of a cut of the
+            network equals the capacity of the corresponding cut of the
+            pixel graph.
+
+            Parameters
+            ----------
+            regions : np.ndarray
+                Integer array of shape (height, width), regions of the
+                pixels numbered from 0.
+
+            Returns
+            -------
+            network : CSRNetwork
+                Residual network with zero flow. Node i is the i-th region,
+                source and sink are the last two nodes.
+        """
+
+        regions = regions.ravel()
+        regions_num = int(regions.max()) + 1
+        source, sink = regions_num, regions_num + 1
+
+        pixels = np.arange(self.pixels_num)
+        capacity = self.capacity.reshape(self.pixels_num, -1)
+
+        tails, heads, capacities = [], [], []
+
+        for k, (dx, dy) in enumerate(self.deltas):
+            inside = pixels[self.neighbor_mask(k).ravel()]
+            neighbors = inside + dy * self.width + dx
+
+            crossing = regions[inside] != regions[neighbors]
+            tails.append(regions[inside[crossing]])
+            heads.append(regions[neighbors[crossing]])
+            capacities.append(capacity[inside[crossing], k])
+
+        nodes = np.arange(regions_num)
+        tails += [np.full(regions_num, source), nodes]
+        heads += [nodes, np.full(regions_num, sink)]
+        capacities += [np.bincount(regions, self.source_capacity.ravel(),
+                                   regions_num),
+                       np.bincount(regions, self.sink_capacity.ravel(),
+                                   regions_num)]
+
+        return CSRNetwork.from_arcs(regions_num + 2,
+                                    np.concatenate(tails),
+                                    np.concatenate(heads),
+                                    np.concatenate(capacities))
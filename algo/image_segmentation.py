@@ -1,112 +1,653 @@
 from itertools import product
-from math import dist, exp, log
-from typing import Callable, Dict, Iterable, Literal, NewType, Tuple
+from math import hypot
+from typing import (Callable, Dict, Iterable, List, Literal, NewType,
+                    Optional, Tuple, Union)
 
-import networkx as nx
+import numpy as np
 from PIL import Image
-from algo.graph_utils import get_max_flow
+from algo.boykov_kolmogorov import boykov_kolmogorov
+from algo.color import GaussianMixture, color_features, fit_gmm, rgb_to_lab
+from algo.csr import (GLOBAL_RELABELING_WORK, CSRNetwork, FlowResult,
+                      ProgressCallback, SolverCancelled, push_relabel)
+from algo.grid_graph import GridGraph, dilate
+from algo.parallel_push_relabel import parallel_push_relabel
+from algo.storage import ArrayStorage, strip_rows
 
 Point = NewType('Point', Tuple[int, int])
 PointType = Literal['object', 'background']
 
-BoundaryCostFunction = Callable[[int, int, Point, Point], float]
+# Receives intensities of two neighbouring pixels, color vectors for
+# color images, and the pixels, returns the weight of the arc
+BoundaryCostFunction = Callable[[Union[float, np.ndarray],
+                                 Union[float, np.ndarray], Point, Point],
+                                float]
 
-RelativeCostFunction = Callable[[int, PointType], float]
+# Receives intensities of pixels, intensities of their neighbours at the
+# same offset and the length of the offset, returns weights of the arcs
+VectorBoundaryCostFunction = Callable[[np.ndarray, np.ndarray, float],
+                                      np.ndarray]
+
+# Receives intensities of pixels, returns their costs
+RelativeCostFunction = Callable[[np.ndarray, PointType], np.ndarray]
 RelativeCostGenerator = Callable[[Image.Image,
                                   Iterable[Point],
                                   Iterable[Point],
                                   float],
                                  RelativeCostFunction]
 
+# Receives residual network, source, sink, nodes affected by the
+# changes since the previous run, or None on the first run,
+# and optional progress callback
+MaxFlowFunction = Callable[[CSRNetwork, int, int, Optional[np.ndarray],
+                            Optional[ProgressCallback]],
+                           FlowResult]
+
+# Maximum flow algorithms available to Segmentator,
+# only the minimum cut is needed
+max_flow_backends: Dict[str, MaxFlowFunction] = {
+    'push_relabel': (
+        lambda network, source, sink, active_nodes, progress: push_relabel(
+            network, source, sink, network.nodes_num//10,
+            active_nodes=active_nodes, progress=progress, cut_only=True
+        )
+    ),
+    # Faster on high-contrast images only, see
+    # benchmarks/global_relabeling.py
+    'adaptive_push_relabel': (
+        lambda network, source, sink, active_nodes, progress: push_relabel(
+            network, source, sink, active_nodes=active_nodes,
+            progress=progress, global_relabeling_work=GLOBAL_RELABELING_WORK,
+            cut_only=True
+        )
+    ),
+    'boykov_kolmogorov': (
+        lambda network, source, sink, _, progress: boykov_kolmogorov(
+            network, source, sink, progress
+        )
+    )
+}
+
+
+def vectorized_cost(cost: VectorBoundaryCostFunction
+                    ) -> VectorBoundaryCostFunction:
+    """
+        Mark boundary cost function as taking whole intensity arrays.
+        Functions not marked are treated as BoundaryCostFunction.
+    """
+
+    cost.vectorized = True
+
+    return cost
+
+
+def boundary_cost_adapter(cost: BoundaryCostFunction,
+                          delta: Tuple[int, int],
+                          origin: Point) -> VectorBoundaryCostFunction:
+    """
+        Adapt scalar boundary cost function to intensity arrays.
+        Element [j, i] of the arrays corresponds to the pixel
+        (origin_x + i, origin_y + j) and its neighbour at delta.
+        Color arrays of shape (H, W, C) are passed to the function
+        as color vectors of the pixels.
+    """
+
+    dx, dy = delta
+    origin_x, origin_y = origin
+
+    def inner(i_p: np.ndarray, i_q: np.ndarray, _: float) -> np.ndarray:
+        shape = i_p.shape[:2]
+        weights = np.empty(shape)
+
+        if i_p.ndim == 3:
+            p_values = i_p.reshape(-1, i_p.shape[2])
+            q_values = i_q.reshape(-1, i_q.shape[2])
+        else:
+            p_values, q_values = i_p.ravel().tolist(), i_q.ravel().tolist()
+
+        for (j, i), p_value, q_value in zip(np.ndindex(shape),
+                                            p_values, q_values):
+            p = (origin_x + i, origin_y + j)
+            q = (origin_x + i + dx, origin_y + j + dy)
+            weights[j, i] = cost(p_value, q_value, p, q)
+
+        return weights
+
+    return inner
+
+
+def gaussian(sigma: float) -> VectorBoundaryCostFunction:
+    @vectorized_cost
+    def inner(i_p: np.ndarray, i_q: np.ndarray,
+              distance: float) -> np.ndarray:
+        squared_distance = (i_p - i_q) ** 2
 
-def gaussian(sigma: float) -> BoundaryCostFunction:
-    def inner(i_p: int, i_q: int, p: Point, q: Point) -> float:
-        return exp(-(i_p - i_q) ** 2 / (2 * sigma ** 2)) / dist(p, q)
+        # Colors are compared by the euclidean distance
+        if squared_distance.ndim == 3:
+            squared_distance = squared_distance.sum(axis=2)
+
+        return np.exp(-squared_distance / (2 * sigma ** 2)) / distance
 
     return inner
 
 
+def points_to_arrays(points: Iterable[Point]) -> Tuple[np.ndarray,
+                                                       np.ndarray]:
+    """
+        Return x and y coordinates of the points as two arrays.
+    """
+
+    coordinates = np.array(list(points), dtype=np.int64).reshape(-1, 2)
+
+    return coordinates[:, 0], coordinates[:, 1]
+
+
 def histogram_cost(image: Image.Image,
                    object_points: Iterable[Point],
                    background_points: Iterable[Point],
                    infinity: float = 1e6) -> RelativeCostFunction:
-    object_histogram: Dict[int, int] = dict()
-    background_histogram: Dict[int, int] = dict()
+    intensities = np.asarray(image)
+
+    # -log(freq) for each of 256 intensities
+    tables: Dict[PointType, np.ndarray] = dict()
 
-    object_num = len(object_points)
-    background_num = len(background_points)
+    for point_type, points in (('object', object_points),
+                               ('background', background_points)):
+        xs, ys = points_to_arrays(points)
+        histogram = np.bincount(intensities[ys, xs], minlength=256)
 
-    for point in object_points:
-        pixel = image.getpixel(point)
-        object_histogram[pixel] = object_histogram.get(pixel, 0) + 1
+        table = np.full(256, infinity, dtype=np.float64)
+        table[histogram > 0] = -np.log(histogram[histogram > 0] / len(xs))
+        tables[point_type] = table
 
-    for point in background_points:
-        pixel = image.getpixel(point)
-        background_histogram[pixel] = background_histogram.get(pixel, 0) + 1
+    def inner(intensity: np.ndarray, point_type: PointType) -> np.ndarray:
+        return tables[point_type][intensity]
 
-    def inner(intensity: int, point_type: PointType) -> float:
-        if point_type == 'object':
-            freq = object_histogram.get(intensity, 0) / object_num
-        elif point_type == 'background':
-            freq = background_histogram.get(intensity, 0) / background_num
+    inner.tables = tables
+
+    return inner
 
-        if freq == 0.0:
-            return infinity
 
-        return -log(freq)
+def gmm_relative_cost(models: Dict[PointType, GaussianMixture],
+                      lab: bool = False,
+                      infinity: float = 1e6) -> RelativeCostFunction:
+    """
+        Return relative cost function of the Gaussian mixture models of
+        the object and background colors. Cost of a label is the negative
+        logarithm of its posterior probability with equal priors.
+
+        Parameters
+        ----------
+        models : Dict[PointType, GaussianMixture]
+            Models of the colors of both kinds of pixels.
+        lab : bool
+            Whether the models are fitted to Lab colors, pixels are given
+            in RGB anyway. Default value: False.
+        infinity : float
+            Maximum cost. Default value: 1e6.
+
+        Returns
+        -------
+        relative_cost : RelativeCostFunction
+            Relative cost function.
+    """
+
+    def inner(intensity: np.ndarray, point_type: PointType) -> np.ndarray:
+        features = color_features(intensity, lab)
+        samples = features.reshape(-1, features.shape[-1])
+
+        log_likelihoods = {key: model.log_likelihood(samples)
+                           for key, model in models.items()}
+        costs = (np.logaddexp(log_likelihoods['object'],
+                              log_likelihoods['background']) -
+                 log_likelihoods[point_type])
+
+        return np.minimum(costs, infinity).reshape(features.shape[:-1])
+
+    inner.models = models
 
     return inner
 
 
+def gmm_cost(components: int = 5, lab: bool = False) -> RelativeCostGenerator:
+    """
+        Return relative cost generator fitting Gaussian mixture models to
+        the colors of the seeds, works for both gray and RGB images.
+
+        Parameters
+        ----------
+        components : int
+            Number of components of every model. Default value: 5.
+        lab : bool
+            If True, models are fitted in Lab color space, RGB image
+            required. Default value: False.
+
+        Returns
+        -------
+        generator : RelativeCostGenerator
+            Relative cost generator.
+    """
+
+    def generator(image: Image.Image,
+                  object_points: Iterable[Point],
+                  background_points: Iterable[Point],
+                  infinity: float = 1e6) -> RelativeCostFunction:
+        pixels = np.asarray(image)
+        models: Dict[PointType, GaussianMixture] = dict()
+
+        for point_type, points in (('object', object_points),
+                                   ('background', background_points)):
+            xs, ys = points_to_arrays(points)
+            samples = pixels[ys, xs].reshape(len(xs), -1).astype(np.float64)
+
+            if lab:
+                samples = rgb_to_lab(samples)
+
+            models[point_type] = fit_gmm(samples, components)
+
+        return gmm_relative_cost(models, lab, infinity)
+
+    return generator
+
+
 class Segmentator:
     def __init__(self,
                  image: Image.Image,
                  neighbors: int = 4,
                  lambda_: float = 1.0,
-                 boundary_cost: BoundaryCostFunction = gaussian(1.0),
-                 relative_cost_gen: RelativeCostGenerator = histogram_cost):
+                 boundary_cost: Union[BoundaryCostFunction,
+                                      VectorBoundaryCostFunction
+                                      ] = gaussian(1.0),
+                 relative_cost_gen: RelativeCostGenerator = histogram_cost,
+                 max_flow: str = 'push_relabel',
+                 workers: int = 1,
+                 tile_size: int = 64,
+                 lab: bool = False,
+                 storage_dir: Optional[str] = None):
         deltas_dict = {
             4: [x for x in product((-1, 1), repeat=2)],
             8: [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
         }
 
         assert neighbors in deltas_dict.keys()
+        assert (max_flow in max_flow_backends.keys() or
+                max_flow == 'parallel_push_relabel')
 
         deltas = deltas_dict[neighbors]
         self.width, self.height = image.size
-
-        self.graph = nx.DiGraph()
-        self.K = 0
-
-        for cx, cy in product(range(self.width), range(self.height)):
-            max_node_flow = 0.0
-
-            for dx, dy in deltas:
-                x, y = cx + dx, cy + dy
-
-                if (0 <= x < self.width) and (0 <= y < self.height):
-                    weight = boundary_cost(image.getpixel((cx, cy)),
-                                           image.getpixel((x, y)),
-                                           (cx, cy), (x, y))
-                    self.graph.add_edge((cx, cy), (x, y),
-                                        capacity=weight)
-                    max_node_flow += weight
-
-            self.K = max(self.K, max_node_flow)
+        self.lab = lab
+
+        # Out-of-core mode: arrays of the graph and of the network are
+        # memory-mapped files of storage_dir, working sets of the solvers
+        # are not
+        self.graph = GridGraph(self.width, self.height, deltas,
+                               ArrayStorage(storage_dir))
+        pixels = np.asarray(image)
+
+        # Capacities are computed strip by strip of rows with the rows of
+        # the neighbours around them
+        margin = max(abs(dy) for _, dy in deltas)
+        rows = strip_rows(self.width)
+        self.K = 0.0
+
+        for y in range(0, self.height, rows):
+            strip = slice(y, min(y + rows, self.height))
+            top = max(0, y - margin)
+            intensities = self._intensities(
+                pixels[top:min(strip.stop + margin, self.height)]
+            )
+
+            for k, (dx, dy) in enumerate(deltas):
+                # Pixels whose neighbour at (dx, dy) lies inside the image
+                xs = slice(max(0, -dx), self.width - max(0, dx))
+                ys = slice(max(strip.start, -dy),
+                           min(strip.stop, self.height - max(0, dy)))
+                neighbor_xs = slice(xs.start + dx, xs.stop + dx)
+                neighbor_ys = slice(ys.start + dy - top, ys.stop + dy - top)
+
+                if ys.start >= ys.stop:
+                    continue
+
+                if getattr(boundary_cost, 'vectorized', False):
+                    cost = boundary_cost
+                else:
+                    cost = boundary_cost_adapter(boundary_cost, (dx, dy),
+                                                 (xs.start, ys.start))
+
+                self.graph.capacity[ys, xs, k] = cost(
+                    intensities[ys.start - top:ys.stop - top, xs],
+                    intensities[neighbor_ys, neighbor_xs],
+                    hypot(dx, dy)
+                )
+
+            self.K = max(self.K,
+                         self.graph.capacity[strip].sum(axis=2).max())
 
         self.K += 1
+
         self.image = image
         self.lambda_ = lambda_
         self.relative_cost_gen = relative_cost_gen
 
+        if max_flow == 'parallel_push_relabel':
+            # Tiling depends on the image, so the backend is built here
+            tile_of, tile_color = self.graph.tiles(tile_size)
+            self.max_flow = (
+                lambda network, source, sink, active_nodes, progress:
+                parallel_push_relabel(network, source, sink, tile_of,
+                                      tile_color, workers, active_nodes,
+                                      progress, cut_only=True)
+            )
+
+            # Band and region networks are not tiled
+            self.subnetwork_max_flow = max_flow_backends['push_relabel']
+        else:
+            self.max_flow = max_flow_backends[max_flow]
+            self.subnetwork_max_flow = self.max_flow
+
+        # Warm started push-relabel may take a large part of a cold solve
+        # for a small correction, Boykov-Kolmogorov takes time proportional
+        # to the change, so later solves use it with every backend
+        self.correction_max_flow = max_flow_backends['boykov_kolmogorov']
+
         self.first_run = True
 
+        # Whether the last solve was cancelled and left excess in network
+        self.interrupted = False
+
+        # Nodes changed by refine, the network is not solved until the
+        # next mark discharges them
+        self._stale_nodes = np.empty(0, dtype=np.int64)
+
+        # Labels of the last segmentation, True for object pixels
+        self.labels: Optional[np.ndarray] = None
+
+        # Seeds of every kind, 1 for object and 2 for background pixels
+        self.seeds = np.zeros((self.height, self.width), dtype=np.int8)
+
+        # Seeds of the cancelled refines, their bands are segmented by the
+        # next refine unless mark segments the whole image first
+        self._unrefined_seeds = np.zeros((self.height, self.width),
+                                         dtype=bool)
+
+    def _intensities(self, pixels: np.ndarray) -> np.ndarray:
+        intensities = np.asarray(pixels, dtype=np.float64)
+
+        # Boundary costs of RGB images compare Lab colors if lab is True
+        if self.lab:
+            return rgb_to_lab(intensities)
+
+        return intensities
+
+    def _cut(self, result: FlowResult) -> Tuple[List, List]:
+        source_side = result.source_side[:self.graph.pixels_num]
+
+        s = [(node % self.width, node // self.width)
+             for node in np.flatnonzero(source_side).tolist()]
+        t = [(node % self.width, node // self.width)
+             for node in np.flatnonzero(~source_side).tolist()]
+
+        return s + ['s'], t + ['t']
+
+    def _mask(self, result: FlowResult) -> np.ndarray:
+        source_side = result.source_side[:self.graph.pixels_num]
+
+        return source_side.reshape(self.height, self.width)
+
+    def _set_terminal_capacities(self, object_pixels: Iterable[Point],
+                                 background_pixels: Iterable[Point]) -> None:
+        self.relative_cost = self.relative_cost_gen(self.image,
+                                                    object_pixels,
+                                                    background_pixels,
+                                                    self.K)
+
+        intensities = np.asarray(self.image)
+        source_capacity = self.graph.source_capacity
+        sink_capacity = self.graph.sink_capacity
+        rows = strip_rows(self.width)
+
+        for y in range(0, self.height, rows):
+            strip = slice(y, y + rows)
+            source_capacity[strip] = self.lambda_ * self.relative_cost(
+                intensities[strip], 'background'
+            )
+            sink_capacity[strip] = self.lambda_ * self.relative_cost(
+                intensities[strip], 'object'
+            )
+
+        self.seeds[:] = 0
+
+        xs, ys = points_to_arrays(background_pixels)
+        source_capacity[ys, xs] = 0.0
+        sink_capacity[ys, xs] = self.K
+        self.seeds[ys, xs] = 2
+
+        xs, ys = points_to_arrays(object_pixels)
+        source_capacity[ys, xs] = self.K
+        sink_capacity[ys, xs] = 0.0
+        self.seeds[ys, xs] = 1
+
+    def _add_seeds(self, object_pixels: Iterable[Point],
+                   background_pixels: Iterable[Point]) -> np.ndarray:
+        """
+            Make the new seeds hard constraints in the graph and in the
+            residual network, return the nodes changed in the network.
+        """
+
+        nodes, source_capacities, sink_capacities = [], [], []
+
+        # Object seeds are applied last, as on the first run
+        for pixels, s_extra, t_extra, seed in (
+            (background_pixels, 0.0, self.K, 2),
+            (object_pixels, self.K, 0.0, 1)
+        ):
+            xs, ys = points_to_arrays(pixels)
+            self.seeds[ys, xs] = seed
+
+            nodes.append(self.graph.node(xs, ys))
+            source_capacities.append(np.full(len(xs), s_extra))
+            sink_capacities.append(np.full(len(xs), t_extra))
+
+        # Only the changed terminal arcs are applied,
+        # the rest of the previous solution is reused
+        return self._change_terminal_capacities(
+            np.concatenate(nodes), np.concatenate(source_capacities),
+            np.concatenate(sink_capacities)
+        )
+
+    def _change_terminal_capacities(self, nodes: np.ndarray,
+                                    source_capacity: np.ndarray,
+                                    sink_capacity: np.ndarray) -> np.ndarray:
+        """
+            Set terminal capacities of the pixel nodes in the graph and in
+            the residual network, return the nodes changed in the network.
+            Residual capacities of the terminal arcs are changed by the
+            differences of the capacities and shifted by the same amount if
+            any of them would become negative, which changes the cut
+            capacities by a constant only. If a node occurs several times,
+            the last capacities are used.
+        """
+
+        graph_source_capacity = self.graph.source_capacity.reshape(-1)
+        graph_sink_capacity = self.graph.sink_capacity.reshape(-1)
+
+        source_arcs = self.graph.source_arcs(nodes)
+        sink_arcs = self.graph.sink_arcs(nodes)
+        capacity = self.network.capacity
+
+        source_residual = capacity[source_arcs] + (
+            source_capacity - graph_source_capacity[nodes]
+        )
+        sink_residual = capacity[sink_arcs] + (
+            sink_capacity - graph_sink_capacity[nodes]
+        )
+        shift = np.maximum(0, -np.minimum(source_residual, sink_residual))
+
+        graph_source_capacity[nodes] = source_capacity
+        graph_sink_capacity[nodes] = sink_capacity
+
+        return self.network.set_capacities(
+            np.concatenate((source_arcs, sink_arcs)),
+            np.concatenate((source_residual + shift, sink_residual + shift)),
+            self.graph.source
+        )
+
+    def _solve(self, active_nodes: Optional[np.ndarray],
+               progress: Optional[ProgressCallback]) -> FlowResult:
+        """
+            Solve the network warm started from the active nodes, or from
+            scratch if they are None, and store the labels.
+        """
+
+        if active_nodes is not None:
+            active_nodes = np.union1d(active_nodes, self._stale_nodes)
+
+            if self.interrupted:
+                # Excess left by the cancelled solve is discharged too
+                active_nodes = np.union1d(
+                    active_nodes, np.flatnonzero(self.network.excess > 0)
+                )
+
+        max_flow = (self.max_flow if active_nodes is None else
+                    self.correction_max_flow)
+
+        try:
+            result = max_flow(self.network, self.graph.source,
+                              self.graph.sink, active_nodes, progress)
+        except SolverCancelled:
+            self.interrupted = True
+            raise
+
+        self.interrupted = False
+        self._stale_nodes = np.empty(0, dtype=np.int64)
+        self._unrefined_seeds[:] = False
+        self.labels = self._mask(result)
+
+        return result
+
+    def mark_band(self,
+                  object_pixels: Iterable[Point],
+                  background_pixels: Iterable[Point],
+                  band: np.ndarray,
+                  labels: np.ndarray) -> np.ndarray:
+        """
+            Segment the pixels of the band only, the rest of the pixels
+            keep their labels. Network built by mark is left intact.
+
+            Parameters
+            ----------
+            object_pixels : Iterable[Point]
+                Object seeds.
+            background_pixels : Iterable[Point]
+                Background seeds.
+            band : np.ndarray
+                Boolean array of shape (height, width), pixels to segment.
+            labels : np.ndarray
+                Boolean array of shape (height, width), labels of the pixels
+                outside the band, True for object pixels.
+
+            Returns
+            -------
+            mask : np.ndarray
+                Boolean array of shape (height, width), True for object
+                pixels.
+        """
+
+        self._set_terminal_capacities(object_pixels, background_pixels)
+
+        network, pixels = self.graph.band_network(band, labels)
+        result = self.subnetwork_max_flow(network, len(pixels),
+                                          len(pixels) + 1, None, None)
+
+        mask = labels.copy()
+        mask.ravel()[pixels] = result.source_side[:len(pixels)]
+
+        return mask
+
+    def mark_regions(self,
+                     object_pixels: Iterable[Point],
+                     background_pixels: Iterable[Point],
+                     regions: np.ndarray) -> np.ndarray:
+        """
+            Segment the image assigning the same label to all pixels of a
+            region. Network built by mark is left intact.
+
+            Parameters
+            ----------
+            object_pixels : Iterable[Point]
+                Object seeds.
+            background_pixels : Iterable[Point]
+                Background seeds. Regions containing seeds of both kinds
+                are not constrained.
+            regions : np.ndarray
+                Integer array of shape (height, width), regions of the
+                pixels numbered from 0.
+
+            Returns
+            -------
+            mask : np.ndarray
+                Boolean array of shape (height, width), True for object
+                pixels.
+        """
+
+        self._set_terminal_capacities(object_pixels, background_pixels)
+
+        # Seeds must stay hard constraints after their capacities are
+        # summed up with the rest of their regions
+        hard = (self.graph.capacity.sum() +
+                self.graph.source_capacity.sum() +
+                self.graph.sink_capacity.sum() + 1)
+
+        xs, ys = points_to_arrays(background_pixels)
+        self.graph.sink_capacity[ys, xs] = hard
+
+        xs, ys = points_to_arrays(object_pixels)
+        self.graph.source_capacity[ys, xs] = hard
+
+        network = self.graph.region_network(regions)
+        regions_num = network.nodes_num - 2
+        result = self.subnetwork_max_flow(network, regions_num,
+                                          regions_num + 1, None, None)
+
+        return result.source_side[regions]
+
     def mark(self,
              object_pixels: Iterable[Point] = set(),
-             background_pixels: Iterable[Point] = set()):
-
-        def rebuild_graph():
-            return self.graph.graph['res_net']
+             background_pixels: Iterable[Point] = set(),
+             as_mask: bool = False,
+             progress: Optional[ProgressCallback] = None
+             ) -> Union[Tuple[List, List], np.ndarray, None]:
+        """
+            Add seeds and segment the image.
+            Later calls are warm started from the previous residual
+            network and solved by Boykov-Kolmogorov whatever the backend
+            is: warm started push-relabel is not proportional to the new
+            seeds, on a 128x128 image at lambda_ 0.02 a stroke of 18
+            pixels took about half the time of a cold solve, while
+            Boykov-Kolmogorov takes a few milliseconds, see
+            benchmarks/small_edits.py.
+
+            Parameters
+            ----------
+            object_pixels : Iterable[Point]
+                New object seeds, both kinds are required on the first run.
+            background_pixels : Iterable[Point]
+                New background seeds.
+            as_mask : bool
+                If True, return the cut as a mask instead of pixel lists.
+                Default value: False.
+            progress : ProgressCallback
+                Progress callback of the solver. If the solver is cancelled
+                by it, SolverCancelled is raised, the seeds are kept and the
+                solve is resumed by the next call. Default value: None.
+
+            Returns
+            -------
+            cut : Union[Tuple[List, List], np.ndarray, None]
+                Boolean array of shape (height, width) which is True for
+                object pixels if as_mask is True; otherwise, object pixels
+                followed by 's' and background pixels followed by 't'.
+                None if no seeds are given.
+        """
 
         if object_pixels or background_pixels:
             if self.first_run:
@@ -114,55 +655,175 @@ class Segmentator:
 
                 self.first_run = False
 
-                self.relative_cost = self.relative_cost_gen(self.image,
-                                                            object_pixels,
-                                                            background_pixels,
-                                                            self.K)
-
-                for cx, cy in product(range(self.width), range(self.height)):
-                    if (cx, cy) in object_pixels:
-                        s_weight = self.K
-                        t_weight = 0.0
-                    elif (cx, cy) in background_pixels:
-                        s_weight = 0.0
-                        t_weight = self.K
-                    else:
-                        s_weight = self.lambda_ * self.relative_cost(
-                            (cx, cy), 'background'
-                        )
-                        t_weight = self.lambda_ * self.relative_cost(
-                            (cx, cy), 'object'
-                        )
-
-                    self.graph.add_edge('s', (cx, cy), capacity=s_weight)
-                    self.graph.add_edge((cx, cy), 't', capacity=t_weight)
-
-                self.graph = get_max_flow(self.graph, 's', 't',
-                                          len(self.graph)//10,
-                                          value_only=False)
-                (s, t) = (self.graph.graph['s_cut'], self.graph.graph['t_cut'])
-
-                self.graph = rebuild_graph()
-                return s, t
+                self._set_terminal_capacities(object_pixels,
+                                              background_pixels)
+
+                self.network = self.graph.to_network()
+                active_nodes = None
             else:
-                for cx, cy in object_pixels:
-                    sp_cap = self.graph['s'][(cx, cy)]['capacity']
-                    pt_cap = self.graph[(cx, cy)]['t']['capacity']
-                    const = max(sp_cap, pt_cap)
-                    self.graph['s'][(cx, cy)]['capacity'] = const + self.K
-                    self.graph[(cx, cy)]['t']['capacity'] = const
-
-                for cx, cy in background_pixels:
-                    sp_cap = self.graph['s'][(cx, cy)]['capacity']
-                    pt_cap = self.graph[(cx, cy)]['t']['capacity']
-                    const = max(sp_cap, pt_cap)
-                    self.graph['s'][(cx, cy)]['capacity'] = const
-                    self.graph[(cx, cy)]['t']['capacity'] = const + self.K
-
-                self.graph = get_max_flow(self.graph, 's', 't',
-                                          len(self.graph)//10,
-                                          value_only=False)
-                (s, t) = (self.graph.graph['s_cut'], self.graph.graph['t_cut'])
-
-                self.graph = rebuild_graph()
-                return s, t
+                active_nodes = self._add_seeds(object_pixels,
+                                               background_pixels)
+
+            result = self._solve(active_nodes, progress)
+
+            if as_mask:
+                return self.labels
+
+            return self._cut(result)
+
+    def save_mask(self, path: str) -> None:
+        """
+            Write labels of the last segmentation to binary PGM file strip
+            by strip, object pixels are white.
+
+            Parameters
+            ----------
+            path : str
+                Path of the file.
+        """
+
+        assert self.labels is not None
+
+        rows = strip_rows(self.width)
+
+        with open(path, 'wb') as f:
+            f.write(f'P5\n{self.width} {self.height}\n255\n'.encode())
+
+            for y in range(0, self.height, rows):
+                f.write(np.where(self.labels[y:y + rows], 255, 0)
+                        .astype(np.uint8).tobytes())
+
+    def refine(self,
+               object_pixels: Iterable[Point] = set(),
+               background_pixels: Iterable[Point] = set(),
+               radius: int = 8,
+               progress: Optional[ProgressCallback] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Add seeds and segment again only the neighbourhood of them.
+            Pixels within the radius from the new seeds are segmented with
+            the rest of the pixels fixed to their last labels. While labels
+            change next to the border of the band, the radius is doubled
+            and the band is segmented again, so the result is exact unless
+            the change reaches far from the seeds through pixels that keep
+            their labels. The network is updated but not solved, the next
+            mark solves it starting from its previous state.
+
+            Parameters
+            ----------
+            object_pixels : Iterable[Point]
+                New object seeds.
+            background_pixels : Iterable[Point]
+                New background seeds.
+            radius : int
+                Initial distance from the seeds to the border of the band.
+                Default value: 8.
+            progress : ProgressCallback
+                Progress callback of the band solves. If a solve is
+                cancelled by it, SolverCancelled is raised, labels are left
+                as they were and the bands of the seeds are segmented by the
+                next refine. Default value: None.
+
+            Returns
+            -------
+            changed : Tuple[np.ndarray, np.ndarray]
+                y and x coordinates of the pixels whose labels changed,
+                new labels are stored in labels.
+        """
+
+        assert self.labels is not None
+
+        self._stale_nodes = np.union1d(
+            self._stale_nodes,
+            self._add_seeds(object_pixels, background_pixels)
+        )
+
+        seeds = self._unrefined_seeds
+        for pixels in (object_pixels, background_pixels):
+            xs, ys = points_to_arrays(pixels)
+            seeds[ys, xs] = True
+
+        labels = self.labels
+
+        while seeds.any():
+            band = dilate(seeds, radius)
+            network, pixels = self.graph.band_network(band, self.labels)
+            result = self.subnetwork_max_flow(network, len(pixels),
+                                              len(pixels) + 1, None,
+                                              progress)
+
+            labels = self.labels.copy()
+            labels.ravel()[pixels] = result.source_side[:len(pixels)]
+
+            # Changes stopped inside the band or the band is the image
+            border = band & dilate(~band, 1)
+            if band.all() or np.array_equal(labels[border],
+                                            self.labels[border]):
+                break
+
+            radius *= 2
+
+        changed = np.nonzero(labels != self.labels)
+        self.labels = labels
+        seeds[:] = False
+
+        return changed
+
+    def reweight(self, relative_cost: RelativeCostFunction,
+                 progress: Optional[ProgressCallback] = None,
+                 object_pixels: Iterable[Point] = set(),
+                 background_pixels: Iterable[Point] = set()) -> np.ndarray:
+        """
+            Replace the relative cost function and segment the image again
+            starting from the previous flow. Residual capacities of the
+            terminal arcs are changed by the differences of the terminal
+            capacities and shifted by the same amount if any of them would
+            become negative, which changes the cut capacities by a constant
+            only. Seeds stay hard constraints, new seeds may be added with
+            the new costs and solved in the same run.
+
+            Parameters
+            ----------
+            relative_cost : RelativeCostFunction
+                New relative cost function.
+            progress : ProgressCallback
+                Progress callback of the solver, see mark.
+                Default value: None.
+            object_pixels : Iterable[Point]
+                New object seeds.
+            background_pixels : Iterable[Point]
+                New background seeds.
+
+            Returns
+            -------
+            mask : np.ndarray
+                Boolean array of shape (height, width), True for object
+                pixels.
+        """
+
+        assert not self.first_run
+
+        xs, ys = points_to_arrays(background_pixels)
+        self.seeds[ys, xs] = 2
+        xs, ys = points_to_arrays(object_pixels)
+        self.seeds[ys, xs] = 1
+
+        self.relative_cost = relative_cost
+
+        intensities = np.asarray(self.image)
+        source_capacity = self.lambda_ * relative_cost(intensities,
+                                                       'background')
+        sink_capacity = self.lambda_ * relative_cost(intensities, 'object')
+
+        source_capacity[self.seeds == 1] = self.K
+        sink_capacity[self.seeds == 1] = 0.0
+        source_capacity[self.seeds == 2] = 0.0
+        sink_capacity[self.seeds == 2] = self.K
+
+        active_nodes = self._change_terminal_capacities(
+            np.arange(self.graph.pixels_num), source_capacity.ravel(),
+            sink_capacity.ravel()
+        )
+        self._solve(active_nodes, progress)
+
+        return self.labels
@@ -0,0 +1,200 @@
+from typing import Dict, Hashable, List
+
+__all__ = ['HeightBuckets', 'HighestLabelQueue']
+
+# Applicable types for nodes
+Node = Hashable
+
+
+class HighestLabelQueue:
+    """
+        Set of active nodes bucketed by height.
+        Insertion and removal take O(1), extraction of the highest node
+        takes O(1) amortized: the pointer to the highest non-empty bucket
+        only moves down between insertions.
+        Every node is stored at most once.
+    """
+
+    def __init__(self):
+        self._buckets: List[Dict[Node, None]] = []
+        self._heights: Dict[Node, int] = {}
+        self._max_height: int = -1
+
+    def __len__(self) -> int:
+        return len(self._heights)
+
+    def __contains__(self, node: Node) -> bool:
+        return node in self._heights
+
+    def push(self, node: Node, height: int) -> None:
+        """
+            Add node to the queue or move it to the new height.
+
+            Parameters
+            ----------
+            node : Node
+                Node to add.
+            height : int
+                Height of the node.
+
+            Returns
+            -------
+            None.
+        """
+
+        old_height = self._heights.get(node)
+
+        if old_height == height:
+            return
+
+        if old_height is not None:
+            del self._buckets[old_height][node]
+
+        while len(self._buckets) <= height:
+            self._buckets.append({})
+
+        self._buckets[height][node] = None
+        self._heights[node] = height
+
+        if height > self._max_height:
+            self._max_height = height
+
+    def remove(self, node: Node) -> None:
+        """
+            Remove node from the queue if it is there.
+
+            Parameters
+            ----------
+            node : Node
+                Node to remove.
+
+            Returns
+            -------
+            None.
+        """
+
+        height = self._heights.pop(node, None)
+
+        if height is not None:
+            del self._buckets[height][node]
+
+    def pop(self) -> Node:
+        """
+            Remove and return a node with the highest height.
+            Queue must not be empty.
+
+            Parameters
+            ----------
+            None.
+
+            Returns
+            -------
+            node : Node
+                Node with the highest height.
+        """
+
+        while not self._buckets[self._max_height]:
+            self._max_height -= 1
+
+        node, _ = self._buckets[self._max_height].popitem()
+        del self._heights[node]
+
+        return node
+
+    def clear(self) -> None:
+        for bucket in self._buckets:
+            bucket.clear()
+
+        self._heights.clear()
+        self._max_height = -1
+
+
+class HeightBuckets:
+    """
+        All nodes below the height limit bucketed by height.
+        Used by the gap heuristic: once a height has no nodes left, nodes
+        above it cannot reach the sink.
+
+        Parameters
+        ----------
+        limit : int
+            Nodes with height not less than limit are not stored.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+        self._buckets: List[Dict[Node, None]] = []
+        self._heights: Dict[Node, int] = {}
+        self._max_height: int = -1
+
+    def count(self, height: int) -> int:
+        if height < len(self._buckets):
+            return len(self._buckets[height])
+
+        return 0
+
+    def move(self, node: Node, height: int) -> None:
+        """
+            Add node to the buckets or move it to the new height.
+            Node is removed if new height is not less than the limit.
+
+            Parameters
+            ----------
+            node : Node
+                Node to move.
+            height : int
+                New height of the node.
+
+            Returns
+            -------
+            None.
+        """
+
+        old_height = self._heights.pop(node, None)
+
+        if old_height is not None:
+            del self._buckets[old_height][node]
+
+        if height < self.limit:
+            while len(self._buckets) <= height:
+                self._buckets.append({})
+
+            self._buckets[height][node] = None
+            self._heights[node] = height
+            self._max_height = max(self._max_height, height)
+
+    def lift(self, height: int) -> List[Node]:
+        """
+            Remove and return all nodes above the height.
+
+            Parameters
+            ----------
+            height : int
+                Height of the gap.
+
+            Returns
+            -------
+            nodes : List[Node]
+                Removed nodes.
+        """
+
+        nodes: List[Node] = []
+
+        for bucket in self._buckets[height + 1:self._max_height + 1]:
+            nodes.extend(bucket)
+            bucket.clear()
+
+        for node in nodes:
+            del self._heights[node]
+
+        self._max_height = min(self._max_height, height)
+
+        return nodes
+
+    def clear(self) -> None:
+        for bucket in self._buckets[:self._max_height + 1]:
+            bucket.clear()
+
+        self._heights.clear()
+        self._max_height = -1
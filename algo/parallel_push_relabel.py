@@ -0,0 +1,335 @@
+import ctypes
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from algo.csr import (CSRNetwork, FlowResult, ProgressCallback,
+                      SolverCancelled, min_cut_by_gap, push_relabel)
+from algo.label_queue import HighestLabelQueue
+
+__all__ = ['parallel_push_relabel']
+
+# Arrays of the network used by discharge_tile,
+# set up in every worker process
+_arrays: Dict[str, np.ndarray] = {}
+
+# Tile task result: nodes of other tiles and the terminals that received
+# flow, amounts of the flow, numbers of pushes and relabels
+TileResult = Tuple[np.ndarray, np.ndarray, int, int]
+
+
+def _attach(buffers: Dict[str, Tuple[object, np.dtype, int]]) -> None:
+    """
+        Initialize worker process with the shared arrays, given either as
+        shared memory or as names of memory-mapped files.
+    """
+
+    for key, (raw, dtype, size) in buffers.items():
+        if isinstance(raw, str):
+            _arrays[key] = np.memmap(raw, dtype=dtype, mode='r+',
+                                     shape=(size,))
+        else:
+            _arrays[key] = np.frombuffer(raw, dtype=dtype, count=size)
+
+
+def discharge_tile(tile: int) -> TileResult:
+    """
+        Discharge active nodes of the tile below the source by height.
+        Nodes of other tiles are not modified except for the opposite arcs
+        of the pushes, the flow pushed to them is returned instead of being
+        added to their excess. Tiles of the same color never share arcs,
+        so they may be discharged concurrently.
+
+        Parameters
+        ----------
+        tile : int
+            Tile to discharge.
+
+        Returns
+        -------
+        result : TileResult
+            Flow pushed out of the tile and numbers of operations.
+    """
+
+    offsets = memoryview(_arrays['offsets'])
+    targets = memoryview(_arrays['targets'])
+    reverse = memoryview(_arrays['reverse'])
+    capacity = memoryview(_arrays['capacity'])
+    height = memoryview(_arrays['height'])
+    excess = memoryview(_arrays['excess'])
+    tile_of = memoryview(_arrays['tile_of'])
+
+    nodes_num = len(offsets) - 1
+    tile_offsets = _arrays['tile_offsets']
+    tile_nodes = _arrays['tile_nodes'][tile_offsets[tile]:
+                                       tile_offsets[tile + 1]]
+
+    # Residual arcs leaving the tile only lose capacity while it is
+    # discharged, so a node higher than every node outside the tile it can
+    # reach plus the size of the tile cannot reach the sink
+    starts = _arrays['offsets'][tile_nodes]
+    counts = _arrays['offsets'][tile_nodes + 1] - starts
+    arcs = (np.repeat(starts - np.cumsum(counts) + counts, counts) +
+            np.arange(counts.sum()))
+    arcs = arcs[_arrays['capacity'][arcs] > 0]
+    heads = _arrays['targets'][arcs]
+    heads_height = _arrays['height'][heads[_arrays['tile_of'][heads] != tile]]
+    height_limit = min(nodes_num,
+                       int(heads_height[heads_height < nodes_num]
+                           .max(initial=-1)) + len(tile_nodes) + 1)
+
+    nodes_queue = HighestLabelQueue()
+    outflow: Dict[int, float] = {}
+    pushes = relabels = 0
+
+    for u in tile_nodes.tolist():
+        if excess[u] > 0 and height[u] < height_limit:
+            nodes_queue.push(u, height[u])
+
+    while nodes_queue:
+        u = nodes_queue.pop()
+        u_excess = excess[u]
+
+        while u_excess > 0:
+            u_height = height[u]
+
+            for a in range(offsets[u], offsets[u + 1]):
+                a_capacity = capacity[a]
+                if a_capacity <= 0:
+                    continue
+
+                v = targets[a]
+                if u_height != height[v] + 1:
+                    continue
+
+                delta = min(u_excess, a_capacity)
+                capacity[a] = a_capacity - delta
+                capacity[reverse[a]] += delta
+                u_excess -= delta
+                pushes += 1
+
+                if tile_of[v] == tile:
+                    if excess[v] == 0 and height[v] < height_limit:
+                        nodes_queue.push(v, height[v])
+                    excess[v] += delta
+                else:
+                    outflow[v] = outflow.get(v, 0) + delta
+
+                if u_excess == 0:
+                    break
+
+            if u_excess > 0:
+                new_height = 2 * nodes_num
+                for a in range(offsets[u], offsets[u + 1]):
+                    if capacity[a] > 0:
+                        new_height = min(new_height, height[targets[a]])
+
+                height[u] = new_height + 1
+                relabels += 1
+
+                # Excess cannot leave the tile towards the sink,
+                # it waits for the next global relabeling
+                if height[u] >= height_limit:
+                    break
+
+        excess[u] = u_excess
+
+    return (np.fromiter(outflow.keys(), dtype=np.int64, count=len(outflow)),
+            np.fromiter(outflow.values(), dtype=_arrays['excess'].dtype,
+                        count=len(outflow)),
+            pushes, relabels)
+
+
+def parallel_push_relabel(network: CSRNetwork, source: int, sink: int,
+                          tile_of: np.ndarray, tile_color: np.ndarray,
+                          workers: int = 1,
+                          active_nodes: Optional[np.ndarray] = None,
+                          progress: Optional[ProgressCallback] = None,
+                          cut_only: bool = False) -> FlowResult:
+    """
+        Calculate maximum flow of network in place.
+        Region push-relabel algorithm is used: nodes are split into tiles,
+        every round the tiles of each color are discharged concurrently
+        by worker processes sharing the arrays of the network, then the
+        flow pushed across the tiles borders is applied and the heights are
+        recomputed by global relabeling. Rounds continue until no active
+        node is left below the source, after that the excess that cannot
+        reach the sink is returned to the source by the sequential
+        push_relabel, so the state of the network is the same as after
+        push_relabel.
+
+        Parameters
+        ----------
+        network : CSRNetwork
+            Residual network. Final residual network, heights and excesses
+            are stored in it.
+        source : int
+            Source of flow.
+        sink : int
+            Sink of flow.
+        tile_of : np.ndarray
+            Tile of every node, -1 for the nodes outside the tiles
+            such as the terminals.
+        tile_color : np.ndarray
+            Color of every tile, tiles of the same color must not be
+            connected by arcs.
+        workers : int
+            Number of worker processes. If it is 1, tiles are discharged
+            in the calling process. Default value: 1.
+        active_nodes : np.ndarray
+            If given, the algorithm is warm started as push_relabel is.
+            Default value: None.
+        progress : ProgressCallback
+            If given, it is called with the operation counts after every
+            color of every round, SolverCancelled is raised if it returns
+            False. Default value: None.
+        cut_only : bool
+            If True, the excess that cannot reach the sink is left in the
+            network, as push_relabel does. Default value: False.
+
+        Returns
+        -------
+        result : FlowResult
+            Value of the maximum flow, the minimum cut and numbers of
+            pushes, relabels, global relabelings and rounds.
+    """
+
+    nodes_num = network.nodes_num
+
+    operations: Dict[str, int] = dict.fromkeys(
+        ('pushes', 'relabels', 'global_relabelings', 'rounds'), 0
+    )
+
+    if active_nodes is None:
+        network.height[:] = 0
+        network.excess[:] = 0
+        network.height[source] = nodes_num
+
+        arcs = np.arange(network.offsets[source], network.offsets[source + 1])
+        flow = network.capacity[arcs]
+
+        network.capacity[arcs] = 0
+        np.add.at(network.capacity, network.reverse[arcs], flow)
+        np.add.at(network.excess, network.targets[arcs], flow)
+
+    # Nodes of every tile are stored contiguously
+    in_tiles = tile_of >= 0
+    tile_nodes = np.flatnonzero(in_tiles)
+    tile_nodes = tile_nodes[np.argsort(tile_of[tile_nodes], kind='stable')]
+    tile_offsets = np.zeros(len(tile_color) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tile_of[in_tiles], minlength=len(tile_color)),
+              out=tile_offsets[1:])
+
+    arrays = {
+        'offsets': network.offsets,
+        'targets': network.targets,
+        'reverse': network.reverse,
+        'capacity': network.capacity,
+        'height': network.height,
+        'excess': network.excess,
+        'tile_of': tile_of,
+        'tile_nodes': tile_nodes,
+        'tile_offsets': tile_offsets
+    }
+
+    executor: Optional[ProcessPoolExecutor] = None
+
+    if workers > 1:
+        context = get_context()
+        buffers = {}
+
+        for key, array in arrays.items():
+            # Memory-mapped arrays are shared through their files
+            # instead of being copied
+            if isinstance(array, np.memmap) and array.offset == 0:
+                buffers[key] = (array.filename, array.dtype, len(array))
+                continue
+
+            raw = context.RawArray(ctypes.c_char, max(array.nbytes, 1))
+            arrays[key] = np.frombuffer(raw, dtype=array.dtype,
+                                        count=len(array))
+            arrays[key][:] = array
+            buffers[key] = (raw, array.dtype, len(array))
+
+        executor = ProcessPoolExecutor(workers, context, _attach, (buffers,))
+    else:
+        _arrays.update(arrays)
+
+    capacity = arrays['capacity']
+    height = arrays['height']
+    excess = arrays['excess']
+
+    # Residual network over the arrays the workers see
+    shared_network = (network if executor is None else
+                      CSRNetwork(arrays['offsets'], arrays['targets'],
+                                 arrays['reverse'], capacity))
+
+    def global_relabeling() -> None:
+        distances = np.array(shared_network.sink_distances(sink))
+        reachable = distances >= 0
+
+        height[~reachable & (height < nodes_num)] = nodes_num + 1
+        height[reachable] = distances[reachable]
+        height[source] = nodes_num
+
+        operations['global_relabelings'] += 1
+
+    def active_tiles() -> np.ndarray:
+        return np.unique(tile_of[in_tiles & (excess > 0) &
+                                 (height < nodes_num)])
+
+    def discharge_tiles(tiles: np.ndarray) -> Iterator[TileResult]:
+        if executor is None:
+            return map(discharge_tile, tiles.tolist())
+
+        return executor.map(discharge_tile, tiles.tolist(),
+                            chunksize=max(1, len(tiles) // (4 * workers)))
+
+    try:
+        global_relabeling()
+
+        while len(active_tiles()) > 0:
+            for color in np.unique(tile_color).tolist():
+                tiles = active_tiles()
+                tiles = tiles[tile_color[tiles] == color]
+
+                for nodes, flow, pushes, relabels in discharge_tiles(tiles):
+                    np.add.at(excess, nodes, flow)
+                    operations['pushes'] += pushes
+                    operations['relabels'] += relabels
+
+                if progress is not None and not progress(operations):
+                    raise SolverCancelled()
+
+            global_relabeling()
+            operations['rounds'] += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+            for array, shared in ((network.capacity, capacity),
+                                  (network.height, height),
+                                  (network.excess, excess)):
+                if shared is not array:
+                    array[:] = shared
+
+        _arrays.clear()
+
+    # Return the excess that cannot reach the sink to the source
+    stuck_nodes = np.flatnonzero(network.excess > 0)
+    stuck_nodes = stuck_nodes[(stuck_nodes != source) &
+                              (stuck_nodes != sink)]
+
+    if len(stuck_nodes) == 0 or cut_only:
+        return FlowResult(network.excess[sink].item(),
+                          min_cut_by_gap(network.height), operations)
+
+    result = push_relabel(network, source, sink, nodes_num//10,
+                          active_nodes=stuck_nodes, progress=progress)
+
+    for key in ('pushes', 'relabels', 'global_relabelings'):
+        result.operations[key] += operations[key]
+    result.operations['rounds'] = operations['rounds']
+
+    return result
@@ -0,0 +1,118 @@
+from typing import Any, Iterable, List, Set
+
+import numpy as np
+from PIL import Image
+from algo.grid_graph import dilate
+from algo.image_segmentation import Point, Segmentator, points_to_arrays
+
+__all__ = ['boundary_band', 'pyramid_segmentation']
+
+
+def boundary_band(labels: np.ndarray, width: int) -> np.ndarray:
+    """
+        Return pixels within the distance from the boundary of the labels.
+
+        Parameters
+        ----------
+        labels : np.ndarray
+            Boolean array of shape (height, width).
+        width : int
+            Chebyshev distance from the boundary pixels.
+
+        Returns
+        -------
+        band : np.ndarray
+            Boolean array of shape (height, width).
+    """
+
+    boundary = np.zeros_like(labels)
+
+    vertical = labels[1:] != labels[:-1]
+    boundary[1:] |= vertical
+    boundary[:-1] |= vertical
+
+    horizontal = labels[:, 1:] != labels[:, :-1]
+    boundary[:, 1:] |= horizontal
+    boundary[:, :-1] |= horizontal
+
+    return dilate(boundary, width)
+
+
+def downscale_points(points: Iterable[Point], factor: int) -> Set[Point]:
+    xs, ys = points_to_arrays(points)
+
+    return set(zip((xs // factor).tolist(), (ys // factor).tolist()))
+
+
+def pyramid_segmentation(image: Image.Image,
+                         object_pixels: Iterable[Point],
+                         background_pixels: Iterable[Point],
+                         levels: int = 3,
+                         band_width: int = 2,
+                         **segmentator_args: Any) -> np.ndarray:
+    """
+        Segment the image coarse to fine.
+        The image is downscaled twice per level and segmented as a whole at
+        the coarsest level only. At every finer level the labels are
+        upscaled and only the band around their boundary is segmented
+        again, the rest of the pixels keep their labels.
+
+        Parameters
+        ----------
+        image : Image.Image
+            Image to segment.
+        object_pixels : Iterable[Point]
+            Object seeds.
+        background_pixels : Iterable[Point]
+            Background seeds.
+        levels : int
+            Number of levels including the full resolution one.
+            Default value: 3.
+        band_width : int
+            Distance from the boundary of the upscaled labels to the
+            pixels segmented again. Default value: 2.
+        **segmentator_args : Any
+            Arguments of Segmentator.
+
+        Returns
+        -------
+        mask : np.ndarray
+            Boolean array of shape (height, width), True for object pixels.
+    """
+
+    object_pixels = set(object_pixels)
+    background_pixels = set(background_pixels)
+
+    images: List[Image.Image] = [image]
+    for _ in range(levels - 1):
+        width, height = images[-1].size
+        images.append(images[-1].resize((-(-width // 2), -(-height // 2)),
+                                        Image.BOX))
+
+    mask = None
+
+    for level in reversed(range(levels)):
+        level_image = images[level]
+        level_object = downscale_points(object_pixels, 2 ** level)
+        level_background = downscale_points(background_pixels, 2 ** level)
+        segmentator = Segmentator(level_image, **segmentator_args)
+
+        if mask is None:
+            mask = segmentator.mark(level_object, level_background,
+                                    as_mask=True)
+            continue
+
+        width, height = level_image.size
+        labels = mask.repeat(2, axis=0).repeat(2, axis=1)[:height, :width]
+
+        # Seeds mislabeled at the coarser level must be in the band
+        xs, ys = points_to_arrays(level_background)
+        labels[ys, xs] = False
+        xs, ys = points_to_arrays(level_object)
+        labels[ys, xs] = True
+
+        mask = segmentator.mark_band(level_object, level_background,
+                                     boundary_band(labels, band_width),
+                                     labels)
+
+    return mask
@@ -0,0 +1,68 @@
+import os
+import tempfile
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+__all__ = ['ArrayStorage']
+
+Shape = Union[int, Tuple[int, ...]]
+
+# Number of pixels processed at once by the code building large arrays
+# strip by strip, so that temporary arrays stay small
+STRIP_PIXELS = 1 << 20
+
+
+class ArrayStorage:
+    """
+        Allocator of the large arrays of graphs and networks.
+        Arrays are allocated in memory, or in memory-mapped files of the
+        directory if it is given, so that they may be larger than RAM.
+        Only the arrays allocated here are on disk: working sets of the
+        solvers, such as queues, search lists, current arcs and the
+        per-node arrays of Boykov-Kolmogorov, and the labels stay in
+        memory, so solving still takes memory proportional to the number
+        of nodes, see benchmarks/out_of_core.py.
+
+        Parameters
+        ----------
+        directory : str
+            Directory of the files, created if missing. Every storage keeps
+            its files in a new subdirectory of it, so storages may share
+            the directory; the files are not removed. Default value: None.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix='storage-',
+                                              dir=directory)
+
+    @property
+    def on_disk(self) -> bool:
+        return self.directory is not None
+
+    def zeros(self, name: str, shape: Shape,
+              dtype: np.dtype = np.float64) -> np.ndarray:
+        """
+            Return array of zeros, memory-mapped file <name>.dat of the
+            subdirectory of the storage if the directory is given. Files of
+            arrays with the same name of the same storage are overwritten.
+        """
+
+        if self.directory is None:
+            return np.zeros(shape, dtype=dtype)
+
+        # New files are filled with zeros
+        return np.memmap(os.path.join(self.directory, name + '.dat'),
+                         dtype=dtype, mode='w+', shape=shape)
+
+
+def strip_rows(width: int) -> int:
+    """
+        Return number of image rows in a strip.
+    """
+
+    return max(1, STRIP_PIXELS // width)
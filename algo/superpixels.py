@@ -0,0 +1,129 @@
+from typing import Any, Iterable
+
+import numpy as np
+from PIL import Image
+from algo.image_segmentation import Point, Segmentator
+
+__all__ = ['slic', 'superpixel_segmentation']
+
+
+def slic(intensities: np.ndarray, region_size: int,
+         compactness: float = 10.0, iterations: int = 5) -> np.ndarray:
+    """
+        Split the image into superpixels by simple linear iterative
+        clustering. Cluster centers start on a grid with the step of
+        region_size, every pixel is assigned to the closest of the centers
+        of its own and the eight adjacent grid cells.
+
+        Parameters
+        ----------
+        intensities : np.ndarray
+            Array of shape (height, width) or (height, width, channels),
+            colors are compared by the euclidean distance.
+        region_size : int
+            Approximate side of a superpixel.
+        compactness : float
+            Weight of the spatial distance relative to the intensity
+            distance. Default value: 10.0.
+        iterations : int
+            Number of clustering iterations. Default value: 5.
+
+        Returns
+        -------
+        regions : np.ndarray
+            Integer array of shape (height, width), superpixels of the
+            pixels numbered from 0.
+    """
+
+    height, width = intensities.shape[:2]
+    intensities = intensities.astype(np.float64).reshape(height * width, -1)
+
+    grid_height = -(-height // region_size)
+    grid_width = -(-width // region_size)
+    centers_num = grid_height * grid_width
+
+    ys, xs = np.divmod(np.arange(height * width), width)
+    cells_y, cells_x = ys // region_size, xs // region_size
+
+    center_ys, center_xs = np.divmod(np.arange(centers_num), grid_width)
+    center_ys = np.minimum(center_ys * region_size + region_size // 2,
+                           height - 1).astype(np.float64)
+    center_xs = np.minimum(center_xs * region_size + region_size // 2,
+                           width - 1).astype(np.float64)
+    center_intensities = intensities[center_ys.astype(np.int64) * width +
+                                     center_xs.astype(np.int64)]
+
+    spatial_weight = (compactness / region_size) ** 2
+    labels = np.zeros(height * width, dtype=np.int64)
+
+    for _ in range(iterations):
+        best_distance = np.full(height * width, np.inf)
+
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                grid_ys, grid_xs = cells_y + dy, cells_x + dx
+                valid = ((0 <= grid_ys) & (grid_ys < grid_height) &
+                         (0 <= grid_xs) & (grid_xs < grid_width))
+                centers = np.where(valid, grid_ys * grid_width + grid_xs, 0)
+
+                distance = (((intensities -
+                              center_intensities[centers]) ** 2).sum(axis=1) +
+                            spatial_weight *
+                            ((ys - center_ys[centers]) ** 2 +
+                             (xs - center_xs[centers]) ** 2))
+                closer = valid & (distance < best_distance)
+
+                best_distance[closer] = distance[closer]
+                labels[closer] = centers[closer]
+
+        counts = np.bincount(labels, minlength=centers_num)
+        nonempty = counts > 0
+
+        for center_values, values in ((center_ys, ys), (center_xs, xs),
+                                      *zip(center_intensities.T,
+                                           intensities.T)):
+            center_values[nonempty] = (np.bincount(labels, values,
+                                                   centers_num)[nonempty] /
+                                       counts[nonempty])
+
+    _, regions = np.unique(labels, return_inverse=True)
+
+    return regions.reshape(height, width)
+
+
+def superpixel_segmentation(image: Image.Image,
+                            object_pixels: Iterable[Point],
+                            background_pixels: Iterable[Point],
+                            region_size: int = 10,
+                            compactness: float = 10.0,
+                            **segmentator_args: Any) -> np.ndarray:
+    """
+        Segment the image on superpixels instead of pixels.
+        The graph has about region_size ** 2 times fewer nodes, capacities
+        of its arcs are the sums of the capacities of the pixel arcs.
+
+        Parameters
+        ----------
+        image : Image.Image
+            Image to segment.
+        object_pixels : Iterable[Point]
+            Object seeds.
+        background_pixels : Iterable[Point]
+            Background seeds.
+        region_size : int
+            Approximate side of a superpixel. Default value: 10.
+        compactness : float
+            Compactness of the superpixels, see slic. Default value: 10.0.
+        **segmentator_args : Any
+            Arguments of Segmentator.
+
+        Returns
+        -------
+        mask : np.ndarray
+            Boolean array of shape (height, width), True for object pixels.
+    """
+
+    regions = slic(np.asarray(image), region_size, compactness)
+    segmentator = Segmentator(image, **segmentator_args)
+
+    return segmentator.mark_regions(object_pixels, background_pixels, regions)
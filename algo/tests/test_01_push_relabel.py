@@ -2,7 +2,7 @@ import os
 import time
 
 import networkx as nx
-from algo.graph_utils import get_max_flow
+from algo.graph_utils import get_max_flow, get_max_flow_bk, get_max_flow_csr
 from networkx.algorithms.flow import preflow_push
 
 from .utils import read_graph_from_file
@@ -49,3 +49,163 @@ def test_2_hand_crafted_tests():
         print('filename: ', filename)
         print('elapsed wall-clock time (s): ', timer_end - timer_start)
         print('max flow: ', our_max_flow)
+
+
+def test_3_csr_backend():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_graph = preflow_push(graph, 1, nodes_quantity,
+                                  value_only=True)
+        our_graph = get_max_flow_csr(graph, 1, nodes_quantity,
+                                     nodes_quantity//10)
+
+        assert true_graph.graph['flow_value'] == our_graph.graph['flow_value']
+
+
+def test_4_gap_relabeling():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_graph = preflow_push(graph, 1, nodes_quantity,
+                                  value_only=True)
+
+        for max_flow in (get_max_flow, get_max_flow_csr):
+            our_graph = max_flow(graph, 1, nodes_quantity,
+                                 nodes_quantity//10, gap_relabeling=True)
+
+            true_max_flow = true_graph.graph['flow_value']
+            our_max_flow = our_graph.graph['flow_value']
+            assert true_max_flow == our_max_flow
+
+
+def test_5_boykov_kolmogorov():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_graph = preflow_push(graph, 1, nodes_quantity,
+                                  value_only=True)
+        our_graph = get_max_flow_bk(graph, 1, nodes_quantity)
+
+        assert true_graph.graph['flow_value'] == our_graph.graph['flow_value']
+
+
+def test_6_in_place():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_graph = preflow_push(graph, 1, nodes_quantity,
+                                  value_only=True)
+        our_graph = get_max_flow(graph, 1, nodes_quantity,
+                                 nodes_quantity//10, value_only=False,
+                                 in_place=True)
+
+        assert our_graph is graph
+        assert our_graph.graph['res_net'] is graph
+        assert true_graph.graph['flow_value'] == our_graph.graph['flow_value']
+        assert 1 in our_graph.graph['s_cut']
+
+        # Residual network of the maximum flow has no augmenting paths
+        our_graph = get_max_flow(graph, 1, nodes_quantity,
+                                 nodes_quantity//10, in_place=True)
+        assert our_graph.graph['flow_value'] == 0
+
+
+def test_7_stats():
+    file_path = './algo/tests/push_relabel_test_inputs/test_1.txt'
+    graph = read_graph_from_file(file_path)
+    nodes_quantity = len(graph)
+
+    for max_flow in (get_max_flow, get_max_flow_csr, get_max_flow_bk):
+        assert 'stats' not in max_flow(graph, 1, nodes_quantity).graph
+
+        emitted = []
+        our_graph = max_flow(graph, 1, nodes_quantity, value_only=False,
+                             stats=True, stats_callback=emitted.append)
+        stats = our_graph.graph['stats']
+
+        assert emitted == [stats]
+        assert stats.operations == our_graph.graph['operations']
+        assert set(stats.phase_times) == {'residual_build', 'discharge',
+                                          'cut', 'result_build'}
+        assert stats.total_time > 0
+
+    operations = get_max_flow(graph, 1, nodes_quantity,
+                              1).graph['operations']
+
+    assert operations['pushes'] == (operations['saturating_pushes'] +
+                                    operations['nonsaturating_pushes'])
+    assert operations['discharges'] > 0 and operations['bfs_nodes'] > 0
+
+
+def test_8_adaptive_relabeling():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_graph = preflow_push(graph, 1, nodes_quantity,
+                                  value_only=True)
+        true_max_flow = true_graph.graph['flow_value']
+
+        our_graph = get_max_flow(graph, 1, nodes_quantity,
+                                 global_relabeling_work=0.5)
+        assert our_graph.graph['flow_value'] == true_max_flow
+
+        for source_relabeling in (False, True):
+            our_graph = get_max_flow_csr(
+                graph, 1, nodes_quantity, value_only=False,
+                global_relabeling_work=0.5,
+                source_relabeling=source_relabeling
+            )
+
+            assert our_graph.graph['flow_value'] == true_max_flow
+            assert 1 in our_graph.graph['s_cut']
+            assert nodes_quantity in our_graph.graph['t_cut']
+
+
+def test_9_push_counts():
+    # Arc 2 -> 3 is admissible once it is saturated
+    graph = nx.DiGraph()
+
+    graph.add_nodes_from(list(range(1, 5)))
+    graph.add_edge(1, 2, capacity=10000)
+    graph.add_edge(1, 3, capacity=10000)
+    graph.add_edge(2, 3, capacity=1)
+    graph.add_edge(3, 4, capacity=10000)
+    graph.add_edge(2, 4, capacity=10000)
+
+    graphs = [(graph, 4)]
+    for filename in ('test_1.txt', 'test_2.txt', 'test_4.txt'):
+        graph = read_graph_from_file(
+            os.path.join('./algo/tests/push_relabel_test_inputs', filename)
+        )
+        graphs.append((graph, len(graph)))
+
+    # Without global relabelings both backends do the same operations
+    for graph, sink in graphs:
+        operations, csr_operations = (
+            max_flow(graph, 1, sink, 0).graph['operations']
+            for max_flow in (get_max_flow, get_max_flow_csr)
+        )
+
+        for kind in ('pushes', 'saturating_pushes', 'nonsaturating_pushes'):
+            assert operations[kind] == csr_operations[kind]
@@ -1,6 +1,6 @@
 import os
 
-from algo.graph_utils import get_max_flow
+from algo.graph_utils import get_max_flow, get_max_flow_bk, get_max_flow_csr
 
 from .utils import read_graph_from_file
 
@@ -23,3 +23,78 @@ def test_1_hand_crafted_tests():
                     min_cut_value += attr['capacity']
 
         assert min_cut_value == graph.graph['flow_value']
+
+
+def test_2_csr_backend():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        graph = get_max_flow_csr(graph, 1, nodes_quantity,
+                                 nodes_quantity//10, value_only=False)
+
+        s_cut = set(graph.graph['s_cut'])
+        assert 1 in s_cut and nodes_quantity in graph.graph['t_cut']
+
+        min_cut_value = 0
+        for node in s_cut:
+            for u, v, attr in graph.out_edges(node, data=True):
+                if v not in s_cut:
+                    min_cut_value += attr['capacity']
+
+        assert min_cut_value == graph.graph['flow_value']
+
+
+def test_3_boykov_kolmogorov():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        graph = get_max_flow_bk(graph, 1, nodes_quantity, value_only=False)
+
+        s_cut = set(graph.graph['s_cut'])
+        assert 1 in s_cut and nodes_quantity in graph.graph['t_cut']
+
+        min_cut_value = 0
+        for node in s_cut:
+            for u, v, attr in graph.out_edges(node, data=True):
+                if v not in s_cut:
+                    min_cut_value += attr['capacity']
+
+        assert min_cut_value == graph.graph['flow_value']
+
+
+def test_4_cut_only():
+    target_dir = './algo/tests/push_relabel_test_inputs'
+
+    for filename in os.listdir(target_dir):
+        file_path = os.path.join(target_dir, filename)
+        graph = read_graph_from_file(file_path)
+        nodes_quantity = len(graph)
+
+        true_max_flow = get_max_flow_csr(
+            graph, 1, nodes_quantity, nodes_quantity//10
+        ).graph['flow_value']
+
+        for max_flow in (get_max_flow, get_max_flow_csr):
+            our_graph = max_flow(graph, 1, nodes_quantity,
+                                 nodes_quantity//10, value_only=False,
+                                 cut_only=True)
+
+            s_cut = set(our_graph.graph['s_cut'])
+            assert 1 in s_cut and nodes_quantity in our_graph.graph['t_cut']
+
+            min_cut_value = 0
+            for node in s_cut:
+                for u, v, attr in our_graph.out_edges(node, data=True):
+                    if v not in s_cut:
+                        min_cut_value += attr['capacity']
+
+            assert min_cut_value == our_graph.graph['flow_value']
+            assert our_graph.graph['flow_value'] == true_max_flow
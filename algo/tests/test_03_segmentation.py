@@ -1,10 +1,15 @@
 from itertools import product
+from math import dist, exp, log
 
 import numpy as np
-from algo.image_segmentation import Segmentator, gaussian
+import pytest
+from algo.csr import SolverCancelled
+from algo.image_segmentation import Segmentator, gaussian, histogram_cost
 from algo.utils import correctness_ratio, generate_mask, jaccard_score
 from PIL import Image
 
+from .utils import disk_image_seeds, generate_disk_image
+
 
 def test_1():
     neighbors = 8
@@ -36,3 +41,253 @@ def test_1():
 
     print('Jaccard:', jaccard_score(mask_true, mask_ours))
     print('Correctness ratio:', correctness_ratio(mask_true, mask_ours))
+
+
+def test_2_max_flow_backends():
+    size = 24
+    im, mask_true = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    for max_flow in ('push_relabel', 'adaptive_push_relabel',
+                     'boykov_kolmogorov', 'parallel_push_relabel'):
+        segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                  max_flow=max_flow)
+        s, t = segmentator.mark(object, background)
+
+        mask_ours = generate_mask(s, t, mask_true.shape)
+
+        assert jaccard_score(mask_true, mask_ours) > 0.9
+
+        mask_ours = segmentator.mark(background_pixels={(0, size - 1)},
+                                     as_mask=True)
+
+        assert mask_ours.shape == mask_true.shape
+        assert jaccard_score(mask_true, mask_ours) > 0.9
+
+
+def test_3_scalar_boundary_cost():
+    sigma = 10.0
+    im, _ = generate_disk_image(16)
+
+    def scalar_gaussian(i_p, i_q, p, q):
+        return exp(-(i_p - i_q) ** 2 / (2 * sigma ** 2)) / dist(p, q)
+
+    for neighbors in (4, 8):
+        vectorized = Segmentator(im, neighbors, 1.0, gaussian(sigma))
+        scalar = Segmentator(im, neighbors, 1.0, scalar_gaussian)
+
+        assert np.allclose(vectorized.graph.capacity, scalar.graph.capacity)
+        assert np.isclose(vectorized.K, scalar.K)
+
+
+def test_4_histogram_cost():
+    im, _ = generate_disk_image(16)
+    object, background = disk_image_seeds(16)
+    pixels = np.asarray(im)
+
+    relative_cost = histogram_cost(im, object, background, infinity=100.0)
+
+    for point_type, points in (('object', object),
+                               ('background', background)):
+        intensities = [pixels[y, x] for x, y in points]
+
+        for intensity in range(256):
+            freq = intensities.count(intensity) / len(intensities)
+            expected = -log(freq) if freq > 0 else 100.0
+
+            assert np.isclose(relative_cost(intensity, point_type), expected)
+
+        costs = relative_cost(pixels, point_type)
+        assert costs.shape == pixels.shape
+
+
+def test_5_cancellation():
+    size = 64
+    im, mask_true = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+    correction = {(0, size - 1)}
+
+    for max_flow in ('push_relabel', 'boykov_kolmogorov',
+                     'parallel_push_relabel'):
+        segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                  max_flow=max_flow, tile_size=16)
+        progress = []
+
+        with pytest.raises(SolverCancelled):
+            segmentator.mark(object, background,
+                             progress=lambda operations:
+                             progress.append(dict(operations)))
+
+        assert progress and segmentator.interrupted
+
+        # Seeds of the cancelled solve are kept
+        mask_ours = segmentator.mark(background_pixels=correction,
+                                     as_mask=True)
+        assert not segmentator.interrupted
+
+        expected = Segmentator(im, 8, 1.0, gaussian(10.0),
+                               max_flow=max_flow, tile_size=16)
+        expected.mark(object, background)
+
+        assert np.array_equal(
+            mask_ours, expected.mark(background_pixels=correction,
+                                     as_mask=True)
+        )
+
+
+def test_6_refine():
+    size = 64
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+    corrections = [set(product(range(20, 24), range(30, 34))),
+                   {(size - 1, size - 1)}]
+
+    for max_flow in ('push_relabel', 'boykov_kolmogorov',
+                     'parallel_push_relabel'):
+        segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                  max_flow=max_flow)
+        expected = Segmentator(im, 8, 1.0, gaussian(10.0),
+                               max_flow=max_flow)
+
+        labels = segmentator.mark(object, background, as_mask=True)
+        expected.mark(object, background)
+
+        ys, xs = segmentator.refine(background_pixels=corrections[0])
+        mask_true = expected.mark(background_pixels=corrections[0],
+                                  as_mask=True)
+
+        assert len(ys) > 0
+        assert np.array_equal(segmentator.labels, mask_true)
+        assert np.array_equal(np.nonzero(labels != mask_true), (ys, xs))
+
+        # Network is solved by the next mark
+        assert np.array_equal(
+            segmentator.mark(background_pixels=corrections[1],
+                             as_mask=True),
+            expected.mark(background_pixels=corrections[1], as_mask=True)
+        )
+
+
+def test_7_out_of_core(tmp_path):
+    size = 64
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    for max_flow, workers in (('push_relabel', 1),
+                              ('parallel_push_relabel', 2)):
+        storage_dir = tmp_path / max_flow
+        segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                  max_flow=max_flow, workers=workers,
+                                  tile_size=16, storage_dir=str(storage_dir))
+        mask_ours = segmentator.mark(object, background, as_mask=True)
+
+        assert isinstance(segmentator.graph.capacity, np.memmap)
+        assert isinstance(segmentator.network.capacity, np.memmap)
+        assert isinstance(segmentator.network.height, np.memmap)
+
+        mask_true = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                max_flow=max_flow, tile_size=16
+                                ).mark(object, background, as_mask=True)
+        assert np.array_equal(mask_ours, mask_true)
+
+        segmentator.save_mask(str(storage_dir / 'mask.pgm'))
+        saved = np.asarray(Image.open(storage_dir / 'mask.pgm'))
+        assert np.array_equal(saved == 255, mask_true)
+
+
+def test_8_refine_cancellation():
+    size = 64
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+    correction = set(product(range(20, 24), range(30, 34)))
+
+    segmentator = Segmentator(im, 8, 1.0, gaussian(10.0))
+    labels = segmentator.mark(object, background, as_mask=True).copy()
+
+    # Band of the whole image is large enough to report progress
+    with pytest.raises(SolverCancelled):
+        segmentator.refine(background_pixels=correction, radius=size,
+                           progress=lambda operations: False)
+
+    assert np.array_equal(segmentator.labels, labels)
+
+    # Seeds of the cancelled refine are segmented by the next one
+    ys, xs = segmentator.refine()
+
+    expected = Segmentator(im, 8, 1.0, gaussian(10.0))
+    expected.mark(object, background)
+    mask_true = expected.mark(background_pixels=correction, as_mask=True)
+
+    assert len(ys) > 0
+    assert np.array_equal(segmentator.labels, mask_true)
+
+
+def test_9_warm_start_seeds():
+    size = 48
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+    corrections = [{(11, 11), (11, 12)}, {(30, 20), (31, 20), (32, 20)}]
+
+    # Costs of the first seeds are kept by the next marks
+    def relative_cost_gen(image, object_pixels, background_pixels, K):
+        return histogram_cost(image, object, background, K)
+
+    for max_flow in ('push_relabel', 'boykov_kolmogorov'):
+        segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                                  max_flow=max_flow)
+        segmentator.mark(object, background)
+        seeds = background
+
+        for correction in corrections:
+            seeds = seeds | correction
+            mask_ours = segmentator.mark(background_pixels=correction,
+                                         as_mask=True)
+
+            # Warm started cut is the cut of a cold solve
+            mask_true = Segmentator(
+                im, 8, 1.0, gaussian(10.0), max_flow=max_flow,
+                relative_cost_gen=relative_cost_gen
+            ).mark(object, seeds, as_mask=True)
+            assert np.array_equal(mask_ours, mask_true)
+
+
+def test_10_shared_storage_dir(tmp_path):
+    size = 48
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+    correction = {(30, 20), (31, 20), (32, 20)}
+
+    for max_flow, workers in (('push_relabel', 1),
+                              ('parallel_push_relabel', 2)):
+        storage_dir = str(tmp_path / max_flow)
+
+        # Seeds of the second segmentator are swapped, both are solved
+        # before the corrections
+        seeds = [(object, background), (background, object)]
+        segmentators = [Segmentator(im, 8, 1.0, gaussian(10.0),
+                                    max_flow=max_flow, workers=workers,
+                                    tile_size=16, storage_dir=storage_dir)
+                        for _ in seeds]
+
+        for segmentator, (object_pixels, background_pixels) in zip(
+            segmentators, seeds
+        ):
+            segmentator.mark(object_pixels, background_pixels)
+
+        for segmentator, (object_pixels, background_pixels) in zip(
+            segmentators, seeds
+        ):
+            mask_ours = segmentator.mark(background_pixels=correction,
+                                         as_mask=True)
+
+            # Costs of the first seeds are kept by the correction
+            def relative_cost_gen(image, _, __, K):
+                return histogram_cost(image, object_pixels,
+                                      background_pixels, K)
+
+            mask_true = Segmentator(
+                im, 8, 1.0, gaussian(10.0), max_flow=max_flow, tile_size=16,
+                relative_cost_gen=relative_cost_gen
+            ).mark(object_pixels, background_pixels | correction,
+                   as_mask=True)
+            assert np.array_equal(mask_ours, mask_true)
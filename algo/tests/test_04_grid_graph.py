@@ -0,0 +1,199 @@
+from copy import deepcopy
+from itertools import product
+
+import networkx as nx
+import numpy as np
+from algo.boykov_kolmogorov import boykov_kolmogorov
+from algo.csr import push_relabel
+from algo.parallel_push_relabel import parallel_push_relabel
+from networkx.algorithms.flow import preflow_push
+
+from .utils import generate_grid_graph
+
+
+def grid_to_nx(grid):
+    graph = nx.DiGraph()
+
+    for x, y in product(range(grid.width), range(grid.height)):
+        u = grid.node(x, y)
+        graph.add_edge('s', u, capacity=grid.source_capacity[y, x])
+        graph.add_edge(u, 't', capacity=grid.sink_capacity[y, x])
+
+        for k, (dx, dy) in enumerate(grid.deltas):
+            if grid.neighbor_mask(k)[y, x]:
+                graph.add_edge(u, grid.node(x + dx, y + dy),
+                               capacity=grid.capacity[y, x, k])
+
+    return graph
+
+
+def test_1_network_structure():
+    grid = generate_grid_graph(5, 4, [(0, 1), (1, 0), (0, -1), (-1, 0)])
+    network = grid.to_network()
+
+    arcs = np.arange(network.arcs_num)
+    assert np.array_equal(network.reverse[network.reverse], arcs)
+    assert np.array_equal(network.tails()[network.reverse], network.targets)
+
+    assert np.all(network.tails()[grid.source_arcs()] == grid.source)
+    assert np.all(network.targets[grid.sink_arcs()] == grid.sink)
+
+
+def test_2_max_flow():
+    deltas_list = [
+        [(0, 1), (1, 0), (0, -1), (-1, 0)],
+        [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+    ]
+
+    for seed, deltas in product(range(5), deltas_list):
+        grid = generate_grid_graph(7, 6, deltas, seed)
+        true_flow = preflow_push(grid_to_nx(grid), 's', 't',
+                                 value_only=True).graph['flow_value']
+
+        for max_flow in (push_relabel, boykov_kolmogorov):
+            network = grid.to_network()
+            result = max_flow(network, grid.source, grid.sink)
+
+            assert result.flow_value == true_flow
+            assert result.source_side[grid.source]
+            assert not result.source_side[grid.sink]
+
+
+def test_3_warm_start():
+    rng = np.random.default_rng(0)
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed in range(5):
+        grid = generate_grid_graph(8, 7, deltas, seed)
+        network = grid.to_network()
+        first_flow = push_relabel(network, grid.source, grid.sink).flow_value
+
+        pixels = rng.choice(grid.pixels_num, 10, replace=False)
+        arcs = np.concatenate((grid.source_arcs()[pixels],
+                               grid.sink_arcs()[pixels]))
+        capacities = rng.integers(0, 30, len(arcs))
+
+        cold_network = deepcopy(network)
+        cold_network.capacity[arcs] = capacities
+        initial_capacity = cold_network.capacity.copy()
+        cold = push_relabel(cold_network, grid.source, grid.sink)
+
+        active_nodes = network.set_capacities(arcs, capacities, grid.source)
+        warm = push_relabel(network, grid.source, grid.sink,
+                            active_nodes=active_nodes)
+
+        assert warm.flow_value - first_flow == cold.flow_value
+
+        tails = network.tails()
+        for result in (cold, warm):
+            crossing = (result.source_side[tails] &
+                        ~result.source_side[network.targets])
+            assert initial_capacity[crossing].sum() == cold.flow_value
+
+
+def test_4_parallel_push_relabel():
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed, (tile_size, workers) in product(range(3),
+                                              [(1, 1), (3, 1), (4, 2)]):
+        grid = generate_grid_graph(10, 9, deltas, seed)
+        tile_of, tile_color = grid.tiles(tile_size)
+
+        network = grid.to_network()
+        true_flow = push_relabel(network, grid.source, grid.sink).flow_value
+
+        network = grid.to_network()
+        result = parallel_push_relabel(network, grid.source, grid.sink,
+                                       tile_of, tile_color, workers)
+
+        assert result.flow_value == true_flow
+        assert result.source_side[grid.source]
+        assert not result.source_side[grid.sink]
+
+        # Flow must be valid to warm start push_relabel after it
+        assert np.all(network.excess[:grid.pixels_num] == 0)
+
+
+def test_5_cut_only():
+    rng = np.random.default_rng(0)
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed in range(5):
+        grid = generate_grid_graph(8, 7, deltas, seed)
+        tile_of, tile_color = grid.tiles(3)
+        initial_capacity = grid.to_network().capacity
+
+        network = grid.to_network()
+        true_flow = push_relabel(network, grid.source, grid.sink).flow_value
+
+        pixels = rng.choice(grid.pixels_num, 10, replace=False)
+        arcs = np.concatenate((grid.source_arcs()[pixels],
+                               grid.sink_arcs()[pixels]))
+        capacities = rng.integers(0, 30, len(arcs))
+
+        for max_flow in (push_relabel, parallel_push_relabel):
+            network = grid.to_network()
+            tiles = (() if max_flow is push_relabel else
+                     (tile_of, tile_color))
+            result = max_flow(network, grid.source, grid.sink, *tiles,
+                              cut_only=True)
+
+            assert result.flow_value == true_flow
+
+            # Maximum preflow is warm started, the capacities of the
+            # network are the flow on the arcs plus the new residual ones
+            capacity = initial_capacity.copy()
+            capacity[arcs] += capacities - network.capacity[arcs]
+
+            active_nodes = network.set_capacities(arcs, capacities,
+                                                  grid.source)
+            warm = push_relabel(network, grid.source, grid.sink,
+                                active_nodes=active_nodes, cut_only=True)
+
+            cold_network = grid.to_network()
+            cold_network.capacity[:] = capacity
+            cold = push_relabel(cold_network, grid.source, grid.sink)
+
+            tails = network.tails()
+            crossing = (warm.source_side[tails] &
+                        ~warm.source_side[network.targets])
+
+            assert warm.flow_value == cold.flow_value
+            assert capacity[crossing].sum() == cold.flow_value
+
+
+def test_6_boykov_kolmogorov_preflow():
+    rng = np.random.default_rng(1)
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed in range(30):
+        grid = generate_grid_graph(12, 10, deltas, seed)
+        initial_capacity = grid.to_network().capacity
+
+        pixels = rng.choice(grid.pixels_num, 10, replace=False)
+        arcs = np.concatenate((grid.source_arcs()[pixels],
+                               grid.sink_arcs()[pixels]))
+        capacities = rng.integers(0, 30, len(arcs))
+
+        for change in (False, True):
+            # Maximum preflow leaves excess that cannot reach the sink
+            network = grid.to_network()
+            push_relabel(network, grid.source, grid.sink, cut_only=True)
+
+            capacity = initial_capacity.copy()
+
+            if change:
+                capacity[arcs] += capacities - network.capacity[arcs]
+                network.set_capacities(arcs, capacities, grid.source)
+
+            result = boykov_kolmogorov(network, grid.source, grid.sink)
+
+            cold_network = grid.to_network()
+            cold_network.capacity[:] = capacity
+            cold = push_relabel(cold_network, grid.source, grid.sink)
+
+            tails = network.tails()
+            crossing = (result.source_side[tails] &
+                        ~result.source_side[network.targets])
+
+            assert capacity[crossing].sum() == cold.flow_value
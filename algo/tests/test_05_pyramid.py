@@ -0,0 +1,69 @@
+from itertools import product
+
+import numpy as np
+from algo.csr import push_relabel
+from algo.image_segmentation import Segmentator, gaussian
+from algo.pyramid import boundary_band, pyramid_segmentation
+from algo.utils import jaccard_score
+
+from .utils import disk_image_seeds, generate_disk_image, generate_grid_graph
+
+
+def cut_capacity(grid, mask):
+    network = grid.to_network()
+    source_side = np.append(mask.ravel(), [True, False])
+    crossing = (source_side[network.tails()] &
+                ~source_side[network.targets])
+
+    return network.capacity[crossing].sum()
+
+
+def test_1_band_network():
+    rng = np.random.default_rng(0)
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed in range(5):
+        grid = generate_grid_graph(9, 8, deltas, seed)
+        network = grid.to_network()
+        result = push_relabel(network, grid.source, grid.sink)
+        labels = result.source_side[:grid.pixels_num].reshape(8, 9)
+
+        # Optimal labels outside the band keep the band solution optimal
+        band = rng.random((8, 9)) < 0.5
+        band_network, pixels = grid.band_network(band, labels)
+        band_result = push_relabel(band_network, len(pixels),
+                                   len(pixels) + 1)
+
+        mask = labels.copy()
+        mask.ravel()[pixels] = band_result.source_side[:len(pixels)]
+
+        assert cut_capacity(grid, mask) == result.flow_value
+
+
+def test_2_boundary_band():
+    labels = np.zeros((7, 7), dtype=bool)
+    labels[:, 4:] = True
+
+    band = boundary_band(labels, 1)
+
+    assert np.all(band[:, 2:6])
+    assert not np.any(band[:, :2]) and not np.any(band[:, 6:])
+
+
+def test_3_pyramid_segmentation():
+    size = 64
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                              max_flow='boykov_kolmogorov')
+    mask_full = segmentator.mark(object, background, as_mask=True)
+
+    for max_flow in ('boykov_kolmogorov', 'parallel_push_relabel'):
+        mask_ours = pyramid_segmentation(im, object, background, levels=3,
+                                         neighbors=8,
+                                         boundary_cost=gaussian(10.0),
+                                         max_flow=max_flow)
+
+        assert mask_ours.shape == mask_full.shape
+        assert jaccard_score(mask_full, mask_ours) > 0.98
@@ -0,0 +1,94 @@
+from itertools import product
+
+import numpy as np
+from algo.csr import push_relabel
+from algo.image_segmentation import Segmentator, gaussian, gmm_cost
+from algo.superpixels import slic, superpixel_segmentation
+from algo.utils import jaccard_score
+
+from .utils import (disk_image_seeds, generate_color_disk_image,
+                    generate_disk_image, generate_grid_graph)
+
+
+def test_1_slic():
+    im, mask_true = generate_disk_image(60)
+    regions = slic(np.asarray(im), 10)
+
+    assert regions.shape == mask_true.shape
+    assert np.array_equal(np.unique(regions), np.arange(regions.max() + 1))
+    assert 25 <= regions.max() + 1 <= 36
+
+    # Superpixels follow the edge of the disk
+    purity = [max(mask_true[regions == region].mean(),
+                  1 - mask_true[regions == region].mean())
+              for region in range(regions.max() + 1)]
+    assert np.mean(purity) > 0.95
+
+
+def test_2_region_network():
+    deltas = [x for x in product((-1, 0, 1), repeat=2) if x != (0, 0)]
+
+    for seed in range(3):
+        grid = generate_grid_graph(7, 6, deltas, seed)
+        network = grid.to_network()
+        true_flow = push_relabel(network, grid.source, grid.sink).flow_value
+
+        # Regions of single pixels give the pixel graph back
+        regions = np.arange(grid.pixels_num).reshape(6, 7)
+        network = grid.region_network(regions)
+        result = push_relabel(network, grid.pixels_num, grid.pixels_num + 1)
+
+        assert result.flow_value == true_flow
+
+        # Merging pixels cannot decrease the minimum cut
+        regions = regions // 2
+        network = grid.region_network(regions)
+        result = push_relabel(network, network.nodes_num - 2,
+                              network.nodes_num - 1)
+
+        assert result.flow_value >= true_flow
+
+
+def test_3_superpixel_segmentation():
+    size = 64
+    im, _ = generate_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    segmentator = Segmentator(im, 8, 1.0, gaussian(10.0),
+                              max_flow='boykov_kolmogorov')
+    mask_full = segmentator.mark(object, background, as_mask=True)
+
+    for max_flow in ('boykov_kolmogorov', 'parallel_push_relabel'):
+        mask_ours = superpixel_segmentation(im, object, background, 8,
+                                            neighbors=8,
+                                            boundary_cost=gaussian(10.0),
+                                            max_flow=max_flow)
+
+        assert mask_ours.shape == mask_full.shape
+        assert jaccard_score(mask_full, mask_ours) > 0.95
+
+
+def test_4_color_superpixel_segmentation():
+    size = 64
+    im, mask_true = generate_color_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    # Disk and background differ in color, not in luminance
+    regions = slic(np.asarray(im), 8)
+    purity = [max(mask_true[regions == region].mean(),
+                  1 - mask_true[regions == region].mean())
+              for region in range(regions.max() + 1)]
+    assert np.mean(purity) > 0.95
+
+    segmentator = Segmentator(im, 8, 1.0, gaussian(30.0),
+                              relative_cost_gen=gmm_cost(),
+                              max_flow='boykov_kolmogorov')
+    mask_full = segmentator.mark(object, background, as_mask=True)
+    mask_ours = superpixel_segmentation(im, object, background, 8,
+                                        neighbors=8,
+                                        boundary_cost=gaussian(30.0),
+                                        relative_cost_gen=gmm_cost(),
+                                        max_flow='boykov_kolmogorov')
+
+    assert jaccard_score(mask_full, mask_ours) > 0.95
+    assert jaccard_score(mask_true, mask_ours) > 0.95
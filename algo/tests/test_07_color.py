@@ -0,0 +1,97 @@
+import numpy as np
+from algo.color import fit_gmm, rgb_to_lab
+from algo.grabcut import grabcut
+from algo.image_segmentation import (Segmentator, gaussian, gmm_cost,
+                                     gmm_relative_cost)
+from algo.utils import jaccard_score
+
+from .utils import disk_image_seeds, generate_color_disk_image
+
+
+def test_1_rgb_to_lab():
+    lab = rgb_to_lab(np.array([[0, 0, 0], [255, 255, 255], [255, 0, 0]]))
+
+    assert np.allclose(lab[0], (0, 0, 0), atol=1e-6)
+    assert np.allclose(lab[1], (100, 0, 0), atol=1e-3)
+    assert np.allclose(lab[2], (53.24, 80.09, 67.20), atol=1e-2)
+
+
+def test_2_fit_gmm():
+    rng = np.random.default_rng(0)
+    samples = np.concatenate((rng.normal(0, 1, (500, 2)),
+                              rng.normal(10, 1, (1500, 2))))
+
+    model = fit_gmm(samples, components=2)
+    order = np.argsort(model.means[:, 0])
+
+    assert np.allclose(model.weights[order], (0.25, 0.75), atol=0.02)
+    assert np.allclose(model.means[order], ((0, 0), (10, 10)), atol=0.2)
+    assert np.allclose(model.covariances[order], np.eye(2), atol=0.2)
+
+
+def test_3_reweight():
+    size = 48
+    im, mask_true = generate_color_disk_image(size)
+    object, background = disk_image_seeds(size)
+    features = np.asarray(im, dtype=np.float64)
+
+    for max_flow in ('push_relabel', 'boykov_kolmogorov'):
+        segmentator = Segmentator(im, 8, 1.0, gaussian(30.0),
+                                  relative_cost_gen=gmm_cost(),
+                                  max_flow=max_flow)
+        segmentator.mark(object, background)
+
+        # Models fitted to the true labels
+        models = {'object': fit_gmm(features[mask_true == 1]),
+                  'background': fit_gmm(features[mask_true == 0])}
+        relative_cost = gmm_relative_cost(models, infinity=segmentator.K)
+
+        expected = Segmentator(im, 8, 1.0, gaussian(30.0),
+                               relative_cost_gen=lambda *_: relative_cost,
+                               max_flow=max_flow)
+
+        assert np.array_equal(
+            segmentator.reweight(relative_cost),
+            expected.mark(object, background, as_mask=True)
+        )
+
+
+def test_4_grabcut():
+    size = 64
+    im, mask_true = generate_color_disk_image(size)
+    object, background = disk_image_seeds(size)
+
+    mask_gray = Segmentator(im.convert('L'), 8, 1.0, gaussian(10.0),
+                            max_flow='boykov_kolmogorov'
+                            ).mark(object, background, as_mask=True)
+    mask_ours = grabcut(im, object, background, neighbors=8,
+                        boundary_cost=gaussian(10.0),
+                        max_flow='boykov_kolmogorov')
+
+    assert jaccard_score(mask_true, mask_ours) > 0.99
+    assert (jaccard_score(mask_true, mask_ours) >
+            jaccard_score(mask_true, mask_gray))
+
+
+def test_5_scalar_boundary_cost():
+    size = 24
+    im, _ = generate_color_disk_image(size)
+    object, background = disk_image_seeds(size)
+    sigma = 30.0
+
+    # Scalar cost receives color vectors of the pixels
+    def cost(i_p, i_q, p, q):
+        distance = np.hypot(p[0] - q[0], p[1] - q[1])
+        return (np.exp(-np.sum((i_p - i_q) ** 2) / (2 * sigma ** 2)) /
+                distance)
+
+    segmentators = [Segmentator(im, 8, 1.0, boundary_cost,
+                                relative_cost_gen=gmm_cost())
+                    for boundary_cost in (cost, gaussian(sigma))]
+
+    assert np.allclose(segmentators[0].graph.capacity,
+                       segmentators[1].graph.capacity)
+    assert np.array_equal(
+        *(segmentator.mark(object, background, as_mask=True)
+          for segmentator in segmentators)
+    )
@@ -0,0 +1,77 @@
+import numpy as np
+from algo.cache import SegmentationCache
+from algo.image_segmentation import Segmentator, gaussian
+
+from .utils import disk_image_seeds, generate_disk_image
+
+
+def test_1_memory_and_disk(tmp_path):
+    image, _ = generate_disk_image(32)
+    object_points, background_points = disk_image_seeds(32)
+
+    true_mask = Segmentator(image, 8, 1.0, gaussian(10.0)).mark(
+        object_points, background_points, as_mask=True
+    )
+
+    cache = SegmentationCache(directory=str(tmp_path))
+    for _ in range(2):
+        mask = cache.segment(image, object_points, background_points,
+                             8, 1.0, 10.0)
+        assert np.array_equal(mask, true_mask)
+
+    assert cache.stats['misses'] == 1 and cache.stats['hits'] == 1
+
+    # Masks on disk are shared with other caches
+    cache = SegmentationCache(directory=str(tmp_path))
+    mask = cache.segment(image, object_points, background_points,
+                         8, 1.0, 10.0)
+
+    assert np.array_equal(mask, true_mask)
+    assert cache.stats['disk_hits'] == 1 and cache.stats['misses'] == 0
+
+    # Parameters and seeds are part of the key
+    cache.segment(image, object_points, background_points, 8, 2.0, 10.0)
+    cache.segment(image, object_points, set(list(background_points)[1:]),
+                  8, 1.0, 10.0)
+
+    assert cache.stats['misses'] == 2
+
+
+def test_2_eviction():
+    image, _ = generate_disk_image(32)
+    object_points, background_points = disk_image_seeds(32)
+    corrections = [{(x, 31)} for x in range(3)]
+
+    # Packed mask of 32x32 pixels takes 128 bytes
+    cache = SegmentationCache(max_bytes=256)
+    for correction in corrections:
+        cache.segment(image, object_points, background_points | correction)
+
+    assert len(cache) == 2 and cache.stats['evictions'] == 1
+
+    cache.segment(image, object_points, background_points | corrections[2])
+    cache.segment(image, object_points, background_points | corrections[0])
+
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 4
+
+
+def test_3_warm_start():
+    image, _ = generate_disk_image(48)
+    object_points, background_points = disk_image_seeds(48)
+    corrections = [{(11, 11), (11, 12)}, {(30, 20), (31, 20), (32, 20)}]
+
+    cache = SegmentationCache(max_states=1)
+    cache.segment(image, object_points, background_points, 8, 1.0, 10.0)
+
+    for correction in corrections:
+        background_points = background_points | correction
+        mask = cache.segment(image, object_points, background_points,
+                             8, 1.0, 10.0)
+
+        # Warm started mask is the mask of a cold solve with the same key
+        true_mask = SegmentationCache().segment(
+            image, object_points, background_points, 8, 1.0, 10.0
+        )
+        assert np.array_equal(mask, true_mask)
+
+    assert cache.stats['warm_starts'] == 2 and cache.stats['misses'] == 3
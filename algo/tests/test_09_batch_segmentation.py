@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from batch_segmentation import (BACKGROUND_VALUE, OBJECT_VALUE, list_jobs,
+                                main, parse_args, read_seeds)
+
+from .utils import disk_image_seeds, generate_disk_image
+
+
+def write_disk_image(path, size=16):
+    image, _ = generate_disk_image(size)
+    image.save(path)
+
+    object_points, background_points = disk_image_seeds(size)
+    stem = os.path.splitext(path)[0]
+
+    with open(stem + '.boxes.json', 'w') as f:
+        json.dump({'object': [[x, y, x + 1, y + 1]
+                              for x, y in sorted(object_points)],
+                   'background': [[0, 0, size, 1]]}, f)
+
+    return object_points, background_points
+
+
+def test_1_read_seeds(tmp_path):
+    boxes_path = str(tmp_path / 'a.boxes.json')
+    with open(boxes_path, 'w') as f:
+        json.dump({'object': [[1, 2, 3, 4]], 'background': [[0, 0, 2, 1]]}, f)
+
+    # Right and bottom edges are excluded
+    assert read_seeds(boxes_path) == ({(1, 2), (1, 3), (2, 2), (2, 3)},
+                                      {(0, 0), (1, 0)})
+
+    scribbles = np.zeros((4, 5), dtype=np.uint8)
+    scribbles[1, 3] = OBJECT_VALUE
+    scribbles[2, 0] = BACKGROUND_VALUE
+    scribbles_path = str(tmp_path / 'a.seeds.png')
+    Image.fromarray(scribbles).save(scribbles_path)
+
+    assert read_seeds(scribbles_path) == ({(3, 1)}, {(0, 2)})
+
+
+def test_2_list_jobs(tmp_path):
+    output_dir = str(tmp_path / 'masks')
+    write_disk_image(str(tmp_path / 'a.png'))
+    Image.fromarray(np.zeros((4, 4), dtype=np.uint8)).save(
+        str(tmp_path / 'a.seeds.png')
+    )
+
+    # Scribble masks are not images, images without seeds are still listed
+    generate_disk_image(16)[0].save(str(tmp_path / 'b.png'))
+
+    assert list(list_jobs(str(tmp_path), output_dir)) == [
+        (str(tmp_path / 'a.png'), None,
+         os.path.join(output_dir, 'a.mask.png')),
+        (str(tmp_path / 'b.png'), None,
+         os.path.join(output_dir, 'b.mask.png'))
+    ]
+
+    # Images of the same name in different directories keep their paths
+    manifest_path = tmp_path / 'manifest.csv'
+    manifest_path.write_text('image,seeds\n'
+                             'x/a.png,x/a.boxes.json\n'
+                             'y/a.png,y/a.boxes.json\n'
+                             '../z/a.png,../z/a.boxes.json\n')
+
+    outputs = [job[2] for job in list_jobs(str(manifest_path), output_dir)]
+
+    assert outputs == [os.path.join(output_dir, 'x', 'a.mask.png'),
+                       os.path.join(output_dir, 'y', 'a.mask.png'),
+                       os.path.join(output_dir, 'z', 'a.mask.png')]
+
+
+def test_3_main(tmp_path, capsys):
+    input_dir, output_dir = tmp_path / 'images', tmp_path / 'masks'
+    os.makedirs(str(input_dir / 'x'))
+    os.makedirs(str(input_dir / 'y'))
+
+    for name in ('x/a.png', 'y/a.png'):
+        write_disk_image(str(input_dir / name))
+
+    # Images without seeds fail alone
+    generate_disk_image(16)[0].save(str(input_dir / 'x' / 'b.png'))
+
+    manifest_path = input_dir / 'manifest.csv'
+    manifest_path.write_text('image,seeds\n'
+                             'x/a.png,x/a.boxes.json\n'
+                             'x/b.png,x/b.boxes.json\n'
+                             'y/a.png,y/a.boxes.json\n')
+
+    assert main([str(manifest_path), str(output_dir), '--workers', '1',
+                 '--sigma', '10']) == 1
+
+    output = capsys.readouterr().out
+    assert 'b.png: failed' in output and '2 images in' in output
+
+    true_mask = np.where(generate_disk_image(16)[1], 255, 0)
+    for name in ('x/a.mask.png', 'y/a.mask.png'):
+        mask = np.asarray(Image.open(str(output_dir / name)))
+        assert np.array_equal(mask, true_mask)
+
+    assert not os.path.exists(str(output_dir / 'x' / 'b.mask.png'))
+
+
+def test_4_cache_with_pyramid(tmp_path):
+    with pytest.raises(SystemExit):
+        parse_args([str(tmp_path), str(tmp_path), '--cache-dir',
+                    str(tmp_path), '--pyramid-levels', '2'])
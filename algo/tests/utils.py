@@ -1,4 +1,10 @@
+from itertools import product
+from typing import Set, Tuple
+
 import networkx as nx
+import numpy as np
+from PIL import Image
+from algo.grid_graph import GridGraph
 
 
 def read_graph_from_file(file_path: str) -> nx.DiGraph:
@@ -16,3 +22,56 @@ def read_graph_from_file(file_path: str) -> nx.DiGraph:
             graph.add_edge(u, v, capacity=capacity)
 
     return graph
+
+
+def generate_disk_image(size: int,
+                        seed: int = 0) -> Tuple[Image.Image, np.ndarray]:
+    rng = np.random.default_rng(seed)
+
+    ys, xs = np.mgrid[:size, :size]
+    center = (size - 1) / 2
+    mask = (xs - center) ** 2 + (ys - center) ** 2 <= (size / 3) ** 2
+
+    pixels = np.where(mask, 180, 60) + rng.normal(0, 10, (size, size))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'L')
+
+    return image, mask.astype(np.uint8)
+
+
+def generate_color_disk_image(size: int, seed: int = 0
+                              ) -> Tuple[Image.Image, np.ndarray]:
+    rng = np.random.default_rng(seed)
+
+    ys, xs = np.mgrid[:size, :size]
+    center = (size - 1) / 2
+    mask = (xs - center) ** 2 + (ys - center) ** 2 <= (size / 3) ** 2
+
+    # Red disk on green background of about the same luminance
+    pixels = (np.where(mask[..., np.newaxis], (190, 90, 90), (90, 128, 90)) +
+              rng.normal(0, 10, (size, size, 3)))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+    return image, mask.astype(np.uint8)
+
+
+def disk_image_seeds(size: int) -> Tuple[Set[Tuple[int, int]],
+                                         Set[Tuple[int, int]]]:
+    center = size // 2
+    radius = max(size // 10, 1)
+
+    object_points = set(product(range(center - radius, center + radius),
+                                repeat=2))
+    background_points = set(product(range(size), range(radius)))
+
+    return object_points, background_points
+
+
+def generate_grid_graph(width, height, deltas, seed=0):
+    rng = np.random.default_rng(seed)
+
+    grid = GridGraph(width, height, deltas)
+    grid.capacity[:] = rng.integers(0, 10, grid.capacity.shape)
+    grid.source_capacity[:] = rng.integers(0, 20, (height, width))
+    grid.sink_capacity[:] = rng.integers(0, 20, (height, width))
+
+    return grid
@@ -4,14 +4,10 @@ import numpy as np
 def generate_mask(s, t, shape):
     mask = np.zeros(shape)
 
-    s.remove('s')
-    t.remove('t')
-
-    for px, py in s:
-        mask[py, px] = 1
-
-    for px, py in t:
-        mask[py, px] = 0
+    # Pixels of t are left zero
+    pixels = np.array([pixel for pixel in s if pixel != 's'],
+                      dtype=np.int64).reshape(-1, 2)
+    mask[pixels[:, 1], pixels[:, 0]] = 1
 
     return mask
 
@@ -0,0 +1,211 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from algo.cache import SegmentationCache
+from algo.image_segmentation import (Point, Segmentator, gaussian,
+                                     max_flow_backends)
+from algo.pyramid import pyramid_segmentation
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# Seed files next to the images: <name>.boxes.json with lists of
+# [x0, y0, x1, y1] boxes (right and bottom edges excluded) under 'object'
+# and 'background' keys, or <name>.seeds.png scribble mask where object
+# pixels are 1 and background pixels are 2, as in the GUI
+BOXES_SUFFIX = '.boxes.json'
+SCRIBBLES_SUFFIX = '.seeds.png'
+
+OBJECT_VALUE, BACKGROUND_VALUE = 1, 2
+
+# Image path, seeds path, found next to the image if None, and output path
+Job = Tuple[str, Optional[str], str]
+
+
+def read_seeds(seeds_path: str) -> Tuple[Set[Point], Set[Point]]:
+    if seeds_path.endswith('.json'):
+        with open(seeds_path, 'r') as f:
+            boxes = json.load(f)
+
+        seeds = []
+        for key in ('object', 'background'):
+            points = set()
+            for x0, y0, x1, y1 in boxes[key]:
+                points.update((x, y) for x in range(x0, x1)
+                              for y in range(y0, y1))
+            seeds.append(points)
+
+        return seeds[0], seeds[1]
+
+    scribbles = np.asarray(Image.open(seeds_path).convert('L'))
+
+    seeds = []
+    for value in (OBJECT_VALUE, BACKGROUND_VALUE):
+        ys, xs = np.nonzero(scribbles == value)
+        seeds.append(set(zip(xs.tolist(), ys.tolist())))
+
+    return seeds[0], seeds[1]
+
+
+def find_seeds(image_path: str) -> str:
+    stem = os.path.splitext(image_path)[0]
+
+    for suffix in (BOXES_SUFFIX, SCRIBBLES_SUFFIX):
+        if os.path.exists(stem + suffix):
+            return stem + suffix
+
+    raise FileNotFoundError(f'no seeds found for {image_path}')
+
+
+def list_jobs(input_path: str, output_dir: str) -> Iterator[Job]:
+    """
+        List images to segment.
+        Input is either a directory, where every image has a seed file
+        next to it, or a CSV manifest with 'image' and 'seeds' columns,
+        paths relative to the manifest. Masks keep the paths of the images
+        relative to the input, so that images of the same name in
+        different directories do not overwrite each other's masks.
+    """
+
+    def output_path(relative_path: str) -> str:
+        # Parent directories and roots are dropped, the mask stays inside
+        # the output directory
+        parts = [part for part in os.path.normpath(relative_path).split(os.sep)
+                 if part not in ('', os.curdir, os.pardir)]
+        parts[-1] = os.path.splitext(parts[-1])[0] + '.mask.png'
+
+        return os.path.join(output_dir, *parts)
+
+    if os.path.isdir(input_path):
+        for filename in sorted(os.listdir(input_path)):
+            if (not filename.lower().endswith(IMAGE_EXTENSIONS) or
+                    filename.endswith(SCRIBBLES_SUFFIX)):
+                continue
+
+            image_path = os.path.join(input_path, filename)
+            yield image_path, None, output_path(filename)
+    else:
+        manifest_dir = os.path.dirname(input_path)
+
+        with open(input_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                image_path = os.path.join(manifest_dir, row['image'])
+                seeds_path = os.path.join(manifest_dir, row['seeds'])
+                yield image_path, seeds_path, output_path(row['image'])
+
+
+def segment(job: Job, args: argparse.Namespace) -> Tuple[str, int, float]:
+    image_path, seeds_path, mask_path = job
+
+    timer_start = time.perf_counter()
+
+    image = Image.open(image_path).convert('L')
+    object_pixels, background_pixels = read_seeds(
+        seeds_path or find_seeds(image_path)
+    )
+    segmentator_args = dict(neighbors=args.neighbors, lambda_=args.lambda_,
+                            boundary_cost=gaussian(args.sigma),
+                            max_flow=args.max_flow)
+
+    if args.pyramid_levels > 1:
+        mask = pyramid_segmentation(image, object_pixels, background_pixels,
+                                    args.pyramid_levels, **segmentator_args)
+    elif args.cache_dir is not None:
+        # Every job is a new request, only the disk tier is shared
+        cache = SegmentationCache(max_bytes=0, directory=args.cache_dir)
+        mask = cache.segment(image, object_pixels, background_pixels,
+                             args.neighbors, args.lambda_, args.sigma,
+                             max_flow=args.max_flow)
+    else:
+        segmentator = Segmentator(image, **segmentator_args)
+        mask = segmentator.mark(object_pixels, background_pixels,
+                                as_mask=True)
+
+    os.makedirs(os.path.dirname(mask_path), exist_ok=True)
+    Image.fromarray(np.where(mask, 255, 0).astype(np.uint8)).save(mask_path)
+    elapsed = time.perf_counter() - timer_start
+
+    return image_path, image.width * image.height, elapsed
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Segment a batch of images with seeds.'
+    )
+    parser.add_argument('input',
+                        help='directory of images with seed files '
+                             'or CSV manifest with image and seeds columns')
+    parser.add_argument('output_dir', help='directory for the mask PNGs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('--neighbors', type=int, default=8, choices=(4, 8))
+    parser.add_argument('--lambda', dest='lambda_', type=float, default=1.0)
+    parser.add_argument('--sigma', type=float, default=1.0)
+    parser.add_argument('--max-flow', default='boykov_kolmogorov',
+                        choices=tuple(max_flow_backends))
+    parser.add_argument('--pyramid-levels', type=int, default=1,
+                        help='segment coarse to fine if greater than 1')
+    parser.add_argument('--cache-dir',
+                        help='directory of cached masks, reused when the '
+                             'image, the seeds and the parameters match')
+
+    args = parser.parse_args(argv)
+
+    # Pyramid segmentation does not go through the cache
+    if args.cache_dir is not None and args.pyramid_levels > 1:
+        parser.error('--cache-dir cannot be used with --pyramid-levels > 1')
+
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    """
+        Segment the images, a failed image is reported and the others are
+        segmented anyway. Return 1 if any image failed, 0 otherwise.
+    """
+
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = list(list_jobs(args.input, args.output_dir))
+    total_pixels = 0
+    failed = 0
+
+    timer_start = time.perf_counter()
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [executor.submit(segment, job, args) for job in jobs]
+
+        for (image_path, _, _), future in zip(jobs, futures):
+            try:
+                _, pixels, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f'{image_path}: failed: {e!r}')
+                continue
+
+            total_pixels += pixels
+            print(f'{image_path}: {elapsed:.3f} s')
+
+    total_time = time.perf_counter() - timer_start
+    segmented = len(jobs) - failed
+
+    print(f'{segmented} images in {total_time:.3f} s, '
+          f'{segmented / total_time:.2f} images/s, '
+          f'{total_pixels / 1e6 / total_time:.2f} Mpx/s')
+
+    if failed:
+        print(f'{failed} images failed')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+import time
+from copy import deepcopy
+
+from algo.csr import push_relabel
+
+from .global_relabeling import segmentation_network
+
+
+def main(sizes=(64, 128, 256)):
+    print(f'{"size":>6}{"mode":>6}{"discharges":>12}{"pushes":>10}'
+          f'{"relabels":>10}{"excess left":>13}{"time (s)":>10}')
+
+    for size in sizes:
+        segmentator = segmentation_network(size)
+
+        for cut_only in (False, True):
+            network = deepcopy(segmentator.network)
+
+            timer_start = time.perf_counter()
+            result = push_relabel(
+                network, segmentator.graph.source, segmentator.graph.sink,
+                network.nodes_num//10, cut_only=cut_only
+            )
+            timing = time.perf_counter() - timer_start
+
+            operations = result.operations
+            excess_nodes = int((network.excess[:-2] > 0).sum())
+
+            print(f'{size:>6}{"cut" if cut_only else "flow":>6}'
+                  f'{operations["discharges"]:>12}{operations["pushes"]:>10}'
+                  f'{operations["relabels"]:>10}'
+                  f'{excess_nodes:>13}{timing:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import time
+from copy import deepcopy
+from itertools import product
+from typing import Set, Tuple
+
+import numpy as np
+from PIL import Image
+from algo.csr import (GLOBAL_RELABELING_WORK, CSRNetwork, FlowResult,
+                      push_relabel)
+from algo.image_segmentation import Segmentator, gaussian
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+Seeds = Set[Tuple[int, int]]
+
+
+def disk_image(size: int) -> Tuple[Image.Image, Seeds, Seeds]:
+    image, _ = generate_disk_image(size)
+
+    return (image, *disk_image_seeds(size))
+
+
+def two_blob_image(size: int,
+                   seed: int = 0) -> Tuple[Image.Image, Seeds, Seeds]:
+    # Two blobs barely brighter than the noisy background
+    rng = np.random.default_rng(seed)
+
+    ys, xs = np.mgrid[:size, :size]
+    radius = size / 6
+    centers = ((size / 3, size / 3), (2 * size / 3, 2 * size / 3))
+    mask = np.zeros((size, size), dtype=bool)
+
+    for cx, cy in centers:
+        mask |= (xs - cx) ** 2 + (ys - cy) ** 2 <= radius ** 2
+
+    pixels = np.where(mask, 140, 120) + rng.normal(0, 12, (size, size))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'L')
+
+    side = max(int(radius) // 2, 1)
+    object_points = {(int(cx) + dx, int(cy) + dy) for cx, cy in centers
+                     for dx, dy in product(range(-side, side), repeat=2)}
+    background_points = set(product(range(size), range(side)))
+
+    return image, object_points, background_points
+
+
+images = {'disk': disk_image, 'two blobs': two_blob_image}
+
+
+def segmentation_network(size: int, neighbors: int = 8,
+                         sigma: float = 10.0, lambda_: float = 1.0,
+                         image: str = 'disk') -> Segmentator:
+    image, object_points, background_points = images[image](size)
+
+    segmentator = Segmentator(image, neighbors, lambda_, gaussian(sigma))
+    pixels_num = segmentator.graph.pixels_num
+
+    # Only the initial network is needed, the flow is not computed
+    segmentator.max_flow = lambda *_: FlowResult(
+        0, np.zeros(pixels_num + 2, dtype=bool)
+    )
+    segmentator.mark(object_points, background_points)
+
+    return segmentator
+
+
+def main(sizes=(32, 64, 128), lambdas=(1.0, 0.02)):
+    print(f'{"image":>10}{"size":>6}{"lambda":>8}{"policy":>18}'
+          f'{"relabels":>10}{"pushes":>10}{"global":>8}{"bfs nodes":>11}'
+          f'{"time (s)":>10}')
+
+    for image, size, lambda_ in product(images, sizes, lambdas):
+        segmentator = segmentation_network(size, lambda_=lambda_,
+                                           image=image)
+        network: CSRNetwork = segmentator.network
+
+        policies = {
+            'fixed': dict(global_relabeling_freq=network.nodes_num//10),
+            'adaptive': dict(global_relabeling_work=GLOBAL_RELABELING_WORK),
+            'adaptive+source': dict(
+                global_relabeling_work=GLOBAL_RELABELING_WORK,
+                source_relabeling=True
+            )
+        }
+
+        flow_values = []
+
+        for policy, kwargs in policies.items():
+            policy_network = deepcopy(network)
+
+            # Segmentator backends need the minimum cut only
+            timer_start = time.perf_counter()
+            result = push_relabel(policy_network, segmentator.graph.source,
+                                  segmentator.graph.sink, cut_only=True,
+                                  **kwargs)
+            timing = time.perf_counter() - timer_start
+
+            flow_values.append(result.flow_value)
+            operations = result.operations
+
+            print(f'{image:>10}{size:>6}{lambda_:>8}{policy:>18}'
+                  f'{operations["relabels"]:>10}{operations["pushes"]:>10}'
+                  f'{operations["global_relabelings"]:>8}'
+                  f'{operations["bfs_nodes"]:>11}{timing:>10.3f}')
+
+        # Flow values of float capacities differ by rounding only
+        assert np.allclose(flow_values, flow_values[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import os
+import time
+from queue import PriorityQueue
+from typing import List, Tuple
+from unittest import mock
+
+from algo.graph_utils import get_max_flow
+from algo.label_queue import HighestLabelQueue
+from algo.tests.utils import read_graph_from_file
+
+# Operation trace item: ('push', node, height) or ('pop', None, 0)
+Operation = Tuple[str, object, int]
+
+
+class RecordingQueue(HighestLabelQueue):
+    trace: List[Operation] = []
+
+    def push(self, node, height):
+        self.trace.append(('push', node, height))
+        super().push(node, height)
+
+    def pop(self):
+        self.trace.append(('pop', None, 0))
+        return super().pop()
+
+
+def record_trace(file_path: str) -> List[Operation]:
+    graph = read_graph_from_file(file_path)
+    nodes_quantity = len(graph)
+
+    RecordingQueue.trace = []
+    with mock.patch('algo.graph_utils.HighestLabelQueue', RecordingQueue):
+        get_max_flow(graph, 1, nodes_quantity, nodes_quantity//10)
+
+    return RecordingQueue.trace
+
+
+def replay_priority_queue(trace: List[Operation]) -> float:
+    timer_start = time.perf_counter()
+
+    nodes_queue = PriorityQueue()
+    for operation, node, height in trace:
+        if operation == 'push':
+            nodes_queue.put((-height, node))
+        else:
+            nodes_queue.get()
+
+    return time.perf_counter() - timer_start
+
+
+def replay_label_queue(trace: List[Operation]) -> float:
+    timer_start = time.perf_counter()
+
+    nodes_queue = HighestLabelQueue()
+    for operation, node, height in trace:
+        if operation == 'push':
+            nodes_queue.push(node, height)
+        else:
+            nodes_queue.pop()
+
+    return time.perf_counter() - timer_start
+
+
+def main(target_dir: str = './algo/tests/push_relabel_test_inputs',
+         repeat: int = 5):
+    print(f'{"filename":<16}{"operations":>12}'
+          f'{"PriorityQueue (s)":>20}{"HighestLabelQueue (s)":>24}')
+
+    for filename in sorted(os.listdir(target_dir)):
+        trace = record_trace(os.path.join(target_dir, filename))
+
+        priority_queue_time = min(replay_priority_queue(trace)
+                                  for _ in range(repeat))
+        label_queue_time = min(replay_label_queue(trace)
+                               for _ in range(repeat))
+
+        print(f'{filename:<16}{len(trace):>12}'
+              f'{priority_queue_time:>20.5f}{label_queue_time:>24.5f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import time
+
+from algo.image_segmentation import Segmentator, gaussian, max_flow_backends
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+
+def main(sizes=(16, 32, 64), neighbors: int = 8, sigma: float = 10.0):
+    print(f'{"size":>6}' +
+          ''.join(f'{name + " (s)":>24}' for name in max_flow_backends))
+
+    for size in sizes:
+        image, _ = generate_disk_image(size)
+        object_points, background_points = disk_image_seeds(size)
+
+        timings = []
+        for max_flow in max_flow_backends:
+            segmentator = Segmentator(image, neighbors, 1.0, gaussian(sigma),
+                                      max_flow=max_flow)
+
+            timer_start = time.perf_counter()
+            segmentator.mark(object_points, background_points)
+            timings.append(time.perf_counter() - timer_start)
+
+        print(f'{size:>6}' + ''.join(f'{timing:>24.3f}' for timing in timings))
+
+
+if __name__ == '__main__':
+    main()
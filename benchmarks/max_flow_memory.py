@@ -0,0 +1,68 @@
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Tuple
+
+import networkx as nx
+import numpy as np
+from algo.csr import FlowResult
+from algo.graph_utils import get_max_flow
+from algo.image_segmentation import Segmentator, gaussian
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+
+def peak_rss() -> float:
+    # ru_maxrss is measured in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def segmentation_graph(size: int, neighbors: int = 8,
+                       sigma: float = 10.0) -> Tuple[nx.DiGraph, int, int]:
+    image, _ = generate_disk_image(size)
+    object_points, background_points = disk_image_seeds(size)
+
+    segmentator = Segmentator(image, neighbors, 1.0, gaussian(sigma))
+    pixels_num = segmentator.graph.pixels_num
+
+    # Only the initial network is needed, the flow is not computed
+    segmentator.max_flow = lambda *_: FlowResult(
+        0, np.zeros(pixels_num + 2, dtype=bool)
+    )
+    segmentator.mark(object_points, background_points)
+
+    graph = segmentator.network.to_graph()
+    graph.remove_edges_from(list(nx.selfloop_edges(graph)))
+
+    return graph, segmentator.graph.source, segmentator.graph.sink
+
+
+def measure(size: int, in_place: bool) -> Tuple[int, float, float]:
+    graph, source, sink = segmentation_graph(size)
+    graph_rss = peak_rss()
+
+    get_max_flow(graph, source, sink, len(graph)//10, value_only=False,
+                 in_place=in_place)
+
+    return graph.number_of_edges(), graph_rss, peak_rss()
+
+
+def main(sizes=(64, 128)):
+    print(f'{"size":>6}{"edges":>10}{"mode":>10}'
+          f'{"graph (MB)":>14}{"peak (MB)":>14}{"solve (MB)":>14}')
+
+    for size in sizes:
+        for in_place in (False, True):
+            # Every measurement runs in a fresh process
+            # since peak RSS never decreases
+            with ProcessPoolExecutor(1, get_context('spawn')) as executor:
+                edges, graph_rss, solve_rss = executor.submit(
+                    measure, size, in_place
+                ).result()
+
+            mode = 'in place' if in_place else 'copy'
+            print(f'{size:>6}{edges:>10}{mode:>10}{graph_rss:>14.1f}'
+                  f'{solve_rss:>14.1f}{solve_rss - graph_rss:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional, Tuple
+
+from algo.image_segmentation import Segmentator, gaussian
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+
+def anonymous_rss() -> float:
+    # Pages of memory-mapped files are resident too, but they can be
+    # evicted, so only the anonymous memory is measured
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+
+    return 0.0
+
+
+def measure(size: int, storage_dir: Optional[str],
+            max_flow: str) -> Tuple[float, float]:
+    image, _ = generate_disk_image(size)
+    object_pixels, background_pixels = disk_image_seeds(size)
+    baseline = anonymous_rss()
+    peak = baseline
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.002):
+            peak = max(peak, anonymous_rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+
+    # Graph and network are built, the flow is not computed
+    segmentator = Segmentator(image, 8, 1.0, gaussian(10.0),
+                              max_flow=max_flow, storage_dir=storage_dir)
+    segmentator.graph.to_network()
+
+    build_peak = max(peak, anonymous_rss()) - baseline
+
+    # Working sets of the solver are allocated by the first mark
+    segmentator.mark(object_pixels, background_pixels)
+
+    done.set()
+    sampler.join()
+
+    return build_peak, max(peak, anonymous_rss()) - baseline
+
+
+def main(sizes=(256, 512, 1024),
+         backends=('push_relabel', 'boykov_kolmogorov')):
+    print('Peak anonymous memory of building the graph and the network '
+          'and of the whole first mark')
+    print(f'{"size":>6}{"backend":>20}{"mode":>10}'
+          f'{"build (MB)":>12}{"mark (MB)":>12}')
+
+    for size in sizes:
+        for max_flow in backends:
+            with tempfile.TemporaryDirectory() as storage_dir:
+                for mode, directory in (('memory', None),
+                                        ('mmap', storage_dir)):
+                    # Every measurement runs in a fresh process
+                    # since peak RSS never decreases
+                    with ProcessPoolExecutor(1,
+                                             get_context('spawn')) as executor:
+                        build, mark = executor.submit(
+                            measure, size, directory, max_flow
+                        ).result()
+
+                    print(f'{size:>6}{max_flow:>20}{mode:>10}'
+                          f'{build:>12.1f}{mark:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
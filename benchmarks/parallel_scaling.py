@@ -0,0 +1,31 @@
+import os
+import time
+
+from algo.image_segmentation import Segmentator, gaussian
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+
+def main(size: int = 256, workers_list=(1, 2, 4, 8, 16),
+         tile_size: int = 64, neighbors: int = 8, sigma: float = 10.0):
+    image, _ = generate_disk_image(size)
+    object_points, background_points = disk_image_seeds(size)
+
+    print(f'image: {size}x{size}, tile: {tile_size}, cpus: {os.cpu_count()}')
+    print(f'{"workers":>8}{"time (s)":>12}{"speedup":>10}')
+
+    base_time = None
+    for workers in workers_list:
+        segmentator = Segmentator(image, neighbors, 1.0, gaussian(sigma),
+                                  max_flow='parallel_push_relabel',
+                                  workers=workers, tile_size=tile_size)
+
+        timer_start = time.perf_counter()
+        segmentator.mark(object_points, background_points)
+        timing = time.perf_counter() - timer_start
+
+        base_time = base_time or timing
+        print(f'{workers:>8}{timing:>12.3f}{base_time / timing:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import time
+
+from algo.image_segmentation import Segmentator, gaussian
+from algo.pyramid import pyramid_segmentation
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+from algo.utils import jaccard_score
+
+
+def main(sizes=(256, 512, 1024), levels: int = 4, band_width: int = 2,
+         max_flow: str = 'boykov_kolmogorov', neighbors: int = 8,
+         sigma: float = 10.0):
+    results = []
+
+    for size in sizes:
+        image, _ = generate_disk_image(size)
+        object_points, background_points = disk_image_seeds(size)
+
+        timer_start = time.perf_counter()
+        segmentator = Segmentator(image, neighbors, 1.0, gaussian(sigma),
+                                  max_flow=max_flow)
+        mask_full = segmentator.mark(object_points, background_points,
+                                     as_mask=True)
+        full_time = time.perf_counter() - timer_start
+
+        timer_start = time.perf_counter()
+        mask_pyramid = pyramid_segmentation(image, object_points,
+                                            background_points, levels,
+                                            band_width, neighbors=neighbors,
+                                            boundary_cost=gaussian(sigma),
+                                            max_flow=max_flow)
+        pyramid_time = time.perf_counter() - timer_start
+
+        results.append((size, full_time, pyramid_time,
+                        jaccard_score(mask_full, mask_pyramid)))
+
+    print(f'{"size":>6}{"full (s)":>12}{"pyramid (s)":>14}'
+          f'{"speedup":>10}{"Jaccard":>10}')
+
+    for size, full_time, pyramid_time, jaccard in results:
+        print(f'{size:>6}{full_time:>12.3f}{pyramid_time:>14.3f}'
+              f'{full_time / pyramid_time:>10.1f}{jaccard:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
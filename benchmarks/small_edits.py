@@ -0,0 +1,83 @@
+import time
+from itertools import product
+from typing import Dict, Set, Tuple
+
+from algo.csr import FlowResult
+from algo.image_segmentation import MaxFlowFunction, Segmentator, gaussian
+
+from .global_relabeling import images
+
+
+def correction_stroke(object_points: Set[Tuple[int, int]]
+                      ) -> Set[Tuple[int, int]]:
+    # Background stroke of 18 pixels inside the object, right of the
+    # rightmost object seed
+    x, y = max(object_points)
+
+    return set(product(range(x + 1, x + 4), range(y - 3, y + 3)))
+
+
+def counted(segmentator: Segmentator) -> Dict[str, int]:
+    # Operations of the last solve of the segmentator: pushes of
+    # push-relabel or augmentations of Boykov-Kolmogorov
+    operations: Dict[str, int] = {}
+
+    def counter(max_flow: MaxFlowFunction) -> MaxFlowFunction:
+        def wrapper(*args) -> FlowResult:
+            result = max_flow(*args)
+            operations.clear()
+            operations.update(result.operations)
+            return result
+
+        return wrapper
+
+    segmentator.max_flow = counter(segmentator.max_flow)
+    segmentator.correction_max_flow = counter(
+        segmentator.correction_max_flow
+    )
+
+    return operations
+
+
+def main(sizes=(64, 128), lambdas=(1.0, 0.02),
+         backends=('push_relabel', 'boykov_kolmogorov')):
+    print('Time of a small correction stroke: warm started mark, solved by '
+          'Boykov-Kolmogorov, and cold solve of all the seeds by the backend')
+    print(f'{"image":>10}{"size":>6}{"lambda":>8}{"backend":>20}'
+          f'{"warm (s)":>10}{"warm ops":>10}'
+          f'{"cold (s)":>10}{"cold ops":>10}')
+
+    for image, size, lambda_, max_flow in product(images, sizes, lambdas,
+                                                  backends):
+        pixels, object_points, background_points = images[image](size)
+        stroke = correction_stroke(object_points)
+        timings, counts = [], []
+
+        segmentator = Segmentator(pixels, 8, lambda_, gaussian(10.0),
+                                  max_flow=max_flow)
+        operations = counted(segmentator)
+        segmentator.mark(object_points, background_points)
+
+        timer_start = time.perf_counter()
+        segmentator.mark(background_pixels=stroke)
+        timings.append(time.perf_counter() - timer_start)
+        counts.append(operations.get('pushes',
+                                     operations.get('augmentations')))
+
+        segmentator = Segmentator(pixels, 8, lambda_, gaussian(10.0),
+                                  max_flow=max_flow)
+        operations = counted(segmentator)
+
+        timer_start = time.perf_counter()
+        segmentator.mark(object_points, background_points | stroke)
+        timings.append(time.perf_counter() - timer_start)
+        counts.append(operations.get('pushes',
+                                     operations.get('augmentations')))
+
+        print(f'{image:>10}{size:>6}{lambda_:>8}{max_flow:>20}'
+              f'{timings[0]:>10.3f}{counts[0]:>10}'
+              f'{timings[1]:>10.3f}{counts[1]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import get_context
+from typing import Any, Dict, List, Tuple
+
+import networkx as nx
+import numpy as np
+from algo.graph_utils import get_max_flow
+from algo.image_segmentation import Segmentator, gaussian, max_flow_backends
+from algo.tests.utils import disk_image_seeds, generate_disk_image
+
+from .max_flow_memory import peak_rss
+
+# Parameters identifying a case in the results
+CASE_KEYS = ('size', 'neighbors', 'lambda', 'sigma', 'max_flow')
+
+Case = Dict[str, Any]
+
+
+def case_key(case: Case) -> Tuple:
+    return tuple(case[key] for key in CASE_KEYS)
+
+
+def correction_seeds(size: int) -> set:
+    # Background stroke inside the disk, so that the cut changes
+    start = size // 4
+    side = max(size // 32, 1)
+
+    return set(product(range(start, start + side), repeat=2))
+
+
+def run_case(case: Case, graph_max_size: int) -> Case:
+    """
+        Time the stages of the segmentation of a synthetic image.
+        Runs in a fresh process, so that peak memory is of this case only.
+    """
+
+    size = case['size']
+    pixels = size * size
+    image, _ = generate_disk_image(size, seed=0)
+    object_points, background_points = disk_image_seeds(size)
+    baseline_rss = peak_rss()
+
+    timings: Dict[str, float] = {}
+
+    timer_start = time.perf_counter()
+    segmentator = Segmentator(image, case['neighbors'], case['lambda'],
+                              gaussian(case['sigma']),
+                              max_flow=case['max_flow'])
+    timings['init'] = time.perf_counter() - timer_start
+
+    timer_start = time.perf_counter()
+    segmentator.mark(object_points, background_points, as_mask=True)
+    timings['first_mark'] = time.perf_counter() - timer_start
+
+    timer_start = time.perf_counter()
+    segmentator.mark(background_pixels=correction_seeds(size), as_mask=True)
+    timings['incremental_mark'] = time.perf_counter() - timer_start
+
+    result = dict(case, pixels=pixels, timings=timings,
+                  peak_memory_mb=peak_rss() - baseline_rss)
+
+    # networkx solver is much slower, it is run on small images only
+    if size <= graph_max_size:
+        # Network of the graph, not the solved residual network: the graph
+        # keeps the original capacities with the terminal capacities of
+        # all the seeds
+        graph = segmentator.graph.to_network().to_graph()
+        graph.remove_edges_from(list(nx.selfloop_edges(graph)))
+
+        graph = get_max_flow(graph, segmentator.graph.source,
+                             segmentator.graph.sink, len(graph)//10,
+                             value_only=False, in_place=True, stats=True)
+        assert graph.graph['flow_value'] > 0
+
+        stats = graph.graph['stats']
+        timings['get_max_flow'] = stats.total_time
+        result['get_max_flow'] = dict(phase_times=stats.phase_times,
+                                      operations=stats.operations)
+
+    return result
+
+
+def merge_runs(runs: List[Case]) -> Case:
+    """
+        Merge the runs of a case: minimum timings, which are the least
+        affected by the other load of the machine, and maximum peak memory.
+    """
+
+    result = runs[0]
+    timings = {stage: min(run['timings'][stage] for run in runs)
+               for stage in result['timings']}
+
+    return dict(result, runs=len(runs), timings=timings,
+                throughput={stage: result['pixels'] / timing
+                            for stage, timing in timings.items()},
+                peak_memory_mb=max(run['peak_memory_mb'] for run in runs))
+
+
+def metadata() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+
+    return dict(commit=commit, python=platform.python_version(),
+                numpy=np.__version__, networkx=nx.__version__,
+                machine=platform.machine(), processor=platform.processor(),
+                date=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def print_results(cases: List[Case]) -> None:
+    print(f'{"size":>6}{"nbrs":>6}{"lambda":>8}{"sigma":>7}'
+          f'{"max_flow":>20}{"init (s)":>10}{"mark (s)":>10}'
+          f'{"incr (s)":>10}{"Mpx/s":>8}{"peak (MB)":>11}')
+
+    for case in cases:
+        timings = case['timings']
+        print(f'{case["size"]:>6}{case["neighbors"]:>6}'
+              f'{case["lambda"]:>8}{case["sigma"]:>7}'
+              f'{case["max_flow"]:>20}{timings["init"]:>10.3f}'
+              f'{timings["first_mark"]:>10.3f}'
+              f'{timings["incremental_mark"]:>10.3f}'
+              f'{case["throughput"]["first_mark"] / 1e6:>8.3f}'
+              f'{case["peak_memory_mb"]:>11.1f}')
+
+
+def print_comparison(cases: List[Case], baseline: Dict[str, Any],
+                     threshold: float) -> None:
+    """
+        Print ratios of the timings to the baseline ones,
+        ratios above the threshold are marked as regressions.
+    """
+
+    baseline_cases = {case_key(case): case for case in baseline['cases']}
+
+    print(f'Compared with {baseline["metadata"]["commit"]}')
+
+    for case in cases:
+        old_case = baseline_cases.get(case_key(case))
+        if old_case is None:
+            continue
+
+        ratios = {stage: timing / old_case['timings'][stage]
+                  for stage, timing in case['timings'].items()
+                  if old_case['timings'].get(stage)}
+        regressions = [stage for stage, ratio in ratios.items()
+                       if ratio > threshold]
+
+        print(', '.join(f'{key}={case[key]}' for key in CASE_KEYS) + ': ' +
+              ', '.join(f'{stage} x{ratio:.2f}'
+                        for stage, ratio in ratios.items()) +
+              (f'  REGRESSION: {", ".join(regressions)}'
+               if regressions else ''))
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Benchmark segmentation of synthetic images.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[64, 256, 1024],
+                        help='image sides, 2048 for 4 megapixels')
+    parser.add_argument('--neighbors', type=int, nargs='+', default=[4, 8],
+                        choices=(4, 8))
+    parser.add_argument('--lambdas', type=float, nargs='+', default=[1.0])
+    parser.add_argument('--sigmas', type=float, nargs='+', default=[10.0])
+    parser.add_argument('--max-flow', nargs='+',
+                        default=['boykov_kolmogorov'],
+                        choices=tuple(max_flow_backends))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs of every case')
+    parser.add_argument('--graph-max-size', type=int, default=64,
+                        help='largest size get_max_flow is timed on')
+    parser.add_argument('--output', help='JSON file to store results in')
+    parser.add_argument('--compare', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='timing ratio reported as a regression')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+
+    cases = [dict(zip(CASE_KEYS, values))
+             for values in product(args.sizes, args.neighbors, args.lambdas,
+                                   args.sigmas, args.max_flow)]
+    results = []
+
+    for case in cases:
+        runs = []
+
+        # Every run is in a fresh process since peak RSS never decreases
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(1, get_context('spawn')) as executor:
+                runs.append(executor.submit(run_case, case,
+                                            args.graph_max_size).result())
+
+        results.append(merge_runs(runs))
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(metadata=metadata(), cases=results), f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(results, json.load(f), args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,23 @@
-import numpy as np
+import logging
+import threading
+import time
 import tkinter as tk
-from itertools import product
 from tkinter import IntVar, StringVar
 from tkinter import filedialog as fd
-from tkinter import ttk
+from tkinter import messagebox, ttk
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageTk
 
-from algo.image_segmentation import Segmentator
-from algo.utils import correctness_ratio, generate_mask, jaccard_score
+from algo.csr import SolverCancelled
+from algo.image_segmentation import Segmentator, gmm_cost
+from algo.utils import correctness_ratio, jaccard_score
+
+
+# Interval of checking the segmentation job, ms
+POLL_INTERVAL = 50
+
+logger = logging.getLogger(__name__)
 
 
 def get_circle_bounding_box(center_x, center_y, radius):
@@ -60,6 +69,19 @@ class SegmentatorGui(tk.Frame):
             'background': 2
         }
 
+        # Segmentation runs in a worker thread, strokes released during
+        # a segmentation are collected here and cancel it, then they are
+        # segmented together by the next job
+        self._job = None
+        self._job_result = None
+        self._job_error = None
+        self._job_segmentator = None
+        self._job_start = 0.0
+        self._cancel_event = threading.Event()
+        self._operations = {}
+        self._pending_object = set()
+        self._pending_background = set()
+
         # Empty picture on first start
         self.orig_image = Image.new('RGBA', (300, 300))
 
@@ -84,10 +106,19 @@ class SegmentatorGui(tk.Frame):
         self.orig_image = Image.open(filename).convert('RGBA')
         self.mask_image = Image.new('RGBA', self.orig_image.size)
 
-        self.segmentator = Segmentator(self.orig_image.convert('L'),
-                                       neighbors=8)
+        # Colors are modelled in Lab, so that objects of the same
+        # luminance as the background are separated
+        self.segmentator = Segmentator(self.orig_image.convert('RGB'),
+                                       neighbors=8,
+                                       relative_cost_gen=gmm_cost(lab=True),
+                                       lab=True)
         self._phase = 'initial'
 
+        # Job of the previous picture is not needed anymore
+        self._cancel_event.set()
+        self._pending_object = set()
+        self._pending_background = set()
+
         # Mask of background and object points
         # Selected during one iteration
         # This is not presented to user
@@ -189,6 +220,22 @@ class SegmentatorGui(tk.Frame):
                                              text='Correctness ratio: -')
         self._correctness_metric.grid(row=2, column=1)
 
+    def _init_progress(self):
+        self._progress_frame = tk.LabelFrame(
+            self,
+            text='Segmentation',
+            relief=tk.RIDGE,
+            padx=10
+        )
+        self._progress_frame.grid(row=3, column=1, sticky=tk.NS)
+
+        self._progress_bar = ttk.Progressbar(self._progress_frame,
+                                             mode='indeterminate')
+        self._progress_bar.grid(row=1, column=1)
+
+        self._progress_label = ttk.Label(self._progress_frame, text='-')
+        self._progress_label.grid(row=2, column=1)
+
     # GUI initialization functions
     def _init_canvas(self):
         self._canvas_frame = tk.LabelFrame(
@@ -225,6 +272,7 @@ class SegmentatorGui(tk.Frame):
 
         self._init_toolbox()
         self._init_metrics()
+        self._init_progress()
         self._init_canvas()
         self._init_ground_truth_mask()
 
@@ -233,16 +281,25 @@ class SegmentatorGui(tk.Frame):
         self.canvas.bind('<B1-Motion>', self.pressed_cursor_motion_handler)
         self.canvas.bind('<ButtonRelease-1>', self.cursor_release_handler)
 
-    def _update_displayed_image(self):
-        self.combined_image = self.orig_image.copy()
+    def _update_displayed_image(self, box=None):
+        # The composite is cached, a stroke recomposites its box only
+        if box is None or not hasattr(self, 'combined_image'):
+            self.combined_image = self.orig_image.copy()
 
-        if hasattr(self, 'mask_image'):
-            self.combined_image.paste(self.mask_image,
-                                      mask=self.mask_image)
+            if hasattr(self, 'mask_image'):
+                self.combined_image.paste(self.mask_image,
+                                          mask=self.mask_image)
+        else:
+            region = self.orig_image.crop(box)
+            mask_region = self.mask_image.crop(box)
+            region.paste(mask_region, mask=mask_region)
+            self.combined_image.paste(region, box[:2])
 
-        if hasattr(self, 'pointer_image'):
-            self.combined_image.paste(self.pointer_image,
-                                      mask=self.pointer_image)
+        if (hasattr(self, 'combined_tk_image') and
+                self.combined_tk_image.width() == self.combined_image.width and
+                self.combined_tk_image.height() == self.combined_image.height):
+            self.combined_tk_image.paste(self.combined_image)
+            return
 
         self.combined_tk_image = ImageTk.PhotoImage(self.combined_image)
 
@@ -260,10 +317,26 @@ class SegmentatorGui(tk.Frame):
                 anchor=tk.NW
             )
 
-    def _update_metrics(self, s, t):
+        if hasattr(self, 'cursor'):
+            self.canvas.tag_raise(self.cursor)
+
+    def _move_cursor(self, event):
+        # Cursor is a canvas item, so moving it does not redraw the image
+        box = get_circle_bounding_box(event.x, event.y, self.radius.get())
+        color = '#{:02x}{:02x}{:02x}'.format(
+            *self._colors[self._point_type.get()][:3]
+        )
+
+        if hasattr(self, 'cursor'):
+            self.canvas.coords(self.cursor, *box)
+            self.canvas.itemconfig(self.cursor, outline=color)
+        else:
+            self.cursor = self.canvas.create_oval(*box, outline=color,
+                                                  width=2)
+
+    def _update_metrics(self, mask_ours):
         if hasattr(self, 'ground_truth_mask_image'):
             mask_true = np.array(self.ground_truth_mask_image)
-            mask_ours = generate_mask(s, t, mask_true.shape)
             jm = jaccard_score(mask_true, mask_ours)
             self._jaccard_metric.config(text='Jaccard: ' + str(jm))
             cm = correctness_ratio(mask_true, mask_ours)
@@ -271,20 +344,12 @@ class SegmentatorGui(tk.Frame):
 
     # Event handlers
     def cursor_motion_handler(self, event):
-        self.pointer_image = Image.new('RGBA', self.orig_image.size)
-        ImageDraw.Draw(self.pointer_image).ellipse(
-            get_circle_bounding_box(event.x - self.offset_x,
-                                    event.y - self.offset_y,
-                                    self.radius.get()),
-            fill=self._colors[self._point_type.get()]
-        )
-        self._update_displayed_image()
+        self._move_cursor(event)
 
     def pressed_cursor_motion_handler(self, event):
-        if self._is_picture_opened:
-            # Clear cursor before drawing
-            self.pointer_image = Image.new('RGBA', self.orig_image.size)
+        self._move_cursor(event)
 
+        if self._is_picture_opened:
             box = get_circle_bounding_box(event.x - self.offset_x,
                                           event.y - self.offset_y,
                                           self.radius.get())
@@ -296,62 +361,168 @@ class SegmentatorGui(tk.Frame):
                 box, fill=self._colors[self._point_type.get()]
             )
 
-            self._update_displayed_image()
+            # Ellipse includes the right and the bottom edges of its box
+            x0, y0, x1, y1 = box
+            box = (max(x0, 0), max(y0, 0),
+                   min(x1 + 1, self.orig_image.width),
+                   min(y1 + 1, self.orig_image.height))
+
+            if box[0] < box[2] and box[1] < box[3]:
+                self._update_displayed_image(box)
 
     def cursor_release_handler(self, _):
         def extract_marked_pixels(image: Image.Image):
-            object_pixels = set()
-            background_pixels = set()
+            mask = np.asarray(image)
+            seeds = []
 
-            for pixel in product(range(image.width), range(image.height)):
-                if image.getpixel(pixel) == self._mask_colors['object']:
-                    object_pixels.add(pixel)
+            for point_type in ('object', 'background'):
+                ys, xs = np.nonzero(mask == self._mask_colors[point_type])
+                seeds.append(set(zip(xs.tolist(), ys.tolist())))
 
-                if image.getpixel(pixel) == self._mask_colors['background']:
-                    background_pixels.add(pixel)
+            return seeds[0], seeds[1]
 
-            return object_pixels, background_pixels
+        if self._phase == 'initial':
+            point_type_str = self._point_type.get()
+            self._is_object_selected |= (point_type_str == 'object')
+            self._is_background_selected |= (point_type_str == 'background')
 
-        def start_segmentation():
-            print('segmentation started')
+            if not (self._is_object_selected and
+                    self._is_background_selected):
+                return
 
-            object_pixels, background_pixels = extract_marked_pixels(
-                self._mask
-            )
-            s, t = self.segmentator.mark(
-                object_pixels=object_pixels,
-                background_pixels=background_pixels
-            )
+            self._phase = 'main'
 
-            print('segmentation completed')
+        timer_start = time.perf_counter()
+        object_pixels, background_pixels = extract_marked_pixels(self._mask)
+        self._pending_object |= object_pixels
+        self._pending_background |= background_pixels
+        logger.info('seeds extracted: %d object, %d background pixels in '
+                    '%.3f s', len(object_pixels), len(background_pixels),
+                    time.perf_counter() - timer_start)
 
-            for pixel in s:
-                if pixel != 's':
-                    self.mask_image.putpixel(pixel,
-                                             self._colors['object'])
-            for pixel in t:
-                if pixel != 't':
-                    self.mask_image.putpixel(pixel,
-                                             self._colors['background'])
+        # Clear temp mask
+        self._mask = Image.new('L', self.orig_image.size, 0)
 
-            # Clear temp mask
-            self._mask = Image.new('L', self.orig_image.size, 0)
-            self._update_displayed_image()
-            self._update_metrics(s, t)
+        if self._job is not None:
+            # Stale job is cancelled, the strokes are segmented after it
+            self._cancel_event.set()
+        elif self._pending_object or self._pending_background:
+            self._start_segmentation()
+
+    def _start_segmentation(self):
+        logger.info('segmentation started')
+
+        object_pixels = self._pending_object
+        background_pixels = self._pending_background
+        self._pending_object = set()
+        self._pending_background = set()
+
+        segmentator = self.segmentator
+        self._cancel_event.clear()
+        self._job_result = None
+        self._job_error = None
+        self._job_segmentator = segmentator
+        self._job_start = time.perf_counter()
+
+        def progress(operations):
+            self._operations = dict(operations)
+            return not self._cancel_event.is_set()
+
+        def run():
+            try:
+                if segmentator.labels is not None:
+                    # Corrections are segmented around the strokes only
+                    changed = segmentator.refine(object_pixels,
+                                                 background_pixels,
+                                                 progress=progress)
+                    self._job_result = (segmentator.labels, changed)
+                else:
+                    mask = segmentator.mark(
+                        object_pixels=object_pixels,
+                        background_pixels=background_pixels,
+                        as_mask=True,
+                        progress=progress
+                    )
+                    self._job_result = (mask, None)
+            except SolverCancelled:
+                # Seeds stay in the segmentator, the next job resumes
+                self._job_result = None
+            except Exception as e:
+                # Shown by the main thread, Tk is not thread-safe
+                self._job_result = None
+                self._job_error = e
+
+        self._job = threading.Thread(target=run, daemon=True)
+        self._job.start()
+
+        self._progress_bar.start()
+        self.after(POLL_INTERVAL, self._poll_segmentation)
+
+    def _poll_segmentation(self):
+        if self._job.is_alive():
+            self._progress_label.config(text=', '.join(
+                f'{name}: {count}' for name, count in self._operations.items()
+            ))
+            self.after(POLL_INTERVAL, self._poll_segmentation)
+            return
+
+        self._job = None
+        result, error = self._job_result, self._job_error
+        elapsed = time.perf_counter() - self._job_start
+
+        if self._job_segmentator is not self.segmentator:
+            # Picture was changed during the segmentation
+            result, error = None, None
+
+        if result is not None:
+            logger.info('segmentation completed in %.3f s', elapsed)
+
+            timer_start = time.perf_counter()
+            self._show_segmentation(*result)
+            logger.info('segmentation shown in %.3f s',
+                        time.perf_counter() - timer_start)
+        elif error is not None:
+            logger.error('segmentation failed', exc_info=error)
+            messagebox.showerror('Segmentation failed',
+                                 f'{type(error).__name__}: {error}')
+
+        if self._pending_object or self._pending_background:
+            self._start_segmentation()
+        else:
+            self._progress_bar.stop()
 
-        if self._phase == 'initial':
-            point_type_str = self._point_type.get()
-            self._is_object_selected |= (point_type_str == 'object')
-            self._is_background_selected |= (point_type_str == 'background')
+            if result is not None:
+                status = f'done in {elapsed:.3f} s'
+            elif error is not None:
+                status = 'failed'
+            else:
+                status = 'cancelled'
 
-            if self._is_object_selected and self._is_background_selected:
-                start_segmentation()
-                self._phase = 'main'
-        else:
-            start_segmentation()
+            self._progress_label.config(text=status)
+
+    def _show_segmentation(self, mask, changed=None):
+        colors = np.array([self._colors['background'],
+                           self._colors['object']], dtype=np.uint8)
+
+        if changed is None:
+            self.mask_image = Image.fromarray(colors[mask.astype(np.intp)],
+                                              'RGBA')
+            self._update_displayed_image()
+        elif len(changed[0]) > 0:
+            # Only the changed pixels are recolored and recomposited
+            ys, xs = changed
+            overlay = np.array(self.mask_image)
+            overlay[ys, xs] = colors[mask[ys, xs].astype(np.intp)]
+            self.mask_image = Image.fromarray(overlay, 'RGBA')
+            self._update_displayed_image((xs.min(), ys.min(),
+                                          xs.max() + 1, ys.max() + 1))
+
+        self._update_metrics(mask)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
     root = tk.Tk()
     root.title('Graph Image Segmentation')
     root.resizable(False, False)
@@ -1,24 +1,14 @@
 from itertools import product
 
+import numpy as np
 from PIL import Image
 
 from algo.image_segmentation import Segmentator, gaussian
 
 
-def draw_mask(size, s, t):
-    mask = Image.new('RGB', size)
-
-    for pixel in s:
-        if pixel == 's':
-            continue
-        mask.putpixel(pixel, (0, 0, 0))
-
-    for pixel in t:
-        if pixel == 't':
-            continue
-        mask.putpixel(pixel, (255, 255, 255))
-
-    return mask
+def draw_mask(mask):
+    # Pixels of the s cut are black, pixels of the t cut are white
+    return Image.fromarray(np.where(mask, 0, 255).astype(np.uint8))
 
 
 # Configuration
@@ -53,11 +43,12 @@ image = Image.open(filename).convert('L')
 background, object = boxes[filename]
 
 segmentator = Segmentator(image, neighbors, lambda_, gaussian(sigma))
-s, t = segmentator.mark(object, background)
+mask = segmentator.mark(object, background, as_mask=True)
 
-draw_mask(image.size, s, t).show()
+draw_mask(mask).show()
 
-s, t = segmentator.mark(background_pixels=set(product(range(290, 310),
-                                                      range(10))))
+mask = segmentator.mark(background_pixels=set(product(range(290, 310),
+                                                      range(10))),
+                        as_mask=True)
 
-draw_mask(image.size, s, t).show()
+draw_mask(mask).show()